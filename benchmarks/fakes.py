@@ -0,0 +1,285 @@
+"""
+Offline stand-ins for the Gemini API and a ComfyUI server, used by the benchmarks.
+"""
+
+import io
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+def make_png(width: int, height: int) -> bytes:
+    """Encode a solid-colour PNG of the given size."""
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (40, 90, 160)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+def _response(text: Optional[str] = None, data: Optional[bytes] = None, mime_type: Optional[str] = None, tokens: int = 0):
+    """Build an object shaped like a google.genai GenerateContentResponse."""
+    inline_data = SimpleNamespace(data=data, mime_type=mime_type) if data is not None else None
+    part = SimpleNamespace(text=text, inline_data=inline_data)
+    return SimpleNamespace(
+        text=text,
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))],
+        usage_metadata=SimpleNamespace(total_token_count=tokens),
+    )
+
+class FakeModels:
+    """The ``models`` namespace of ``FakeGenaiClient``."""
+
+    def __init__(self, client: "FakeGenaiClient"):
+        self.client = client
+
+    def generate_content(self, model: str, contents: Any, config: Any = None):
+        kind = self.client.kind(config)
+        self.client.wait(kind)
+        return self.client.respond(kind, contents)
+
+    def generate_content_stream(self, model: str, contents: Any, config: Any = None) -> Iterator[Any]:
+        kind = self.client.kind(config)
+        response = self.client.respond(kind, contents)
+        chunks = max(1, self.client.stream_chunks)
+        # The first chunk takes a quarter of the latency, the rest trickles in
+        self.client.wait(kind, fraction=0.25)
+        if kind == "story":
+            text = response.text
+            size = math.ceil(len(text) / chunks)
+            for start in range(0, len(text), size):
+                yield _response(text=text[start:start + size])
+                self.client.wait(kind, fraction=0.75 / chunks)
+        else:
+            inline_data = response.candidates[0].content.parts[0].inline_data
+            size = math.ceil(len(inline_data.data) / chunks)
+            size += size % 2
+            for start in range(0, len(inline_data.data), size):
+                yield _response(data=inline_data.data[start:start + size], mime_type=inline_data.mime_type)
+                self.client.wait(kind, fraction=0.75 / chunks)
+
+class FakeGenaiClient:
+    """
+    Stand-in for ``google.genai.Client`` with configurable latency and payloads.
+
+    Calls are told apart by their config: audio responses return raw 16-bit PCM like
+    Gemini TTS, image responses return a PNG, and anything else returns a story with
+    ``scenes`` scenes. Latency is log-normal around the configured median so the tail
+    resembles a real service.
+
+    Args:
+        scenes (int): Scenes in the generated story.
+        lines_per_scene (int): Dialogue lines per scene.
+        latency (Dict[str, float]): Median latency in seconds per kind ("story", "tts", "image").
+        jitter (float): Sigma of the log-normal latency; 0 makes every call take the median.
+        audio_seconds (float): Length of each TTS response.
+        image_size (tuple): Width and height of generated images.
+        error_rate (float): Fraction of calls that fail with a 503 before returning.
+        stream_chunks (int): Chunks per streamed response.
+        seed (int): Seed for the latency and error draws.
+        story_texts (List[str], optional): Replies to the first story calls, in order (e.g.
+            invalid JSON to exercise repairs); later calls return the generated story.
+    """
+
+    def __init__(self, scenes: int = 5, lines_per_scene: int = 2, latency: Optional[Dict[str, float]] = None, jitter: float = 0.3, audio_seconds: float = 1.0, image_size=(640, 360), error_rate: float = 0.0, stream_chunks: int = 8, seed: int = 0, story_texts: Optional[List[str]] = None):
+        self.scenes = scenes
+        self.lines_per_scene = lines_per_scene
+        self.latency = {"story": 0.5, "tts": 0.2, "image": 0.3}
+        self.latency.update(latency or {})
+        self.jitter = jitter
+        self.audio_seconds = audio_seconds
+        self.error_rate = error_rate
+        self.stream_chunks = stream_chunks
+        self.models = FakeModels(self)
+        self.calls = {"story": 0, "tts": 0, "image": 0}
+        self.story_texts = list(story_texts or [])
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._png = make_png(*image_size)
+        self._pcm = b"\0\0" * int(24000 * audio_seconds)
+
+    @staticmethod
+    def kind(config: Any) -> str:
+        modalities = [str(modality).lower() for modality in (getattr(config, "response_modalities", None) or [])]
+        if "audio" in modalities:
+            return "tts"
+        if "image" in modalities:
+            return "image"
+        return "story"
+
+    def wait(self, kind: str, fraction: float = 1.0) -> None:
+        """Sleep for a latency draw and occasionally fail like an overloaded service."""
+        with self._lock:
+            delay = self.latency[kind] * (self._random.lognormvariate(0, self.jitter) if self.jitter else 1.0)
+            fail = self._random.random() < self.error_rate and fraction >= 0.25
+        time.sleep(delay * fraction)
+        if fail:
+            error = RuntimeError("503 UNAVAILABLE (fake)")
+            error.code = 503
+            raise error
+
+    def story(self) -> Dict[str, Any]:
+        """The story every story call returns."""
+        return {
+            "title": "Benchmark Story",
+            "scenes": [
+                {
+                    "id": n + 1,
+                    "description": f"Scene {n + 1} of the benchmark story.",
+                    "dialogue": [f"{'Narrator' if i % 2 == 0 else 'Robot'}: Line {i + 1} of scene {n + 1}." for i in range(self.lines_per_scene)],
+                    "image_prompt": f"A quiet landscape, variation {n + 1}",
+                    "character_prompt": "",
+                }
+                for n in range(self.scenes)
+            ],
+        }
+
+    def respond(self, kind: str, contents: Any):
+        with self._lock:
+            self.calls[kind] += 1
+        if kind == "tts":
+            return _response(data=self._pcm, mime_type="audio/L16;codec=pcm;rate=24000", tokens=len(self._pcm) // 64)
+        if kind == "image":
+            return _response(data=self._png, mime_type="image/png", tokens=1290)
+        with self._lock:
+            text = self.story_texts.pop(0) if self.story_texts else json.dumps(self.story())
+        return _response(text=text, tokens=len(text) // 4)
+
+class StubComfyUIServer:
+    """
+    Local HTTP server that answers like ComfyUI, without a GPU.
+
+    Jobs are "rendered" one after another, each taking ``latency`` seconds, like a
+    single-GPU server draining its queue. Every SaveImage node yields as many images as
+    the largest ``batch_size`` in the workflow, all copies of one PNG. The websocket is
+    not implemented, so clients must poll ``/history``. ``fail_requests`` answers the
+    next requests with a 500, like a server that hiccups.
+
+    Args:
+        latency (float): Seconds per job.
+        image_size (tuple): Width and height of the returned images.
+    """
+
+    def __init__(self, latency: float = 0.5, image_size=(640, 360)):
+        self.latency = latency
+        self.png = make_png(*image_size)
+        self.jobs = {}
+        self.busy_until = 0.0
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubComfyUIServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, name="stub-comfyui", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def submit(self, workflow: Dict[str, Any]) -> str:
+        prompt_id = uuid.uuid4().hex
+        batch = max([node.get("inputs", {}).get("batch_size", 1) for node in workflow.values() if isinstance(node.get("inputs", {}).get("batch_size", 1), int)] or [1])
+        outputs = {
+            node_id: {"images": [{"filename": f"{prompt_id}_{node_id}_{k}.png", "subfolder": "", "type": "output"} for k in range(batch)]}
+            for node_id, node in workflow.items()
+            if node.get("class_type") == "SaveImage"
+        }
+        with self.lock:
+            self.busy_until = max(self.busy_until, time.monotonic()) + self.latency
+            self.jobs[prompt_id] = {"done_at": self.busy_until, "outputs": outputs}
+        return prompt_id
+
+    def history(self, prompt_id: str) -> Dict[str, Any]:
+        with self.lock:
+            job = self.jobs.get(prompt_id)
+        if job is None or time.monotonic() < job["done_at"]:
+            return {}
+        return {prompt_id: {"outputs": job["outputs"], "status": {"status_str": "success", "completed": True}}}
+
+    def fail_requests(self, count: int) -> None:
+        """Answer the next ``count`` requests (other than health probes) with a 500."""
+        with self.lock:
+            self.failures = count
+
+    def _take_failure(self) -> bool:
+        with self.lock:
+            if self.failures <= 0:
+                return False
+            self.failures -= 1
+            return True
+
+    def cancel(self, prompt_ids: List[str]) -> None:
+        with self.lock:
+            for prompt_id in prompt_ids:
+                self.jobs.pop(prompt_id, None)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, payload: Any):
+                self._send(200, json.dumps(payload).encode("utf-8"))
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/" and stub._take_failure():
+                    self._send(500, b"internal error", "text/plain")
+                elif url.path == "/":
+                    self._send(200, b"ok", "text/plain")
+                elif url.path.startswith("/history/"):
+                    self._json(stub.history(url.path.rsplit("/", 1)[1]))
+                elif url.path == "/view":
+                    if not parse_qs(url.query).get("filename"):
+                        self._send(400, b"missing filename", "text/plain")
+                    else:
+                        self._send(200, stub.png, "image/png")
+                elif url.path == "/queue":
+                    self._json({"queue_running": [], "queue_pending": []})
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if stub._take_failure():
+                    self._send(500, b"internal error", "text/plain")
+                elif self.path == "/prompt":
+                    self._json({"prompt_id": stub.submit(payload.get("prompt", {})), "number": 0})
+                elif self.path == "/queue":
+                    stub.cancel(payload.get("delete", []))
+                    self._json({})
+                elif self.path == "/interrupt":
+                    self._json({})
+                else:
+                    self._send(404, b"not found", "text/plain")
+
+        return Handler
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Startup budget check for the ``auteur`` CLI.
+
+Times ``auteur --help`` and the import of the modules commands load before they call
+any API, and fails if a heavy dependency (google-genai, requests, moviepy, numpy) is
+imported at startup or the import time exceeds the budget:
+
+    python benchmarks/import_time.py --budget 0.3
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(REPO_ROOT, 'src')
+
+# Modules that must only be imported by the commands that use them
+HEAVY_MODULES = ['google.genai', 'google.generativeai', 'requests', 'moviepy', 'moviepy.editor', 'numpy']
+
+# What each check imports; 'project' is what compile-video needs before it starts encoding
+CHECKS = {
+    'cli': 'import auteur_studio.cli',
+    'project': 'import auteur_studio.project',
+}
+
+def _python(code: str) -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC_DIR, os.environ.get('PYTHONPATH')])))
+    return subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env, capture_output=True, text=True)
+
+def measure(statement: str) -> dict:
+    """
+    Import a module in a fresh interpreter.
+
+    Returns:
+        dict: The cumulative import time in seconds, the heavy modules that were loaded,
+        and the slowest top-level imports.
+    """
+    code = f"{statement}\nimport json, sys\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    completed = _python(code)
+    if completed.returncode != 0:
+        raise RuntimeError(f"'{statement}' failed:\n{completed.stderr.strip().splitlines()[-1]}")
+    rows = []
+    for line in completed.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not name.startswith('  '):
+            rows.append((int(cumulative) / 1e6, name.strip()))
+    package = [seconds for seconds, name in rows if name.startswith('auteur_studio')]
+    return {
+        'seconds': max(package) if package else 0.0,
+        'heavy': json.loads(completed.stdout.strip().splitlines()[-1]),
+        'slowest': sorted(rows, reverse=True)[:5],
+    }
+
+def time_help() -> float:
+    """Wall time of ``auteur --help`` (via ``python -m auteur_studio.cli``) in seconds."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SRC_DIR, os.environ.get('PYTHONPATH')])))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-m', 'auteur_studio.cli', '--help'], env=env, check=True, capture_output=True)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the auteur CLI starts quickly.")
+    parser.add_argument('--budget', type=float, default=0.3, help='Allowed import time of each checked module in seconds.')
+    args = parser.parse_args()
+
+    ok = True
+    for label, statement in CHECKS.items():
+        result = measure(statement)
+        within = result['seconds'] <= args.budget and not result['heavy']
+        ok = ok and within
+        print(f"{label:<8} {result['seconds'] * 1000:>7.1f} ms  {'ok' if within else 'OVER BUDGET'}")
+        if result['heavy']:
+            print(f"         imports heavy modules at startup: {', '.join(result['heavy'])}")
+        if not within:
+            for seconds, name in result['slowest']:
+                print(f"         {seconds * 1000:>7.1f} ms  {name}")
+    print(f"auteur --help: {time_help() * 1000:.0f} ms wall (including interpreter startup)")
+    if not ok:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
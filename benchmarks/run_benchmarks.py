@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmarks for the Auteur Studio pipeline.
+
+Runs the real ``Project`` pipeline offline, with a fake Gemini client and a local stub
+ComfyUI server, at several story sizes. Each scale runs in its own process so peak RSS
+is measured per run. Results are written as JSON that can be compared between commits:
+
+    python benchmarks/run_benchmarks.py --scales 5 50 500 --output benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --compare benchmarks/baseline.json
+
+Encoding still uses ffmpeg (or moviepy), so the numbers include real encode time.
+"""
+
+import argparse
+import copy
+import datetime
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'src'))
+sys.path.insert(0, BENCHMARK_DIR)
+
+def _benchmark_config(args: argparse.Namespace, work_dir: str, comfyui_url: str = None) -> Dict[str, Any]:
+    """Adapt the default config to an isolated, offline run."""
+    from auteur_studio.config import load_config
+    cfg = copy.deepcopy(load_config(args.config))
+    cfg['gemini']['api_key'] = 'benchmark'
+    cfg['paths']['project_root'] = os.path.join(work_dir, 'projects')
+    cfg['cache'] = {'enabled': args.cache, 'dir': os.path.join(work_dir, 'cache'), 'max_size_mb': 2048}
+    cfg['pipeline'] = {'incremental': False}
+    cfg['tracing'] = {'enabled': True}
+    cfg.setdefault('concurrency', {})['workers'] = args.workers
+    cfg.setdefault('scheduler', {})['mode'] = args.scheduler
+    cfg.setdefault('story', {})['streaming'] = args.streaming
+    # The fake client has no quota; only the retry policy and deadlines stay in effect
+    cfg.setdefault('rate_limits', {})['models'] = {}
+    cfg.setdefault('video', {}).update({'width': args.width, 'height': args.height, 'fps': args.fps})
+    comfyui = cfg.setdefault('comfyui', {})
+    comfyui['enabled'] = comfyui_url is not None
+    if comfyui_url is not None:
+        comfyui.update({
+            'base_url': comfyui_url,
+            'base_urls': [],
+            'use_websocket': False,
+            'poll_interval': 0.05,
+            'workflow_api_json': os.path.join(REPO_ROOT, 'configs', 'comfyui_workflow_api.json'),
+            'width': args.width,
+            'height': args.height,
+        })
+    return cfg
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process and its finished children, in MB."""
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return max(own, children) / 1e6
+
+def run_once(args: argparse.Namespace, scenes: int) -> Dict[str, Any]:
+    """Run the full pipeline for one story size in this process and return its measurements."""
+    from fakes import FakeGenaiClient, StubComfyUIServer
+    from auteur_studio.project import Project
+    from auteur_studio.utils import trace_utils
+
+    latency = {"story": args.story_latency, "tts": args.tts_latency, "image": args.image_latency}
+    client = FakeGenaiClient(
+        scenes=scenes,
+        lines_per_scene=args.lines_per_scene,
+        latency=latency,
+        jitter=args.jitter,
+        audio_seconds=args.audio_seconds,
+        image_size=(args.width, args.height),
+        error_rate=args.error_rate,
+    )
+    server = StubComfyUIServer(latency=args.comfyui_latency, image_size=(args.width, args.height)).start() if args.comfyui else None
+    try:
+        with tempfile.TemporaryDirectory(prefix='auteur-bench-') as work_dir:
+            cfg = _benchmark_config(args, work_dir, server.url if server else None)
+            project = Project(f"bench_{scenes}", cfg, client=client)
+            project.initialize()
+            trace_utils.get_tracer().clear()
+            start = time.perf_counter()
+            if args.scheduler == 'dag':
+                project.generate_dag("A benchmark story", "final_video.mp4")
+            else:
+                if args.streaming:
+                    project.generate_story_streaming("A benchmark story")
+                else:
+                    project.generate_story("A benchmark story")
+                project.generate_audio()
+                project.generate_animation()
+                project.compile_video("final_video.mp4")
+            wall = time.perf_counter() - start
+            spans = trace_utils.load_trace(project.write_trace())
+    finally:
+        if server is not None:
+            server.stop()
+
+    rows = trace_utils.summarize(spans)
+    # Stage spans give wall time per stage; summed work spans give busy time per category
+    stages = {row['name']: round(row['total'], 3) for row in rows if row['category'] == 'stage'}
+    categories = {}
+    for row in rows:
+        if row['category'] != 'stage':
+            categories[row['category']] = round(categories.get(row['category'], 0.0) + row['total'], 3)
+    return {
+        'scenes': scenes,
+        'wall_s': round(wall, 3),
+        'scenes_per_s': round(scenes / wall, 3) if wall else None,
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+        'stages': stages,
+        'categories': categories,
+        'api_calls': dict(client.calls),
+        'errors': sum(row['errors'] for row in rows),
+    }
+
+def _run_isolated(args: argparse.Namespace, scenes: int) -> Dict[str, Any]:
+    """Run one scale in a fresh interpreter so peak RSS belongs to that run alone."""
+    with tempfile.NamedTemporaryFile(suffix='.json', delete=False) as f:
+        result_path = f.name
+    try:
+        command = [sys.executable, os.path.abspath(__file__), '--single', str(scenes), '--result-file', result_path] + _forwarded(args)
+        completed = subprocess.run(command, stdout=None if args.verbose else subprocess.DEVNULL)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Benchmark run with {scenes} scenes failed (exit code {completed.returncode})")
+        with open(result_path, 'r') as f:
+            return json.load(f)
+    finally:
+        os.remove(result_path)
+
+def _forwarded(args: argparse.Namespace) -> List[str]:
+    """Command-line options that configure a single run."""
+    options = []
+    for name in ('config', 'scheduler', 'workers', 'width', 'height', 'fps', 'lines_per_scene', 'audio_seconds',
+                 'story_latency', 'tts_latency', 'image_latency', 'comfyui_latency', 'jitter', 'error_rate'):
+        value = getattr(args, name)
+        if value is not None:
+            options += [f"--{name.replace('_', '-')}", str(value)]
+    for name in ('comfyui', 'cache', 'streaming'):
+        if getattr(args, name):
+            options.append(f"--{name}")
+    return options
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> bool:
+    """
+    Print the change in wall time and peak RSS per scale against a baseline.
+
+    Returns:
+        bool: True if no scale got slower or bigger than the tolerance allows.
+    """
+    previous = {result['scenes']: result for result in baseline.get('results', [])}
+    ok = True
+    print(f"Comparing against {baseline.get('meta', {}).get('commit', '?')} (tolerance {tolerance:.0%})")
+    print(f"{'scenes':>7} {'wall s':>9} {'was':>9} {'ratio':>7} {'RSS MB':>8} {'was':>8} {'ratio':>7}")
+    for result in current['results']:
+        before = previous.get(result['scenes'])
+        if before is None:
+            print(f"{result['scenes']:>7} {result['wall_s']:>9.2f} {'-':>9} {'-':>7} {result['peak_rss_mb']:>8.1f} {'-':>8} {'-':>7}")
+            continue
+        wall_ratio = result['wall_s'] / before['wall_s'] if before['wall_s'] else 1.0
+        rss_ratio = result['peak_rss_mb'] / before['peak_rss_mb'] if before['peak_rss_mb'] else 1.0
+        regressed = wall_ratio > 1 + tolerance or rss_ratio > 1 + tolerance
+        ok = ok and not regressed
+        print(
+            f"{result['scenes']:>7} {result['wall_s']:>9.2f} {before['wall_s']:>9.2f} {wall_ratio:>7.2f} "
+            f"{result['peak_rss_mb']:>8.1f} {before['peak_rss_mb']:>8.1f} {rss_ratio:>7.2f}{'  REGRESSION' if regressed else ''}"
+        )
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=[5, 50, 500], help='Story sizes (scenes) to run.')
+    parser.add_argument('--config', default=None, help='Config file to start from (defaults to configs/default_config.yaml).')
+    parser.add_argument('--scheduler', choices=['stages', 'dag'], default='stages', help='Pipeline scheduler to benchmark.')
+    parser.add_argument('--streaming', action='store_true', help='Stream the story (stages scheduler only).')
+    parser.add_argument('--comfyui', action='store_true', help='Animate through the stub ComfyUI server instead of the image model.')
+    parser.add_argument('--cache', action='store_true', help='Enable the asset cache (in a temporary directory).')
+    parser.add_argument('--workers', type=int, default=4, help='concurrency.workers for the run.')
+    parser.add_argument('--width', type=int, default=320, help='Video and image width.')
+    parser.add_argument('--height', type=int, default=180, help='Video and image height.')
+    parser.add_argument('--fps', type=int, default=12, help='Video frame rate.')
+    parser.add_argument('--lines-per-scene', type=int, default=2, help='Dialogue lines per scene.')
+    parser.add_argument('--audio-seconds', type=float, default=1.0, help='Length of each fake TTS response.')
+    parser.add_argument('--story-latency', type=float, default=0.5, help='Median story call latency in seconds.')
+    parser.add_argument('--tts-latency', type=float, default=0.2, help='Median TTS call latency in seconds.')
+    parser.add_argument('--image-latency', type=float, default=0.3, help='Median image call latency in seconds.')
+    parser.add_argument('--comfyui-latency', type=float, default=0.2, help='Seconds per stub ComfyUI job.')
+    parser.add_argument('--jitter', type=float, default=0.3, help='Log-normal sigma of the fake latencies.')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of fake API calls that fail with a 503.')
+    parser.add_argument('--output', default=None, help='Write results to this JSON file.')
+    parser.add_argument('--compare', default=None, help='Baseline JSON file to compare against.')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed slowdown or RSS growth before --compare fails.')
+    parser.add_argument('--verbose', action='store_true', help='Show the pipeline output.')
+    parser.add_argument('--single', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single is not None:
+        result = run_once(args, args.single)
+        with open(args.result_file, 'w') as f:
+            json.dump(result, f)
+        return
+
+    results = []
+    for scenes in args.scales:
+        print(f"Running {scenes} scene(s)...", flush=True)
+        result = _run_isolated(args, scenes)
+        print(f"  {result['wall_s']:.2f}s wall, {result['scenes_per_s']:.2f} scenes/s, {result['peak_rss_mb']:.0f} MB peak RSS, "
+              f"encode {result['categories'].get('encode', 0.0):.2f}s")
+        results.append(result)
+
+    report = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'options': {key: value for key, value in vars(args).items() if key not in ('output', 'compare', 'single', 'result_file', 'verbose')},
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        if not compare(baseline, report, args.tolerance):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
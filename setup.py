@@ -14,12 +14,17 @@ setup(
         "google-genai>=0.3.0",
         "requests>=2.25.0",
         "moviepy>=1.0.0",
+        "numpy>=1.20.0",
         "pyngrok>=5.0.0",
         "pillow>=9.0.0",
         "pyyaml>=6.0",
         "tqdm>=4.60.0",
         "click>=8.0.0",
     ],
+    extras_require={
+        "websocket": ["websocket-client>=1.0.0"],
+        "http2": ["h2>=4.0.0"],
+    },
     entry_points={
         "console_scripts": [
             "auteur=auteur_studio.cli:cli",
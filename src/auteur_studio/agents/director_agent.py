@@ -1,15 +1,33 @@
-import google.generativeai as genai
 from google.genai import types
-from typing import Dict, Any
+from typing import Dict, Any, Callable, List, Optional
 import json
-import re
+from ..utils.stream_utils import SceneStreamParser
+from ..utils.rate_limit_utils import RateLimiter, estimate_tokens
+from ..utils.cache_utils import AssetCache
+from ..utils.story_utils import STORY_SCHEMA, SCHEMA_VERSION, StoryValidationError, parse_story, validate_scene
+from ..utils import client_utils, trace_utils
 
 class DirectorAgent:
-    def __init__(self, api_key: str, model: str = "gemini-2.5-flash"):
-        genai.configure(api_key=api_key)
+    def __init__(self, api_key: str, model: str = "gemini-2.5-flash", rate_limiter: Optional[RateLimiter] = None, client=None, http_config: Optional[Dict[str, Any]] = None, cache: Optional[AssetCache] = None, thinking_budget: int = -1, repair_attempts: int = 1):
         self.model_name = model
-        self.client = genai.Client(api_key=api_key)
+        self.rate_limiter = rate_limiter or RateLimiter()
+        # -1 lets the model decide how much to think; 0 turns thinking off
+        self.thinking_budget = thinking_budget
+        # Targeted repair requests made for a story that fails validation, before giving up
+        self.repair_attempts = repair_attempts
+        self.cache = cache
+        deadline = self.rate_limiter.deadline(self.model_name)
+        self.client = client or client_utils.get_client(api_key, timeout=deadline, http_config=http_config)
     
+    def settings(self) -> Dict[str, Any]:
+        """Everything besides the prompt that influences the generated story."""
+        return {
+            'model': self.model_name,
+            'thinking_budget': self.thinking_budget,
+            'schema_version': SCHEMA_VERSION,
+        }
+    
+    @trace_utils.traced("story", "story.generate_story")
     def generate_story(self, prompt: str) -> Dict[str, Any]:
         """
         Generate a structured story from a prompt.
@@ -19,90 +37,218 @@ class DirectorAgent:
             
         Returns:
             Dict[str, Any]: A JSON object with the story structure.
+            
+        Raises:
+            StoryValidationError: If the story is still invalid after the repair attempts.
+        """
+        cache_key = self._cache_key(prompt)
+        story = self._cached_story(cache_key)
+        if story is not None:
+            return story
+        
+        structured_prompt = self._build_prompt(prompt)
+        
+        # JSON mode with a response schema, so the reply parses in a single json.loads
+        response = self.rate_limiter.call(
+            self.model_name,
+            lambda cancel: self.client.models.generate_content(
+                model=self.model_name,
+                contents=[
+                    types.Content(
+                        role="user",
+                        parts=[
+                            types.Part.from_text(text=structured_prompt),
+                        ],
+                    ),
+                ],
+                config=self._generation_config(self.thinking_budget),
+            ),
+            tokens=estimate_tokens(structured_prompt),
+        )
+        
+        trace_utils.annotate(bytes_in=len(structured_prompt.encode("utf-8")), bytes_out=len((response.text or "").encode("utf-8")))
+        
+        story = self._validated(prompt, response.text)
+        if self.cache is not None:
+            self.cache.put_json(cache_key, story)
+        return story
+    
+    @trace_utils.traced("story", "story.generate_story_stream")
+    def generate_story_stream(self, prompt: str, on_scene: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """
+        Generate a structured story, handing each scene over as soon as it is complete.
+        
+        Args:
+            prompt (str): The story prompt.
+            on_scene (Callable, optional): Called with each valid scene dict while the
+                rest of the story is still being generated.
+            
+        Returns:
+            Dict[str, Any]: A JSON object with the story structure.
+            
+        Raises:
+            StoryValidationError: If the story is still invalid after the repair attempts.
+        """
+        cache_key = self._cache_key(prompt)
+        story = self._cached_story(cache_key)
+        if story is not None:
+            if on_scene is not None:
+                for scene in story['scenes']:
+                    on_scene(scene)
+            return story
+        
+        structured_prompt = self._build_prompt(prompt)
+        parser = None
+        streamed_scenes = []
+        
+        def _stream(cancel):
+            # A retry restarts the stream, which is only safe before any scene was handed over
+            nonlocal parser
+            if streamed_scenes:
+                raise RuntimeError(f"Story stream cannot be restarted after {len(streamed_scenes)} scene(s) were handed over")
+            parser = SceneStreamParser()
+            try:
+                for chunk in self.client.models.generate_content_stream(
+                    model=self.model_name,
+                    contents=[
+                        types.Content(
+                            role="user",
+                            parts=[
+                                types.Part.from_text(text=structured_prompt),
+                            ],
+                        ),
+                    ],
+                    config=self._generation_config(self.thinking_budget),
+                ):
+                    if cancel.is_set():
+                        # The call missed its deadline; stop handing over scenes
+                        break
+                    for scene in parser.feed(chunk.text or ""):
+                        try:
+                            scene = validate_scene(scene, len(streamed_scenes))
+                        except StoryValidationError as e:
+                            # Left for the repair request; its assets are made by the later stages
+                            print(f"Not prefetching an invalid scene: {e}")
+                            continue
+                        streamed_scenes.append(scene)
+                        if on_scene is not None:
+                            on_scene(scene)
+            except Exception as e:
+                if streamed_scenes:
+                    raise RuntimeError(f"Story stream failed after {len(streamed_scenes)} scene(s): {e}") from e
+                raise
+        
+        # Scenes are handed over while the stream runs, so it is never hedged
+        self.rate_limiter.call(self.model_name, _stream, tokens=estimate_tokens(structured_prompt), hedge=False)
+        trace_utils.annotate(bytes_in=len(structured_prompt.encode("utf-8")), bytes_out=len(parser.buffer.encode("utf-8")), scenes=len(streamed_scenes))
+        
+        story = self._validated(prompt, parser.buffer)
+        if self.cache is not None:
+            self.cache.put_json(cache_key, story)
+        return story
+    
+    def _generation_config(self, thinking_budget: int) -> types.GenerateContentConfig:
+        """Request config that constrains the reply to the story schema."""
+        return types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=STORY_SCHEMA,
+            thinking_config=types.ThinkingConfig(
+                thinking_budget=thinking_budget,
+            ),
+        )
+    
+    def _cache_key(self, prompt: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.make_key(kind="story", prompt=prompt, **self.settings())
+    
+    def _cached_story(self, cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return a previously generated story for the same prompt and settings, if it is still valid."""
+        if cache_key is None:
+            return None
+        story = self.cache.get_json(cache_key)
+        if story is None:
+            return None
+        try:
+            story = parse_story(json.dumps(story))
+        except StoryValidationError:
+            return None
+        print("Story loaded from cache")
+        return story
+    
+    def _validated(self, prompt: str, response_text: str) -> Dict[str, Any]:
         """
-        # Create a detailed prompt for the model to generate structured JSON
+        Parse and validate a story, asking the model to fix it if it is invalid.
+        
+        Args:
+            prompt (str): The original story prompt, for context in repair requests.
+            response_text (str): The model output.
+            
+        Returns:
+            Dict[str, Any]: The validated story.
+            
+        Raises:
+            StoryValidationError: If the story is still invalid after the repair attempts.
+        """
+        for attempt in range(self.repair_attempts + 1):
+            try:
+                return parse_story(response_text)
+            except StoryValidationError as e:
+                if attempt == self.repair_attempts:
+                    raise
+                print(f"Story failed validation, requesting a repair: {e}")
+                trace_utils.count("repairs")
+                response_text = self._repair(prompt, response_text, e.errors)
+    
+    @trace_utils.traced("story", "story.repair")
+    def _repair(self, prompt: str, response_text: str, errors: List[str]) -> str:
+        """Send an invalid story back with its problems and return the corrected JSON text."""
+        repair_prompt = self._build_repair_prompt(prompt, response_text, errors)
+        # The fix is mechanical, so the repair request does not think
+        response = self.rate_limiter.call(
+            self.model_name,
+            lambda cancel: self.client.models.generate_content(
+                model=self.model_name,
+                contents=[
+                    types.Content(
+                        role="user",
+                        parts=[
+                            types.Part.from_text(text=repair_prompt),
+                        ],
+                    ),
+                ],
+                config=self._generation_config(0),
+            ),
+            tokens=estimate_tokens(repair_prompt),
+        )
+        trace_utils.annotate(bytes_in=len(repair_prompt.encode("utf-8")), bytes_out=len((response.text or "").encode("utf-8")), errors=len(errors))
+        return response.text
+    
+    def _build_prompt(self, prompt: str) -> str:
+        """Build the prompt asking the model for a structured JSON story."""
+        # The JSON structure is enforced by the response schema; the prompt describes the content
         structured_prompt = f"""
         You are a storytelling AI. Generate a short animated story based on the following prompt: {prompt}
         
-        The story should be broken down into 3-5 scenes. Each scene should have:
-        - id: A unique identifier (number).
+        The story should have a title and be broken down into 3-5 scenes. Each scene should have:
+        - id: A unique identifier (number), starting at 1.
         - description: A detailed description of the scene's visuals.
         - dialogue: A list of dialogue lines (if any) for the scene. Each line should be in the format "character: line".
         - image_prompt: A detailed text prompt that could be used by an image generation model to create this scene.
         - character_prompt: (Optional) For scenes focusing on a character, a more specific prompt for character image generation.
-        
-        Output the story in JSON format with the following structure:
-        {{
-          "title": "Story Title",
-          "scenes": [
-            {{
-              "id": 1,
-              "description": "Scene description",
-              "dialogue": ["character: line"],
-              "image_prompt": "Prompt for image generation",
-              "character_prompt": ""
-            }}
-          ]
-        }}
-        
-        Make sure the output is valid JSON that can be parsed by Python's json.loads() function.
         """
         
-        # Use the client with thinking budget for complex reasoning
-        response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=[
-                types.Content(
-                    role="user",
-                    parts=[
-                        types.Part.from_text(text=structured_prompt),
-                    ],
-                ),
-            ],
-            config=types.GenerateContentConfig(
-                thinking_config=types.ThinkingConfig(
-                    thinking_budget=-1,  # Unlimited thinking
-                ),
-            ),
-        )
+        return structured_prompt
+    
+    def _build_repair_prompt(self, prompt: str, response_text: str, errors: List[str]) -> str:
+        """Build the prompt asking the model to fix the listed problems of a story."""
+        problems = "\n".join(f"- {error}" for error in errors)
+        return f"""
+        The following story JSON, written for the prompt "{prompt}", has these problems:
+        {problems}
         
-        # Extract the text from the response
-        response_text = response.text
+        Return the corrected story JSON. Fix only the listed problems and keep everything else unchanged.
+        Dialogue lines must be in the format "character: line" and scene ids must be unique positive integers.
         
-        # Attempt to parse the response as JSON
-        try:
-            # First, try to parse directly
-            story_json = json.loads(response_text)
-        except json.JSONDecodeError as e:
-            # If direct parsing fails, try to extract JSON from markdown code block
-            try:
-                pattern = r'```json\s*(.*?)\s*```'
-                match = re.search(pattern, response_text, re.DOTALL)
-                if match:
-                    story_json = json.loads(match.group(1))
-                else:
-                    # Try to find JSON object in the text
-                    pattern = r'\{.*\}'
-                    match = re.search(pattern, response_text, re.DOTALL)
-                    if match:
-                        story_json = json.loads(match.group(0))
-                    else:
-                        raise ValueError("Failed to parse model response as JSON.") from e
-            except (json.JSONDecodeError, AttributeError) as e2:
-                # If all else fails, create a simple fallback story
-                print(f"Failed to parse JSON response: {e2}")
-                print(f"Response was: {response_text}")
-                story_json = {
-                    "title": "Fallback Story",
-                    "scenes": [
-                        {
-                            "id": 1,
-                            "description": "A simple scene",
-                            "dialogue": ["Narrator: This is a fallback scene."],
-                            "image_prompt": "A simple scene",
-                            "character_prompt": ""
-                        }
-                    ]
-                }
-                
-        return story_json
\ No newline at end of file
+        {response_text}
+        """
@@ -1,14 +1,22 @@
 import base64
 import mimetypes
 import os
-from google import genai
 from google.genai import types
-from typing import Optional
+from typing import Any, Dict, Optional
+from ..utils.cache_utils import AssetCache
+from ..utils.rate_limit_utils import RateLimiter, estimate_tokens
+from ..utils import client_utils, trace_utils
 
 class ImageAgent:
-    def __init__(self, api_key: str):
-        self.client = genai.Client(api_key=api_key)
+    def __init__(self, api_key: str, cache: Optional[AssetCache] = None, rate_limiter: Optional[RateLimiter] = None, client=None, http_config: Optional[Dict[str, Any]] = None):
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.model_name = "gemini-2.0-flash-preview-image-generation"
+        deadline = self.rate_limiter.deadline(self.model_name)
+        self.client = client or client_utils.get_client(api_key, timeout=deadline, http_config=http_config)
+        self.temperature = 0
+        self.cache = cache
     
+    @trace_utils.traced("image", "image.generate_image")
     def generate_image(self, prompt: str, output_filename: str = "output.png") -> str:
         """
         Generate an image from a text prompt using Gemini.
@@ -20,6 +28,22 @@ class ImageAgent:
         Returns:
             str: Path to the generated image file.
         """
+        trace_utils.annotate(bytes_in=len(prompt.encode("utf-8")))
+        
+        # Reuse a previously generated image for the same model, prompt and config
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(
+                kind="image",
+                model=self.model_name,
+                prompt=prompt,
+                temperature=self.temperature,
+            )
+            cached_filename = self.cache.get(cache_key, output_filename)
+            if cached_filename:
+                print(f"Image loaded from cache: {cached_filename}")
+                return cached_filename
+        
         try:
             contents = [
                 types.Content(
@@ -31,15 +55,19 @@ class ImageAgent:
             ]
             
             generate_content_config = types.GenerateContentConfig(
-                temperature=0,
+                temperature=self.temperature,
                 response_modalities=["IMAGE", "TEXT"],
             )
 
             # Generate the image
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash-preview-image-generation",
-                contents=contents,
-                config=generate_content_config,
+            response = self.rate_limiter.call(
+                self.model_name,
+                lambda cancel: self.client.models.generate_content(
+                    model=self.model_name,
+                    contents=contents,
+                    config=generate_content_config,
+                ),
+                tokens=estimate_tokens(prompt),
             )
 
             # Extract and save the image data
@@ -61,15 +89,16 @@ class ImageAgent:
                 # Save the file
                 with open(output_filename, "wb") as f:
                     f.write(data_buffer)
+                trace_utils.annotate(bytes_out=len(data_buffer))
                 
                 print(f"Image saved to: {output_filename}")
+                if cache_key is not None:
+                    self.cache.put(cache_key, output_filename)
                 return output_filename
             else:
                 raise ValueError("No image data found in response")
                 
         except Exception as e:
             print(f"Error generating image: {e}")
-            # Fallback: create an empty file to avoid breaking the pipeline
-            with open(output_filename, "wb") as f:
-                f.write(b"")
-            return output_filename
\ No newline at end of file
+            # The caller records the failure; an empty placeholder would hide it
+            raise
\ No newline at end of file
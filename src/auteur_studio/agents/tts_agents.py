@@ -3,13 +3,32 @@ import mimetypes
 import os
 import re
 import struct
-from google import genai
+import threading
+import time
+import uuid
 from google.genai import types
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
+from ..utils.cache_utils import AssetCache
+from ..utils.rate_limit_utils import RateLimiter, estimate_tokens
+from ..utils.hedge_utils import CallCancelled
+from ..utils import client_utils, trace_utils
+
+# Gemini multi-speaker TTS accepts at most this many distinct speakers per request
+MAX_SPEAKERS_PER_REQUEST = 2
 
 class TTSAgent:
-    def __init__(self, api_key: str):
-        self.client = genai.Client(api_key=api_key)
+    def __init__(self, api_key: str, cache: Optional[AssetCache] = None, client=None, streaming: bool = False, rate_limiter: Optional[RateLimiter] = None, http_config: Optional[Dict[str, Any]] = None):
+        # Shared with the other agents so every call to a model counts against the same quota
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.model_name = "gemini-2.5-pro-preview-tts"
+        deadline = self.rate_limiter.deadline(self.model_name)
+        self.client = client or client_utils.get_client(api_key, timeout=deadline, http_config=http_config)
+        self.temperature = 1
+        self.cache = cache
+        # When streaming, audio chunks are written to disk as they arrive
+        self.streaming = streaming
+        # Seconds from request to first audio chunk, keyed by output filename (streaming only)
+        self.ttfb = {}
         self.voice_mapping = {
             "narrator": "Zephyr",
             "default": "Puck",
@@ -62,25 +81,42 @@ class TTSAgent:
         )
         return header + audio_data
     
-    def get_voice_config(self, character: Optional[str] = None):
-        """Get the appropriate voice configuration based on character."""
-        voice_name = self.voice_mapping.get(character, self.voice_mapping["default"])
+    def get_voice_name(self, character: Optional[str] = None) -> str:
+        """Get the prebuilt voice used for a character."""
+        return self.voice_mapping.get(character, self.voice_mapping["default"])
+    
+    def get_voice_config(self, character: Optional[str] = None, characters: Optional[List[str]] = None):
+        """Get the appropriate voice configuration based on character, or on several characters for a dialogue."""
+        speakers = characters or [character]
         
         return types.SpeechConfig(
             multi_speaker_voice_config=types.MultiSpeakerVoiceConfig(
                 speaker_voice_configs=[
                     types.SpeakerVoiceConfig(
-                        speaker=character or "Speaker",
+                        speaker=speaker or "Speaker",
                         voice_config=types.VoiceConfig(
                             prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                voice_name=voice_name
+                                voice_name=self.get_voice_name(speaker)
                             )
                         ),
-                    ),
+                    )
+                    for speaker in speakers
                 ]
             ),
         )
     
+    def _extract_audio(self, response) -> Tuple[bytes, str]:
+        """Return the audio data and MIME type of a TTS response, or raise ValueError if it holds no audio."""
+        if (response.candidates and 
+            response.candidates[0].content and 
+            response.candidates[0].content.parts and
+            response.candidates[0].content.parts[0].inline_data):
+            inline_data = response.candidates[0].content.parts[0].inline_data
+            if inline_data.data and (inline_data.mime_type or "").startswith("audio/"):
+                return inline_data.data, inline_data.mime_type
+        raise ValueError("No audio data found in response")
+    
+    @trace_utils.traced("tts", "tts.generate_speech")
     def generate_speech(self, text: str, character: Optional[str] = None, output_filename: str = "output.wav") -> str:
         """
         Generate speech from text using Gemini TTS.
@@ -93,10 +129,26 @@ class TTSAgent:
         Returns:
             str: Path to the generated audio file.
         """
+        # Prepare the content with the character name if provided
+        speech_text = f"{character}: {text}" if character else text
+        trace_utils.annotate(bytes_in=len(speech_text.encode("utf-8")))
+        
+        # Reuse a previously generated clip for the same model, text, voice and config
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(
+                kind="tts",
+                model=self.model_name,
+                text=speech_text,
+                voice=self.get_voice_name(character),
+                temperature=self.temperature,
+            )
+            cached_filename = self.cache.get(cache_key, output_filename)
+            if cached_filename:
+                print(f"Audio loaded from cache: {cached_filename}")
+                return cached_filename
+        
         try:
-            # Prepare the content with the character name if provided
-            speech_text = f"{character}: {text}" if character else text
-            
             # Generate content with TTS
             contents = [
                 types.Content(
@@ -108,49 +160,218 @@ class TTSAgent:
             ]
             
             generate_content_config = types.GenerateContentConfig(
-                temperature=1,
+                temperature=self.temperature,
                 response_modalities=["audio"],
                 speech_config=self.get_voice_config(character),
             )
+            
+            if self.streaming:
+                if not output_filename.endswith(".wav"):
+                    output_filename = os.path.splitext(output_filename)[0] + ".wav"
+                # Each (possibly hedged) attempt streams into its own file; the winner is moved into place
+                partial_filename = self.rate_limiter.call(
+                    self.model_name,
+                    lambda cancel: self._stream_to_wav(contents, generate_content_config, output_filename, cancel),
+                    tokens=estimate_tokens(speech_text),
+                    discard=_remove_file,
+                )
+                os.replace(partial_filename, output_filename)
+                trace_utils.annotate(bytes_out=os.path.getsize(output_filename))
+                print(f"Audio saved to: {output_filename}")
+                if cache_key is not None:
+                    self.cache.put(cache_key, output_filename)
+                return output_filename
 
             # Generate the audio
-            response = self.client.models.generate_content(
-                model="gemini-2.5-pro-preview-tts",
-                contents=contents,
-                config=generate_content_config,
+            response = self.rate_limiter.call(
+                self.model_name,
+                lambda cancel: self.client.models.generate_content(
+                    model=self.model_name,
+                    contents=contents,
+                    config=generate_content_config,
+                ),
+                tokens=estimate_tokens(speech_text),
             )
 
             # Extract and save the audio data
-            if (response.candidates and 
-                response.candidates[0].content and 
-                response.candidates[0].content.parts and
-                response.candidates[0].content.parts[0].inline_data):
-                
-                inline_data = response.candidates[0].content.parts[0].inline_data
-                data_buffer = inline_data.data
-                
-                # Convert to WAV if needed
-                file_extension = mimetypes.guess_extension(inline_data.mime_type)
-                if file_extension is None or file_extension != ".wav":
-                    data_buffer = self.convert_to_wav(data_buffer, inline_data.mime_type)
-                    file_extension = ".wav"
-                
-                # Ensure the output filename has the right extension
-                if not output_filename.endswith(".wav"):
-                    output_filename = os.path.splitext(output_filename)[0] + ".wav"
-                
-                # Save the file
-                with open(output_filename, "wb") as f:
-                    f.write(data_buffer)
-                
-                print(f"Audio saved to: {output_filename}")
-                return output_filename
-            else:
-                raise ValueError("No audio data found in response")
+            data_buffer, mime_type = self._extract_audio(response)
+            
+            # Convert to WAV if needed
+            file_extension = mimetypes.guess_extension(mime_type)
+            if file_extension is None or file_extension != ".wav":
+                data_buffer = self.convert_to_wav(data_buffer, mime_type)
+                file_extension = ".wav"
+            
+            # Ensure the output filename has the right extension
+            if not output_filename.endswith(".wav"):
+                output_filename = os.path.splitext(output_filename)[0] + ".wav"
+            
+            # Save the file
+            with open(output_filename, "wb") as f:
+                f.write(data_buffer)
+            trace_utils.annotate(bytes_out=len(data_buffer))
+            
+            print(f"Audio saved to: {output_filename}")
+            if cache_key is not None:
+                self.cache.put(cache_key, output_filename)
+            return output_filename
                 
         except Exception as e:
             print(f"Error generating speech: {e}")
-            # Fallback: create an empty file to avoid breaking the pipeline
+            # The caller records the failure; an empty placeholder would hide it
+            raise
+    
+    def _stream_to_wav(self, contents, generate_content_config, output_filename: str, cancel: Optional[threading.Event] = None) -> str:
+        """
+        Stream a TTS response straight into a WAV file next to ``output_filename``.
+        
+        PCM chunks are appended as they arrive after a placeholder header, and the RIFF
+        and data sizes are patched in once the stream ends, so memory use stays constant
+        however long the audio is. The stream is closed early if ``cancel`` is set.
+        
+        Returns:
+            str: The path of the finished file, which the caller moves into place.
+        """
+        start = time.monotonic()
+        data_size = 0
+        partial_filename = f"{output_filename}.{uuid.uuid4().hex}.part"
+        try:
+            with open(partial_filename, "wb") as f:
+                stream = self.client.models.generate_content_stream(
+                    model=self.model_name,
+                    contents=contents,
+                    config=generate_content_config,
+                )
+                try:
+                    for chunk in stream:
+                        if cancel is not None and cancel.is_set():
+                            raise CallCancelled(f"Stream for {output_filename} cancelled")
+                        try:
+                            data, mime_type = self._extract_audio(chunk)
+                        except ValueError:
+                            # Some chunks only carry metadata
+                            continue
+                        if data_size == 0:
+                            self.ttfb[output_filename] = time.monotonic() - start
+                            f.write(self.convert_to_wav(b"", mime_type))
+                        f.write(data)
+                        data_size += len(data)
+                finally:
+                    # Closing the stream releases its connection straight away
+                    if hasattr(stream, "close"):
+                        stream.close()
+                
+                if data_size == 0:
+                    raise ValueError("No audio data found in response")
+                # Patch the RIFF chunk size and the data chunk size now that the length is known
+                f.seek(4)
+                f.write(struct.pack("<I", 36 + data_size))
+                f.seek(40)
+                f.write(struct.pack("<I", data_size))
+        except BaseException:
+            _remove_file(partial_filename)
+            raise
+        return partial_filename
+    
+    def split_exchanges(self, lines: List[Tuple[str, str]]) -> List[List[Tuple[str, str]]]:
+        """
+        Split a scene's dialogue into consecutive exchanges that fit in one TTS request.
+        
+        Args:
+            lines (List[Tuple[str, str]]): (character, text) pairs in dialogue order.
+            
+        Returns:
+            List[List[Tuple[str, str]]]: Groups of lines with at most
+            MAX_SPEAKERS_PER_REQUEST distinct characters each.
+        """
+        exchanges = []
+        for character, text in lines:
+            speakers = {speaker for speaker, _ in exchanges[-1]} if exchanges else set()
+            if not exchanges or (character not in speakers and len(speakers) >= MAX_SPEAKERS_PER_REQUEST):
+                exchanges.append([])
+            exchanges[-1].append((character, text))
+        return exchanges
+    
+    @trace_utils.traced("tts", "tts.generate_scene_speech")
+    def generate_scene_speech(self, lines: List[Tuple[str, str]], output_filename: str = "scene.wav") -> str:
+        """
+        Generate one audio track for a whole dialogue exchange using multi-speaker TTS.
+        
+        Each exchange of up to two characters is sent as a single request with the right
+        voice for every character, instead of one request per line.
+        
+        Args:
+            lines (List[Tuple[str, str]]): (character, text) pairs in dialogue order.
+            output_filename (str): The filename to save the scene track.
+            
+        Returns:
+            str: Path to the generated audio file.
+        """
+        if not output_filename.endswith(".wav"):
+            output_filename = os.path.splitext(output_filename)[0] + ".wav"
+        
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(
+                kind="tts_scene",
+                model=self.model_name,
+                lines=lines,
+                voices=[self.get_voice_name(character) for character, _ in lines],
+                temperature=self.temperature,
+            )
+            cached_filename = self.cache.get(cache_key, output_filename)
+            if cached_filename:
+                print(f"Audio loaded from cache: {cached_filename}")
+                return cached_filename
+        
+        try:
+            pcm_chunks = []
+            mime_type = None
+            for exchange in self.split_exchanges(lines):
+                characters = list(dict.fromkeys(character for character, _ in exchange))
+                transcript = "\n".join(f"{character}: {text}" for character, text in exchange)
+                trace_utils.count("bytes_in", len(transcript.encode("utf-8")))
+                
+                response = self.rate_limiter.call(
+                    self.model_name,
+                    lambda cancel: self.client.models.generate_content(
+                        model=self.model_name,
+                        contents=[
+                            types.Content(
+                                role="user",
+                                parts=[
+                                    types.Part.from_text(text=transcript),
+                                ],
+                            ),
+                        ],
+                        config=types.GenerateContentConfig(
+                            temperature=self.temperature,
+                            response_modalities=["audio"],
+                            speech_config=self.get_voice_config(characters=characters),
+                        ),
+                    ),
+                    tokens=estimate_tokens(transcript),
+                )
+                data, chunk_mime_type = self._extract_audio(response)
+                mime_type = mime_type or chunk_mime_type
+                pcm_chunks.append(data)
+            
+            # Gemini returns raw PCM, so the exchanges can be joined before adding one header
             with open(output_filename, "wb") as f:
-                f.write(b"")
-            return output_filename
\ No newline at end of file
+                f.write(self.convert_to_wav(b"".join(pcm_chunks), mime_type or ""))
+            trace_utils.annotate(bytes_out=os.path.getsize(output_filename))
+            
+            print(f"Audio saved to: {output_filename}")
+            if cache_key is not None:
+                self.cache.put(cache_key, output_filename)
+            return output_filename
+            
+        except Exception as e:
+            print(f"Error generating scene speech: {e}")
+            # The caller records the failure; an empty placeholder would hide it
+            raise
+
+def _remove_file(path: str) -> None:
+    """Delete a file if it exists, e.g. the output of a hedged attempt that lost."""
+    if path and os.path.exists(path):
+        os.remove(path)
\ No newline at end of file
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from .utils import file_utils, scheduler_utils, trace_utils
+
+def load_jobs(path: str) -> List[Dict[str, Any]]:
+    """
+    Read the projects of a batch from a JSONL file.
+
+    Each line is an object with a ``prompt`` and optionally a project ``name`` (defaults
+    to the file name and line number) and an ``output`` video file name.
+
+    Args:
+        path (str): The JSONL file.
+
+    Returns:
+        List[Dict[str, Any]]: One job per non-empty line, with name, prompt and output.
+
+    Raises:
+        ValueError: If a line is not valid JSON, has no prompt, or reuses a project name.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    jobs = []
+    names = set()
+    with open(path, 'r') as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{number}: invalid JSON ({e})")
+            if not isinstance(entry, dict) or not entry.get('prompt'):
+                raise ValueError(f"{path}:{number}: expected an object with a 'prompt'")
+            name = str(entry.get('name') or f"{stem}_{number:03d}")
+            if name in names:
+                raise ValueError(f"{path}:{number}: duplicate project name '{name}'")
+            names.add(name)
+            jobs.append({'name': name, 'prompt': entry['prompt'], 'output': entry.get('output') or "final_video.mp4"})
+    return jobs
+
+class BatchStatus:
+    """Per-project state of a batch, rewritten to a JSON file on every change."""
+
+    def __init__(self, path: str, jobs: List[Dict[str, Any]], previous: Optional[Dict[str, Any]] = None):
+        self.path = path
+        self.projects = {job['name']: dict((previous or {}).get(job['name']) or {'state': 'pending'}) for job in jobs}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load(path: str) -> Dict[str, Any]:
+        """Read the project states of an earlier run, if its status file exists."""
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f).get('projects', {})
+
+    def update(self, name: str, **fields: Any) -> None:
+        with self._lock:
+            self.projects[name].update(fields)
+            self._write()
+
+    def _write(self) -> None:
+        counts = {}
+        for entry in self.projects.values():
+            counts[entry['state']] = counts.get(entry['state'], 0) + 1
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = file_utils.mkstemp(directory, prefix=".status")
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'counts': counts, 'projects': self.projects}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+def run_batch(jobs: List[Dict[str, Any]], config: Dict[str, Any], status_path: str, max_projects: Optional[int] = None, resume: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    Run many projects in one process through shared worker pools.
+
+    Every project runs the dag pipeline, but its TTS, image, ComfyUI and encode tasks go
+    to pools shared by the whole batch and served round-robin between projects, so the
+    batch as a whole stays within ``scheduler.limits`` and the shared Gemini rate
+    limiter. A project that fails is recorded as failed and the others carry on.
+
+    Args:
+        jobs (List[Dict[str, Any]]): Projects from ``load_jobs``.
+        config (Dict[str, Any]): The configuration shared by every project.
+        status_path (str): JSON file that tracks the state of every project.
+        max_projects (int, optional): Projects in progress at once (defaults to
+            ``batch.max_projects``).
+        resume (bool): Skip projects that finished in an earlier run with this status file.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: The final state of every project.
+    """
+    from .project import Project, dag_limits
+    if max_projects is None:
+        max_projects = config.get('batch', {}).get('max_projects', 8)
+    status = BatchStatus(status_path, jobs, BatchStatus.load(status_path) if resume else None)
+    pools = scheduler_utils.SharedPools(dag_limits(config), default_limit=config.get('concurrency', {}).get('workers', 4))
+
+    def _run(job):
+        name = job['name']
+        previous = status.projects[name]
+        if resume and previous.get('state') == 'done' and previous.get('video') and os.path.exists(previous['video']):
+            print(f"[{name}] already done, skipping")
+            return
+        start = time.time()
+        status.update(name, state='running', started=start, error=None)
+        try:
+            with trace_utils.span("batch.project", "stage", project=name):
+                project = Project(name, config)
+                if not resume:
+                    project.initialize()
+                video_path = project.generate_dag(job['prompt'], job['output'], pools=pools)
+            if project.failures:
+                raise RuntimeError(f"{len(project.failures)} item(s) failed, e.g. {project.failures[0][1]}: {project.failures[0][2]}")
+        except Exception as e:
+            traceback.print_exc()
+            status.update(name, state='failed', finished=time.time(), seconds=round(time.time() - start, 2), error=f"{type(e).__name__}: {e}")
+            print(f"[{name}] failed: {e}")
+            return
+        status.update(name, state='done', finished=time.time(), seconds=round(time.time() - start, 2), video=video_path)
+        print(f"[{name}] done in {time.time() - start:.1f}s: {video_path}")
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, max_projects), thread_name_prefix="batch") as executor:
+            list(executor.map(_run, jobs))
+    finally:
+        pools.shutdown()
+    return status.projects
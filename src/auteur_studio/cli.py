@@ -1,8 +1,27 @@
 import click
-from .project import Project
 from .config import load_config
+from .utils import trace_utils
 import os
 
+def _load_config(config, concurrency=None, resume=False):
+    """Load the config file and apply command-line overrides."""
+    cfg = load_config(config)
+    if concurrency is not None:
+        cfg.setdefault('concurrency', {})['workers'] = concurrency
+    if resume:
+        cfg.setdefault('pipeline', {})['incremental'] = True
+    return cfg
+
+def _project(project_name, cfg):
+    """Create the project; the pipeline modules are imported here so ``auteur --help`` stays fast."""
+    from .project import Project
+    return Project(project_name, cfg)
+
+def _check_failures(project):
+    """Exit with an error if any item of the run failed, so scripts don't mistake a partial video for a clean one."""
+    if project.failures:
+        raise click.ClickException(f"{len(project.failures)} item(s) failed; see the summary above")
+
 @click.group()
 def cli():
     """Auteur Studio - AI-powered animation pipeline."""
@@ -14,7 +33,7 @@ def cli():
 def init(project_name, config):
     """Initialize a new project."""
     cfg = load_config(config)
-    project = Project(project_name, cfg)
+    project = _project(project_name, cfg)
     project.initialize()
     click.echo(f"Project {project_name} initialized at {project.project_root}.")
 
@@ -25,56 +44,195 @@ def init(project_name, config):
 def generate_story(project_name, prompt, config):
     """Generate a story for the project."""
     cfg = load_config(config)
-    project = Project(project_name, cfg)
+    project = _project(project_name, cfg)
     project.generate_story(prompt)
+    project.write_trace()
     click.echo(f"Story generated for {project_name}.")
 
 @cli.command()
 @click.argument('project_name')
 @click.option('--config', default=None, help='Path to config file.')
-def generate_audio(project_name, config):
+@click.option('--concurrency', type=int, default=None, help='Number of parallel generation calls.')
+@click.option('--resume', is_flag=True, help='Only redo items whose inputs changed or whose outputs are missing.')
+def generate_audio(project_name, config, concurrency, resume):
     """Generate audio for the project."""
-    cfg = load_config(config)
-    project = Project(project_name, cfg)
+    cfg = _load_config(config, concurrency, resume)
+    project = _project(project_name, cfg)
     project.generate_audio()
+    project.write_trace()
     click.echo(f"Audio generated for {project_name}.")
+    _check_failures(project)
 
 @cli.command()
 @click.argument('project_name')
 @click.option('--config', default=None, help='Path to config file.')
-def generate_animation(project_name, config):
+@click.option('--concurrency', type=int, default=None, help='Number of parallel generation calls.')
+@click.option('--resume', is_flag=True, help='Only redo items whose inputs changed or whose outputs are missing.')
+def generate_animation(project_name, config, concurrency, resume):
     """Generate animation for the project."""
-    cfg = load_config(config)
-    project = Project(project_name, cfg)
+    cfg = _load_config(config, concurrency, resume)
+    project = _project(project_name, cfg)
     project.generate_animation()
+    project.write_trace()
     click.echo(f"Animation generated for {project_name}.")
+    _check_failures(project)
 
 @cli.command()
 @click.argument('project_name')
 @click.option('--output', default="final_video.mp4", help='Output video filename.')
 @click.option('--config', default=None, help='Path to config file.')
-def compile_video(project_name, output, config):
+@click.option('--resume', is_flag=True, help='Skip compiling if none of the assets changed.')
+def compile_video(project_name, output, config, resume):
     """Compile the video for the project."""
-    cfg = load_config(config)
-    project = Project(project_name, cfg)
+    cfg = _load_config(config, resume=resume)
+    project = _project(project_name, cfg)
     video_path = project.compile_video(output)
+    project.write_trace()
     click.echo(f"Video compiled: {video_path}")
+    _check_failures(project)
 
 @cli.command()
 @click.argument('project_name')
 @click.option('--prompt', required=True, help='The story prompt.')
 @click.option('--output', default="final_video.mp4", help='Output video filename.')
 @click.option('--config', default=None, help='Path to config file.')
-def generate(project_name, prompt, output, config):
+@click.option('--concurrency', type=int, default=None, help='Number of parallel generation calls.')
+@click.option('--resume', is_flag=True, help='Only redo items whose inputs changed or whose outputs are missing.')
+@click.option('--scheduler', type=click.Choice(['stages', 'dag']), default=None, help='Run stage by stage, or as a graph of per-scene tasks.')
+def generate(project_name, prompt, output, config, concurrency, resume, scheduler):
     """Run the entire pipeline: story, audio, animation, video."""
+    cfg = _load_config(config, concurrency, resume)
+    project = _project(project_name, cfg)
+    if not resume:
+        project.initialize()
+    try:
+        if (scheduler or cfg.get('scheduler', {}).get('mode', 'stages')) == 'dag':
+            video_path = project.generate_dag(prompt, output)
+        else:
+            if cfg.get('story', {}).get('streaming', False):
+                project.generate_story_streaming(prompt)
+            else:
+                project.generate_story(prompt)
+            project.generate_audio()
+            project.generate_animation()
+            video_path = project.compile_video(output)
+    finally:
+        # Keep the trace of failed runs too; they are the ones worth profiling
+        trace_path = project.write_trace()
+    click.echo(trace_utils.format_summary(trace_utils.summarize(trace_utils.load_trace(trace_path))))
+    click.echo(f"Trace written to {trace_path} (run 'auteur profile {project_name}' for the critical path)")
+    click.echo(f"Video compiled: {video_path}")
+    _check_failures(project)
+
+@cli.command()
+@click.argument('prompts_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--config', default=None, help='Path to config file.')
+@click.option('--concurrency', type=int, default=None, help='Number of parallel generation calls.')
+@click.option('--projects', 'max_projects', type=int, default=None, help='Projects in progress at once (defaults to batch.max_projects).')
+@click.option('--resume', is_flag=True, help='Skip projects that already finished and only redo changed items of the rest.')
+@click.option('--status', 'status_path', default=None, help='Per-project status file (defaults to <prompts file>.status.json).')
+def batch(prompts_file, config, concurrency, max_projects, resume, status_path):
+    """Run every project in a JSONL file ({"name", "prompt", "output"} per line) in one process."""
+    from .batch import load_jobs, run_batch
+    cfg = _load_config(config, concurrency, resume)
+    try:
+        jobs = load_jobs(prompts_file)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    status_path = status_path or os.path.splitext(prompts_file)[0] + '.status.json'
+    try:
+        projects = run_batch(jobs, cfg, status_path, max_projects=max_projects, resume=resume)
+    finally:
+        # One trace for the whole batch, since every project shares the same pools
+        trace_path = trace_utils.get_tracer().write_chrome_trace(os.path.splitext(prompts_file)[0] + '.trace.json')
+    failed = [name for name, entry in projects.items() if entry['state'] == 'failed']
+    click.echo(f"{len(projects) - len(failed)} of {len(projects)} project(s) done; status in {status_path}, trace in {trace_path}")
+    for name in failed:
+        click.echo(f"  - {name}: {projects[name].get('error')}")
+    if failed:
+        raise click.ClickException(f"{len(failed)} project(s) failed")
+
+@cli.command()
+@click.argument('project_name')
+@click.option('--prompt', required=True, help='The story prompt.')
+@click.option('--output', default="final_video.mp4", help='Output video filename.')
+@click.option('--config', default=None, help='Path to config file.')
+@click.option('--queue', 'queue_path', default=None, help='Work queue database (defaults to queue.path).')
+@click.option('--wait', is_flag=True, help='Wait until workers have finished every task of the project.')
+def submit(project_name, prompt, output, config, queue_path, wait):
+    """Write the story and queue the project's scene work for 'auteur worker' processes."""
+    from .utils import queue_utils
+    from .worker import submit_project
     cfg = load_config(config)
-    project = Project(project_name, cfg)
+    queue = queue_utils.get_work_queue(cfg, queue_path)
+    project = _project(project_name, cfg)
     project.initialize()
-    project.generate_story(prompt)
-    project.generate_audio()
-    project.generate_animation()
-    video_path = project.compile_video(output)
-    click.echo(f"Video compiled: {video_path}")
+    count = submit_project(project, prompt, queue, output, max_attempts=cfg.get('queue', {}).get('max_attempts', 3))
+    project.write_trace()
+    click.echo(f"Queued {count} task(s) for {project_name} in {queue.path}.")
+    if wait:
+        counts = queue.wait(project_name, cfg.get('queue', {}).get('poll_interval', 1.0))
+        _echo_queue_status(queue, project_name)
+        if counts.get('failed'):
+            raise click.ClickException(f"{counts['failed']} task(s) of {project_name} failed")
+
+@cli.command()
+@click.option('--config', default=None, help='Path to config file.')
+@click.option('--queue', 'queue_path', default=None, help='Work queue database (defaults to queue.path).')
+@click.option('--kinds', default=None, help='Comma-separated task kinds to run (tts, image, comfyui, render); all by default.')
+@click.option('--processes', type=int, default=1, help='Number of local worker processes.')
+@click.option('--exit-when-idle', is_flag=True, help='Exit once no task is pending or running.')
+def worker(config, queue_path, kinds, processes, exit_when_idle):
+    """Run queued scene tasks; start one or more on every machine that shares the queue."""
+    from .utils import queue_utils
+    from .worker import run_workers
+    cfg = load_config(config)
+    queue_config = cfg.get('queue', {})
+    queue = queue_utils.get_work_queue(cfg, queue_path)
+    kinds = [kind.strip() for kind in kinds.split(',')] if kinds else None
+    run_workers(
+        processes,
+        queue,
+        cfg,
+        kinds=kinds,
+        lease_seconds=queue_config.get('lease_seconds', 60),
+        poll_interval=queue_config.get('poll_interval', 1.0),
+        exit_when_idle=exit_when_idle,
+    )
+
+@cli.command()
+@click.argument('project_name')
+@click.option('--config', default=None, help='Path to config file.')
+@click.option('--queue', 'queue_path', default=None, help='Work queue database (defaults to queue.path).')
+def queue_status(project_name, config, queue_path):
+    """Show the state of a project's queued tasks."""
+    from .utils import queue_utils
+    cfg = load_config(config)
+    _echo_queue_status(queue_utils.get_work_queue(cfg, queue_path), project_name)
+
+def _echo_queue_status(queue, project_name):
+    """Print the task counts of a project and the errors of its failed tasks."""
+    counts = queue.counts(project_name)
+    click.echo(f"{project_name}: " + ", ".join(f"{counts.get(state, 0)} {state}" for state in ('pending', 'leased', 'done', 'failed')))
+    for task in queue.tasks(project_name):
+        if task['state'] == 'failed':
+            click.echo(f"  - {task['name']}: {task['error']}")
+        elif task['name'] == 'concat' and task['state'] == 'done':
+            click.echo(f"Video compiled: {task['result']['video']}")
+
+@cli.command()
+@click.argument('project_name')
+@click.option('--config', default=None, help='Path to config file.')
+def profile(project_name, config):
+    """Report per-stage timings and the critical path of the project's last run."""
+    cfg = load_config(config)
+    trace_path = os.path.join(cfg['paths']['project_root'], project_name, 'trace.json')
+    if not os.path.exists(trace_path):
+        raise click.ClickException(f"No trace found at {trace_path}; run a pipeline command first.")
+    spans = trace_utils.load_trace(trace_path)
+    click.echo(trace_utils.format_summary(trace_utils.summarize(spans)))
+    click.echo("")
+    click.echo(trace_utils.format_critical_path(spans))
 
 if __name__ == '__main__':
     cli()
\ No newline at end of file
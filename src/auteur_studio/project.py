@@ -1,84 +1,360 @@
 import os
 import json
-from typing import Dict, Any, List
-from .agents.director_agent import DirectorAgent
-from .agents.tts_agent import TTSAgent
-from .agents.image_agent import ImageAgent
-from .utils import comfyui_utils, video_utils
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Tuple
+# Agents (google-genai), comfyui_utils (requests) and audio_utils (numpy) are imported where
+# they are first needed, so commands that don't use them start quickly
+from .utils import video_utils, image_utils, parallel_utils, cache_utils, manifest_utils, scheduler_utils, rate_limit_utils, store_utils, trace_utils
 
 class Project:
-    def __init__(self, name: str, config: Dict[str, Any]):
+    def __init__(self, name: str, config: Dict[str, Any], client=None):
         self.name = name
         self.config = config
         self.project_root = os.path.join(config['paths']['project_root'], name)
         self.assets_dir = os.path.join(self.project_root, 'assets')
         self.script_path = os.path.join(self.project_root, 'script.json')
         self.story = None
+        self.max_workers = config.get('concurrency', {}).get('workers', 4)
+        
+        # (stage, item, error) of every item that failed, so callers can tell a partial run from a clean one
+        self.failures = []
+        
+        # In incremental mode, items whose inputs are unchanged since the last run are skipped
+        self.incremental = config.get('pipeline', {}).get('incremental', False)
         
         # Create directories
         os.makedirs(self.project_root, exist_ok=True)
         os.makedirs(self.assets_dir, exist_ok=True)
         
-        # Initialize agents
-        self.director = DirectorAgent(api_key=config['gemini']['api_key'], model=config['gemini']['model'])
-        self.tts_agent = TTSAgent(api_key=config['gemini']['api_key'])
-        self.image_agent = ImageAgent(api_key=config['gemini']['api_key'])
+        # The story and every scene's asset paths, updated one scene at a time; script.json is an export of it
+        self.store = store_utils.ProjectStore(os.path.join(self.project_root, 'project.db'))
+        
+        # Input hashes and outputs of every stage, used for resuming; kept in the project store so workers can share it
+        self.manifest = manifest_utils.Manifest(self.store.path, legacy_path=os.path.join(self.project_root, 'manifest.json'))
+        
+        # Spans of every stage, agent call, ComfyUI job and encode, written to trace.json
+        self.trace_path = os.path.join(self.project_root, 'trace.json')
+        trace_utils.configure(config)
+        
+        # Generated assets are shared between projects through the asset cache
+        self.cache = cache_utils.get_asset_cache(config)
+        
+        # One rate limiter for all agents, so every call to a model counts against the same quota
+        self.rate_limiter = rate_limit_utils.get_rate_limiter(config)
+        
+        # Agents are created on first use. A stand-in client with the same models.generate_content
+        # interface can be passed instead of the Gemini client, for tests and offline benchmarks
+        self.client = client
+        self._agents = {}
+        self._agents_lock = threading.Lock()
+    
+    @property
+    def director(self):
+        """The story agent, created on first use."""
+        return self._agent('director')
+    
+    @property
+    def tts_agent(self):
+        """The speech agent, created on first use."""
+        return self._agent('tts')
+    
+    @property
+    def image_agent(self):
+        """The image agent, created on first use."""
+        return self._agent('image')
+    
+    def _agent(self, name: str):
+        """Return an agent, importing its module and creating it the first time it is needed."""
+        with self._agents_lock:
+            if name not in self._agents:
+                api_key = self.config['gemini']['api_key']
+                # Agents share one pooled Gemini client per timeout (see client_utils)
+                http_config = self.config.get('http')
+                if name == 'director':
+                    from .agents.director_agent import DirectorAgent
+                    story_config = self.config.get('story', {})
+                    agent = DirectorAgent(
+                        api_key=api_key,
+                        model=self.config['gemini']['model'],
+                        rate_limiter=self.rate_limiter,
+                        client=self.client,
+                        http_config=http_config,
+                        cache=self.cache,
+                        thinking_budget=story_config.get('thinking_budget', -1),
+                        repair_attempts=story_config.get('repair_attempts', 1),
+                    )
+                elif name == 'tts':
+                    from .agents.tts_agents import TTSAgent
+                    agent = TTSAgent(
+                        api_key=api_key,
+                        cache=self.cache,
+                        client=self.client,
+                        streaming=self.config.get('tts', {}).get('streaming', False),
+                        rate_limiter=self.rate_limiter,
+                        http_config=http_config,
+                    )
+                else:
+                    from .agents.image_agent import ImageAgent
+                    agent = ImageAgent(api_key=api_key, cache=self.cache, rate_limiter=self.rate_limiter, client=self.client, http_config=http_config)
+                self._agents[name] = agent
+            return self._agents[name]
     
     def initialize(self):
         """Initialize the project structure."""
         # We already created directories, so just ensure the script file is reset if it exists.
         if os.path.exists(self.script_path):
             os.remove(self.script_path)
+        self.store.clear()
+    
+    def _load_story(self) -> Dict[str, Any]:
+        """Load the story from the project store, importing script.json for projects that predate it."""
+        if self.story is None:
+            self.story = self.store.load_story()
+        if self.story is None:
+            with open(self.script_path, 'r') as f:
+                self.story = json.load(f)
+            self.store.save_story(self.story)
+        return self.story
+    
+    def _set_story(self, story: Dict[str, Any]) -> None:
+        """Store a newly written story and export it to script.json."""
+        self.story = story
+        self.store.save_story(story)
+        self._export_script()
+    
+    def _save_scene(self, scene: Dict[str, Any], **fields: Any) -> None:
+        """Set fields of a scene and record them in the project store, without rewriting the rest of the story."""
+        scene.update(fields)
+        # Scenes prefetched while the story streams in are not part of it yet; their stage records them later
+        for position, item in enumerate((self.story or {}).get('scenes', [])):
+            if item is scene:
+                self.store.update_scene(position, fields)
+                return
+    
+    def _report_failures(self, stage: str, failures: List[Tuple[str, Any]]) -> None:
+        """Print the items of a stage that failed and keep them in ``self.failures``."""
+        parallel_utils.report_failures(stage, failures)
+        self.failures.extend((stage, label, error) for label, error in failures)
     
+    def _export_script(self) -> None:
+        """Write script.json from the project store, including scenes updated by other workers."""
+        self.store.export(self.script_path)
+    
+    def write_trace(self) -> str:
+        """Write the spans recorded so far as Chrome trace-event JSON and return the path."""
+        return trace_utils.get_tracer().write_chrome_trace(self.trace_path)
+    
+    def _is_fresh(self, stage: str, key: str, input_hash: str) -> bool:
+        """Check whether an item can be skipped because nothing changed since it last completed."""
+        # Work already done earlier in this run (e.g. while the story streamed in) is always reused
+        if not self.incremental and (stage, str(key)) not in self.manifest.completed:
+            return False
+        return self.manifest.is_fresh(stage, key, input_hash)
+    
+    @trace_utils.traced("stage")
     def generate_story(self, prompt: str):
         """Generate the story and save it to the project directory."""
-        self.story = self.director.generate_story(prompt)
-        with open(self.script_path, 'w') as f:
-            json.dump(self.story, f, indent=2)
+        input_hash = self.manifest.hash_inputs(prompt=prompt, **self.director.settings())
+        if self._is_fresh('story', 'story', input_hash):
+            self.story = None
+            self._load_story()
+            print("Story unchanged, reusing existing script")
+            return
+        
+        self._set_story(self.director.generate_story(prompt))
+        self.manifest.record('story', 'story', input_hash, [self.script_path])
     
+    @trace_utils.traced("stage")
+    def generate_story_streaming(self, prompt: str):
+        """
+        Generate the story while already producing assets for the scenes that are complete.
+        
+        TTS (per-line mode) and Gemini image jobs for a scene start as soon as the scene
+        has streamed in. The following generate_audio and generate_images calls pick up
+        that work instead of repeating it.
+        """
+        input_hash = self.manifest.hash_inputs(prompt=prompt, **self.director.settings())
+        if self._is_fresh('story', 'story', input_hash):
+            return self.generate_story(prompt)
+        
+        prefetch_audio = self.config.get('tts', {}).get('mode', 'line') == 'line'
+        prefetch_images = not self.config['comfyui'].get('enabled', False)
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        
+        def _on_scene(scene):
+            print(f"Scene {scene.get('id')} ready, starting its assets")
+            if prefetch_audio:
+                for i, character, text in _parse_dialogue(scene):
+                    if not self._is_fresh('audio', f"{scene['id']}:{i}", self._line_hash(character, text)):
+                        executor.submit(self._speak_line, scene, i, character, text)
+            if prefetch_images and not self._is_fresh('images', scene['id'], self._image_hash(scene)):
+                executor.submit(self._draw_scene, scene)
+        
+        try:
+            story = self.director.generate_story_stream(prompt, on_scene=_on_scene)
+        finally:
+            executor.shutdown(wait=True)
+        
+        self._set_story(story)
+        self.manifest.record('story', 'story', input_hash, [self.script_path])
+    
+    @trace_utils.traced("stage")
     def generate_audio(self):
         """Generate audio for all dialogue in the story."""
-        if self.story is None:
-            with open(self.script_path, 'r') as f:
-                self.story = json.load(f)
+        self._load_story()
         
+        # Scene mode sends each dialogue exchange as one multi-speaker request
+        if self.config.get('tts', {}).get('mode', 'line') == 'scene':
+            return self._generate_scene_audio()
+        
+        # Collect every dialogue line first so the TTS calls can run in parallel
+        lines = []
         for scene in self.story['scenes']:
-            scene_audio_files = []
-            for i, line in enumerate(scene['dialogue']):
-                # Assuming line is in format "character: text"
-                if ':' in line:
-                    character, text = line.split(':', 1)
-                    audio_filename = f"scene_{scene['id']}_line_{i}.wav"
-                    audio_path = os.path.join(self.assets_dir, audio_filename)
-                    self.tts_agent.generate_speech(text=text.strip(), character=character.strip(), output_filename=audio_path)
-                    scene_audio_files.append(audio_path)
-            
-            # Store the audio paths in the scene for later use
-            scene['audio_files'] = scene_audio_files
+            for i, character, text in _parse_dialogue(scene):
+                audio_path = os.path.join(self.assets_dir, f"scene_{scene['id']}_line_{i}.wav")
+                lines.append((scene, i, character, text, audio_path, self._line_hash(character, text)))
+        
+        pending = [n for n, job in enumerate(lines) if not self._is_fresh('audio', f"{job[0]['id']}:{job[1]}", job[5])]
+        
+        def _speak(job):
+            scene, i, character, text, _, _ = job
+            return self._speak_line(scene, i, character, text)
+        
+        results = dict(zip(pending, parallel_utils.run_parallel(_speak, [lines[n] for n in pending], self.max_workers)))
+        
+        # Store the audio paths in the scene for later use, keeping line order
+        for scene in self.story['scenes']:
+            scene['audio_files'] = []
+        failures = []
+        for n, (scene, i, _, _, audio_path, _) in enumerate(lines):
+            if n not in results:
+                scene['audio_files'].append(self.manifest.outputs('audio', f"{scene['id']}:{i}")[0])
+                continue
+            result, error = results[n]
+            audio_path = result or audio_path
+            scene['audio_files'].append(audio_path)
+            if error is None and not parallel_utils.is_valid_asset(audio_path):
+                error = "no audio was generated"
+            if error is not None:
+                failures.append((f"scene {scene['id']} line {i}", error))
+        for scene in self.story['scenes']:
+            self._save_scene(scene, audio_files=scene['audio_files'])
+        self._report_failures("Audio generation", failures)
+        
+        # Report how quickly streamed audio started arriving
+        ttfb = sorted(self.tts_agent.ttfb.get(lines[n][4], 0.0) for n in results if lines[n][4] in self.tts_agent.ttfb)
+        if ttfb:
+            print(f"TTS time to first byte: median {ttfb[len(ttfb) // 2]:.2f}s, max {ttfb[-1]:.2f}s over {len(ttfb)} line(s)")
         
         # Update the script with audio file paths
-        with open(self.script_path, 'w') as f:
-            json.dump(self.story, f, indent=2)
+        self._export_script()
+    
+    def _line_hash(self, character: str, text: str) -> str:
+        """Hash everything that determines the audio of one dialogue line."""
+        return self.manifest.hash_inputs(
+            text=text,
+            character=character,
+            voice=self.tts_agent.get_voice_name(character),
+            model=self.tts_agent.model_name,
+            temperature=self.tts_agent.temperature,
+        )
+    
+    def _speak_line(self, scene: Dict[str, Any], i: int, character: str, text: str) -> str:
+        """Generate the audio of one dialogue line and record it in the manifest."""
+        audio_path = os.path.join(self.assets_dir, f"scene_{scene['id']}_line_{i}.wav")
+        audio_path = self.tts_agent.generate_speech(text=text, character=character, output_filename=audio_path)
+        # Record each line as soon as it finishes so a crash keeps the progress made so far
+        status = 'done' if parallel_utils.is_valid_asset(audio_path) else 'failed'
+        self.manifest.record('audio', f"{scene['id']}:{i}", self._line_hash(character, text), [audio_path], status)
+        return audio_path
+    
+    def _scene_speech_hash(self, scene: Dict[str, Any]) -> str:
+        """Hash everything that determines the multi-speaker dialogue track of a scene."""
+        lines = [(character, text) for _, character, text in _parse_dialogue(scene)]
+        return self.manifest.hash_inputs(
+            lines=lines,
+            voices=[self.tts_agent.get_voice_name(character) for character, _ in lines],
+            model=self.tts_agent.model_name,
+            temperature=self.tts_agent.temperature,
+            mode='scene',
+        )
+    
+    def _speak_scene(self, scene: Dict[str, Any]) -> str:
+        """Generate the multi-speaker dialogue track of one scene and record it in the manifest."""
+        lines = [(character, text) for _, character, text in _parse_dialogue(scene)]
+        audio_path = os.path.join(self.assets_dir, f"scene_{scene['id']}_dialogue.wav")
+        audio_path = self.tts_agent.generate_scene_speech(lines, output_filename=audio_path)
+        status = 'done' if parallel_utils.is_valid_asset(audio_path) else 'failed'
+        self.manifest.record('audio', f"{scene['id']}:scene", self._scene_speech_hash(scene), [audio_path], status)
+        return audio_path
     
+    def _generate_scene_audio(self):
+        """Generate one dialogue track per scene with multi-speaker TTS requests."""
+        scenes = []
+        for scene in self.story['scenes']:
+            if not _parse_dialogue(scene):
+                self._save_scene(scene, audio_files=[])
+            elif self._is_fresh('audio', f"{scene['id']}:scene", self._scene_speech_hash(scene)):
+                self._save_scene(scene, audio_files=self.manifest.outputs('audio', f"{scene['id']}:scene"))
+            else:
+                scenes.append(scene)
+        
+        failures = []
+        for scene, (audio_path, error) in zip(scenes, parallel_utils.run_parallel(self._speak_scene, scenes, self.max_workers)):
+            self._save_scene(scene, audio_files=[audio_path] if audio_path else [])
+            if error is None and not parallel_utils.is_valid_asset(audio_path):
+                error = "no audio was generated"
+            if error is not None:
+                failures.append((f"scene {scene['id']}", error))
+        self._report_failures("Audio generation", failures)
+        
+        self._export_script()
+    
+    def _image_hash(self, scene: Dict[str, Any]) -> str:
+        """Hash everything that determines the Gemini image of a scene."""
+        prompt = scene.get('image_prompt', scene['description'])
+        return self.manifest.hash_inputs(prompt=prompt, model=self.image_agent.model_name, temperature=self.image_agent.temperature)
+    
+    def _draw_scene(self, scene: Dict[str, Any]) -> str:
+        """Generate the Gemini image of one scene and record it in the manifest."""
+        image_filename = f"scene_{scene['id']}.png"
+        image_path = os.path.join(self.assets_dir, image_filename)
+        
+        # Use the image_prompt from the story, or fallback to description
+        prompt = scene.get('image_prompt', scene['description'])
+        image_path = self.image_agent.generate_image(prompt=prompt, output_filename=image_path)
+        status = 'done' if parallel_utils.is_valid_asset(image_path) else 'failed'
+        self.manifest.record('images', scene['id'], self._image_hash(scene), [image_path], status)
+        return image_path
+    
+    @trace_utils.traced("stage")
     def generate_images(self):
         """Generate images for each scene using Gemini Image Generation."""
-        if self.story is None:
-            with open(self.script_path, 'r') as f:
-                self.story = json.load(f)
+        self._load_story()
         
+        scenes = []
         for scene in self.story['scenes']:
-            image_filename = f"scene_{scene['id']}.png"
-            image_path = os.path.join(self.assets_dir, image_filename)
-            
-            # Use the image_prompt from the story, or fallback to description
-            prompt = scene.get('image_prompt', scene['description'])
-            self.image_agent.generate_image(prompt=prompt, output_filename=image_path)
-            scene['image_file'] = image_path
+            if self._is_fresh('images', scene['id'], self._image_hash(scene)):
+                self._save_scene(scene, image_file=self.manifest.outputs('images', scene['id'])[0])
+            else:
+                scenes.append(scene)
+        results = parallel_utils.run_parallel(self._draw_scene, scenes, self.max_workers)
+        
+        failures = []
+        for scene, (image_path, error) in zip(scenes, results):
+            self._save_scene(scene, image_file=image_path or os.path.join(self.assets_dir, f"scene_{scene['id']}.png"))
+            if error is None and not parallel_utils.is_valid_asset(image_path):
+                error = "no image was generated"
+            if error is not None:
+                failures.append((f"scene {scene['id']}", error))
+        self._report_failures("Image generation", failures)
         
         # Update the script with image file paths
-        with open(self.script_path, 'w') as f:
-            json.dump(self.story, f, indent=2)
+        self._export_script()
     
+    @trace_utils.traced("stage")
     def generate_animation(self):
         """Generate animation frames for each scene using ComfyUI."""
         # This method now uses ComfyUI for more advanced animation if available
@@ -86,63 +362,471 @@ class Project:
         if not self.config['comfyui'].get('enabled', False):
             return self.generate_images()
             
-        if self.story is None:
-            with open(self.script_path, 'r') as f:
-                self.story = json.load(f)
+        self._load_story()
         
-        comfyui_base_url = self.config['comfyui']['base_url']
+        comfyui_config = self.config['comfyui']
+        client = self._comfyui_client()
         
         # Check if ComfyUI is available
-        if not comfyui_utils.connect_to_comfyui(comfyui_base_url):
+        if not client.is_available():
             print("ComfyUI not available, falling back to simple image generation")
             return self.generate_images()
         
-        workflow = comfyui_utils.load_workflow(self.config['comfyui']['workflow_api_json'])
+        from .utils import comfyui_utils
+        template = comfyui_utils.load_workflow(comfyui_config['workflow_api_json'])
         
+        pending = {}
         for scene in self.story['scenes']:
-            # Modify the workflow with the scene's image_prompt
-            # This is a placeholder: the actual modification will depend on the workflow structure
-            prompt = scene.get('image_prompt', scene['description'])
-            
-            # Example modification (adjust based on your workflow structure)
-            if '6' in workflow and 'inputs' in workflow['6'] and 'text' in workflow['6']['inputs']:
-                workflow['6']['inputs']['text'] = prompt
-            
-            # Queue the prompt
-            response = comfyui_utils.queue_prompt(workflow, comfyui_base_url)
-            
-            # Get the image filename from the response (this depends on the workflow)
-            # Example: if the output node has id 14 and output image filename is in 'images'[0]['filename']
-            if '14' in response and 'images' in response['14'] and response['14']['images']:
-                image_filename = response['14']['images'][0]['filename']
-                image_path = comfyui_utils.get_image(image_filename, comfyui_base_url, self.assets_dir)
-                scene['image_file'] = image_path
+            job = self._comfyui_job(scene, template)
+            if job is not None:
+                pending[f"scene_{scene['id']}"] = (scene,) + job
+        
+        def _on_complete(name, image_paths, error):
+            # Record each scene as soon as its images are downloaded
+            scene, _, input_hash, cache_key = pending[name]
+            if error is None:
+                self._record_animation(scene, image_paths[0], input_hash, cache_key)
+        
+        # Optionally pack several scenes into each job to cut per-job overhead on the server
+        pack_size = max(1, comfyui_config.get('pack_size', 1))
+        names = list(pending)
+        jobs = {}
+        routes = {}
+        for start in range(0, len(names), pack_size):
+            group = names[start:start + pack_size]
+            if len(group) == 1:
+                jobs[group[0]] = template.bind(**pending[group[0]][1])
             else:
-                # Fallback to simple image generation
-                image_filename = f"scene_{scene['id']}.png"
-                image_path = os.path.join(self.assets_dir, image_filename)
-                self.image_agent.generate_image(prompt=prompt, output_filename=image_path)
-                scene['image_file'] = image_path
+                job_name = f"batch_{start // pack_size}"
+                jobs[job_name], routes[job_name] = template.pack({name: pending[name][1] for name in group})
+        
+        results = client.run(
+            jobs,
+            self.assets_dir,
+            on_complete=_on_complete,
+            timeout=comfyui_config.get('timeout'),
+            routes=routes,
+        )
+        
+        # Fallback to simple image generation for scenes ComfyUI could not render
+        failed = [pending[name][0] for name, (_, error) in results.items() if error is not None]
+        for name, (_, error) in results.items():
+            if error is not None:
+                print(f"ComfyUI failed for {name} ({error}), falling back to simple image generation")
+        
+        failures = []
+        for scene, (image_path, error) in zip(failed, parallel_utils.run_parallel(self._draw_fallback, failed, self.max_workers)):
+            self._save_scene(scene, image_file=image_path or os.path.join(self.assets_dir, f"scene_{scene['id']}.png"))
+            if error is None and not parallel_utils.is_valid_asset(image_path):
+                error = "no image was generated"
+            if error is not None:
+                failures.append((f"scene {scene['id']}", error))
+        self._report_failures("Animation", failures)
         
         # Update the script with image file paths
-        with open(self.script_path, 'w') as f:
-            json.dump(self.story, f, indent=2)
+        self._export_script()
     
+    def _comfyui_client(self):
+        """Build the dispatcher that runs ComfyUI jobs on the configured server(s)."""
+        from .utils import comfyui_utils
+        comfyui_config = self.config['comfyui']
+        base_urls = comfyui_config.get('base_urls') or [comfyui_config['base_url']]
+        clients = [
+            comfyui_utils.ComfyUIClient(
+                base_url,
+                pool_size=comfyui_config.get('pool_size', 8),
+                timeout=comfyui_config.get('request_timeout', 30),
+                poll_interval=comfyui_config.get('poll_interval', 1.0),
+                use_websocket=comfyui_config.get('use_websocket', True),
+            )
+            for base_url in base_urls
+        ]
+        
+        # With several servers, spread scenes over whichever has the fewest outstanding jobs;
+        # a single server gets every job straight away so its queue never runs dry
+        return comfyui_utils.ComfyUIDispatcher(
+            clients,
+            max_outstanding=comfyui_config.get('max_outstanding', 2) if len(clients) > 1 else None,
+            health_interval=comfyui_config.get('health_interval', 10.0),
+            max_errors=comfyui_config.get('max_errors', 3),
+            recovery_timeout=comfyui_config.get('recovery_timeout', 60.0),
+            poll_interval=comfyui_config.get('poll_interval', 1.0),
+            hedge=comfyui_config.get('hedge', False),
+            hedge_quantile=comfyui_config.get('hedge_quantile', 0.95),
+            hedge_budget=comfyui_config.get('hedge_budget', 0.05),
+        )
+    
+    def _comfyui_job(self, scene: Dict[str, Any], template: "comfyui_utils.WorkflowTemplate"):
+        """
+        Work out the ComfyUI job of a scene.
+        
+        Returns:
+            None if the scene's image could be reused from the manifest or the asset cache
+            (``scene['image_file']`` is then set), otherwise (params, input_hash, cache_key).
+        """
+        comfyui_config = self.config['comfyui']
+        # Each scene gets its own cheap copy of the workflow, since every job is queued up front
+        params = {
+            'prompt': scene.get('image_prompt', scene['description']),
+            'seed': comfyui_config.get('seed'),
+            'width': comfyui_config.get('width'),
+            'height': comfyui_config.get('height'),
+        }
+        params = {key: value for key, value in params.items() if value is not None}
+        workflow = template.bind(**params)
+        
+        input_hash = self.manifest.hash_inputs(workflow=workflow)
+        if self._is_fresh('animation', scene['id'], input_hash):
+            self._save_scene(scene, image_file=self.manifest.outputs('animation', scene['id'])[0])
+            return None
+        
+        # Skip the queue entirely if this exact workflow has been rendered before
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(kind="comfyui", workflow=workflow)
+            cached_path = self.cache.get(cache_key, os.path.join(self.assets_dir, f"scene_{scene['id']}.png"))
+            if cached_path:
+                self._save_scene(scene, image_file=cached_path)
+                self.manifest.record('animation', scene['id'], input_hash, [cached_path])
+                return None
+        return params, input_hash, cache_key
+    
+    def _record_animation(self, scene: Dict[str, Any], image_path: str, input_hash: str, cache_key) -> None:
+        """Store a downloaded ComfyUI image in the scene, the asset cache and the manifest."""
+        self._save_scene(scene, image_file=image_path)
+        if cache_key is not None:
+            self.cache.put(cache_key, image_path)
+        self.manifest.record('animation', scene['id'], input_hash, [image_path])
+    
+    def _draw_fallback(self, scene: Dict[str, Any]) -> str:
+        """Generate a Gemini image for a scene that ComfyUI could not render."""
+        image_path = os.path.join(self.assets_dir, f"scene_{scene['id']}.png")
+        prompt = scene.get('image_prompt', scene['description'])
+        return self.image_agent.generate_image(prompt=prompt, output_filename=image_path)
+    
+    @trace_utils.traced("stage")
+    def assemble_audio(self):
+        """Join each scene's dialogue lines into one scene track and record its exact duration."""
+        self._load_story()
+        
+        scenes = self.story['scenes']
+        failures = []
+        for scene, (result, error) in zip(scenes, parallel_utils.run_parallel(self._assemble_scene, scenes, self.max_workers)):
+            if error is not None:
+                failures.append((f"scene {scene['id']}", error))
+                result = ('', None)
+            self._save_scene(scene, audio_track=result[0], duration=result[1])
+        self._report_failures("Audio assembly", failures)
+        
+        self._export_script()
+    
+    @trace_utils.traced("audio", "audio.assemble_scene")
+    def _assemble_scene(self, scene: Dict[str, Any]) -> Tuple[str, Any]:
+        """Join one scene's dialogue lines into its track; returns (track path, duration)."""
+        from .utils import audio_utils
+        gap_seconds = self.config.get('audio', {}).get('line_gap', 0.3)
+        audio_files = scene.get('audio_files', [])
+        track_path = os.path.join(self.assets_dir, f"scene_{scene['id']}_track.wav")
+        input_hash = self.manifest.hash_inputs(lines=[_file_signature(path) for path in audio_files], gap=gap_seconds)
+        if self._is_fresh('tracks', scene['id'], input_hash):
+            info = audio_utils.read_wav_info(track_path)
+            if info is not None:
+                return track_path, info['duration']
+        duration = audio_utils.assemble_scene_track(audio_files, track_path, gap_seconds)
+        if duration is None:
+            return '', None
+        self.manifest.record('tracks', scene['id'], input_hash, [track_path])
+        return track_path, duration
+    
+    @trace_utils.traced("stage")
     def compile_video(self, output_filename: str = "final_video.mp4") -> str:
         """Compile the final video from all assets."""
-        if self.story is None:
-            with open(self.script_path, 'r') as f:
-                self.story = json.load(f)
+        self._load_story()
+        
+        # Every dialogue line of a scene ends up in its scene track
+        self.assemble_audio()
         
         image_files = []
         audio_files = []
+        durations = []
         for scene in self.story['scenes']:
             image_files.append(scene.get('image_file', ''))
-            # For audio, we might have multiple audio files per scene. We'll combine them?
-            # For simplicity, we'll take the first audio file or none.
-            audio_file = scene.get('audio_files', [])[0] if scene.get('audio_files') else ''
-            audio_files.append(audio_file)
+            audio_files.append(scene.get('audio_track', ''))
+            durations.append(scene.get('duration'))
+        
+        output_path = os.path.join(self.project_root, output_filename)
+        input_hash = self._video_hash(image_files, audio_files)
+        if self._is_fresh('video', output_filename, input_hash):
+            print(f"Video unchanged, reusing {output_path}")
+            return output_path
         
+        video_config = self.config.get('video', {})
+        normalize = video_config.get('normalize', True)
+        if normalize:
+            image_files = self.normalize_images(image_files)
+        video_utils.compile_video(
+            image_files,
+            audio_files,
+            output_path,
+            fps=video_config.get('fps', 24),
+            backend=video_config.get('backend', 'moviepy'),
+            width=video_config.get('width', 1280),
+            height=video_config.get('height', 720),
+            segment_dir=os.path.join(self.project_root, 'segments'),
+            workers=video_config.get('workers'),
+            streaming=video_config.get('streaming', False),
+            durations=durations,
+            normalized=normalize,
+        )
+        print(f"Peak memory while compiling: {video_utils.peak_rss_mb():.1f} MB")
+        self.manifest.record('video', output_filename, input_hash, [output_path])
+        return output_path
+    
+    @trace_utils.traced("stage")
+    def normalize_images(self, image_files: List[str]) -> List[str]:
+        """
+        Resize, letterbox and convert the scene images to the output frame once, in parallel.
+        
+        Frames are kept in the project's frames directory under a hash of their image,
+        so only new or changed images are processed again.
+        
+        Args:
+            image_files (List[str]): The scene images, in order.
+            
+        Returns:
+            List[str]: The frame of each scene, in order.
+        """
+        video_config = self.config.get('video', {})
+        frame_dir = os.path.join(self.project_root, 'frames')
+        frames = image_utils.normalize_images(
+            image_files,
+            frame_dir,
+            width=video_config.get('width', 1280),
+            height=video_config.get('height', 720),
+            workers=video_config.get('workers'),
+        )
+        # Drop frames of images that are no longer used so the directory does not grow forever
+        image_utils.prune_frames(frame_dir, frames)
+        return frames
+    
+    def _video_hash(self, image_files: List[str], audio_files: List[str]) -> str:
+        """Hash everything that determines the final video."""
+        return self.manifest.hash_inputs(
+            images=[_file_signature(path) for path in image_files],
+            audio=[_file_signature(path) for path in audio_files],
+            video=self.config.get('video', {}),
+        )
+    
+    @trace_utils.traced("stage")
+    def generate_dag(self, prompt: str, output_filename: str = "final_video.mp4", pools: "scheduler_utils.SharedPools" = None) -> str:
+        """
+        Run the whole pipeline as a graph of per-scene tasks instead of stage by stage.
+        
+        Once the story is written, every scene gets a TTS task, an image task (ComfyUI or
+        Gemini) and a segment task that assembles the scene track and encodes the scene as
+        soon as both of those are done. The final concat waits for every segment. Each
+        resource class (Gemini TTS, Gemini image, ComfyUI, CPU encode) has its own
+        concurrency limit from ``scheduler.limits``. ComfyUI jobs are submitted one scene
+        at a time, so ``comfyui.pack_size`` does not apply here.
+        
+        Args:
+            prompt (str): The story prompt.
+            output_filename (str): The video file name inside the project directory.
+            pools (SharedPools, optional): Worker pools shared with other projects (see
+                ``auteur batch``); the project gets pools of its own when omitted.
+        
+        Returns:
+            str: The path of the compiled video.
+        """
+        if self.config.get('story', {}).get('streaming', False):
+            self.generate_story_streaming(prompt)
+        else:
+            self.generate_story(prompt)
+        
+        scheduler = scheduler_utils.DAGScheduler(dag_limits(self.config), default_limit=self.max_workers, pools=pools, owner=self.name)
+        animate = self._animator()
+        scenes = self.story['scenes']
+        segment_files = {}
+        failures = []
+        
+        def _segment(n, scene):
+            segment_files[n] = self._scene_segment(scene, failures)
+        
+        def _concat():
+            missing = [scenes[n]['id'] for n in range(len(scenes)) if n not in segment_files]
+            if missing:
+                raise RuntimeError(f"no segment for scene(s) {', '.join(str(scene_id) for scene_id in missing)}")
+            return self._concat_scenes([segment_files[n] for n in range(len(scenes))], output_filename)
+        
+        segment_tasks = []
+        for n, scene in enumerate(scenes):
+            scheduler.add(f"tts:{n}", functools.partial(self._scene_audio, scene, failures), resource='tts')
+            scheduler.add(f"image:{n}", functools.partial(self._scene_image, scene, animate, failures), resource='comfyui' if animate is not None else 'image')
+            scheduler.add(f"segment:{n}", functools.partial(_segment, n, scene), deps=[f"tts:{n}", f"image:{n}"], resource='encode')
+            segment_tasks.append(f"segment:{n}")
+        scheduler.add("concat", _concat, deps=segment_tasks, resource='encode')
+        results = scheduler.run()
+        
+        for name, (_, error) in results.items():
+            if error is not None and name != "concat":
+                kind, n = name.split(':')
+                failures.append((f"scene {scenes[int(n)]['id']} {kind}", error))
+        self._report_failures("Pipeline", failures)
+        
+        self._export_script()
+        
+        output_path, error = results["concat"]
+        if error is not None:
+            raise error
+        print(f"Peak memory while compiling: {video_utils.peak_rss_mb():.1f} MB")
+        return output_path
+    
+    def _animator(self):
+        """Return (ComfyUI dispatcher, workflow template) when ComfyUI is enabled and reachable, else None."""
+        if not self.config['comfyui'].get('enabled', False):
+            return None
+        client = self._comfyui_client()
+        if not client.is_available():
+            print("ComfyUI not available, falling back to simple image generation")
+            return None
+        from .utils import comfyui_utils
+        return client, comfyui_utils.load_workflow(self.config['comfyui']['workflow_api_json'])
+    
+    def _scene_audio(self, scene: Dict[str, Any], failures: List[Tuple[str, Any]]) -> None:
+        """Generate (or reuse) the dialogue audio of one scene into ``scene['audio_files']``."""
+        if self.config.get('tts', {}).get('mode', 'line') == 'scene':
+            key = f"{scene['id']}:scene"
+            if not _parse_dialogue(scene):
+                self._save_scene(scene, audio_files=[])
+            elif self._is_fresh('audio', key, self._scene_speech_hash(scene)):
+                self._save_scene(scene, audio_files=self.manifest.outputs('audio', key))
+            else:
+                try:
+                    audio_path = self._speak_scene(scene)
+                    error = None if parallel_utils.is_valid_asset(audio_path) else "no audio was generated"
+                except Exception as e:
+                    audio_path, error = None, e
+                self._save_scene(scene, audio_files=[audio_path] if audio_path else [])
+                if error is not None:
+                    failures.append((f"scene {scene['id']} audio", error))
+            return
+        
+        audio_files = []
+        for i, character, text in _parse_dialogue(scene):
+            key = f"{scene['id']}:{i}"
+            if self._is_fresh('audio', key, self._line_hash(character, text)):
+                audio_files.append(self.manifest.outputs('audio', key)[0])
+                continue
+            audio_path = os.path.join(self.assets_dir, f"scene_{scene['id']}_line_{i}.wav")
+            try:
+                audio_path = self._speak_line(scene, i, character, text) or audio_path
+                error = None if parallel_utils.is_valid_asset(audio_path) else "no audio was generated"
+            except Exception as e:
+                error = e
+            audio_files.append(audio_path)
+            if error is not None:
+                failures.append((f"scene {scene['id']} line {i}", error))
+        self._save_scene(scene, audio_files=audio_files)
+    
+    def _scene_image(self, scene: Dict[str, Any], animate, failures: List[Tuple[str, Any]]) -> None:
+        """Render (or reuse) the image of one scene into ``scene['image_file']``, with ComfyUI when ``animate`` is set."""
+        if animate is not None:
+            client, template = animate
+            job = self._comfyui_job(scene, template)
+            if job is None:
+                return
+            params, input_hash, cache_key = job
+            name = f"scene_{scene['id']}"
+            # Every scene task submits to the same dispatcher, so jobs are balanced across servers
+            future = client.submit(name, template.bind(**params), self.assets_dir, timeout=self.config['comfyui'].get('timeout'))
+            image_paths, error = future.result()[name]
+            if error is None:
+                self._record_animation(scene, image_paths[0], input_hash, cache_key)
+                return
+            print(f"ComfyUI failed for {name} ({error}), falling back to simple image generation")
+            draw = self._draw_fallback
+        elif self._is_fresh('images', scene['id'], self._image_hash(scene)):
+            self._save_scene(scene, image_file=self.manifest.outputs('images', scene['id'])[0])
+            return
+        else:
+            draw = self._draw_scene
+        try:
+            image_path = draw(scene)
+            error = None if parallel_utils.is_valid_asset(image_path) else "no image was generated"
+        except Exception as e:
+            image_path, error = None, e
+        # The segment still renders (with a blank frame) so one failed scene does not stop the rest
+        self._save_scene(scene, image_file=image_path or os.path.join(self.assets_dir, f"scene_{scene['id']}.png"))
+        if error is not None:
+            failures.append((f"scene {scene['id']} image", error))
+    
+    def _scene_segment(self, scene: Dict[str, Any], failures: List[Tuple[str, Any]]) -> str:
+        """Assemble one scene's track and encode the scene as a video segment; returns the segment path."""
+        try:
+            audio_track, duration = self._assemble_scene(scene)
+        except Exception as e:
+            failures.append((f"scene {scene['id']} audio track", e))
+            audio_track, duration = '', None
+        self._save_scene(scene, audio_track=audio_track, duration=duration)
+        video_config = self.config.get('video', {})
+        image_file = scene.get('image_file', '')
+        normalize = video_config.get('normalize', True)
+        if normalize:
+            # Scenes are already encoded in parallel here, so each frame is made in its own task
+            image_file = image_utils.normalized_frame(
+                image_file,
+                os.path.join(self.project_root, 'frames'),
+                width=video_config.get('width', 1280),
+                height=video_config.get('height', 720),
+            )
+        return video_utils.render_scene_segment(
+            image_file,
+            audio_track,
+            os.path.join(self.project_root, 'segments'),
+            duration=duration,
+            fps=video_config.get('fps', 24),
+            width=video_config.get('width', 1280),
+            height=video_config.get('height', 720),
+            backend=video_config.get('backend', 'moviepy'),
+            normalized=normalize,
+        )
+    
+    def _concat_scenes(self, segments: List[str], output_filename: str) -> str:
+        """Join the scene segments into the final video, unless nothing changed; returns its path."""
+        scenes = self.story['scenes']
         output_path = os.path.join(self.project_root, output_filename)
-        video_utils.compile_video(image_files, audio_files, output_path)
-        return output_path
\ No newline at end of file
+        input_hash = self._video_hash([scene.get('image_file', '') for scene in scenes], [scene.get('audio_track', '') for scene in scenes])
+        if self._is_fresh('video', output_filename, input_hash):
+            print(f"Video unchanged, reusing {output_path}")
+            return output_path
+        segment_dir = os.path.join(self.project_root, 'segments')
+        video_utils.concat_segments(segments, output_path)
+        video_utils.prune_segments(segment_dir, segments)
+        self.manifest.record('video', output_filename, input_hash, [output_path])
+        return output_path
+
+def dag_limits(config: Dict[str, Any]) -> Dict[str, int]:
+    """Concurrent dag tasks per resource class, from ``scheduler.limits`` with defaults filled in."""
+    workers = config.get('concurrency', {}).get('workers', 4)
+    limits = dict(config.get('scheduler', {}).get('limits') or {})
+    for resource in ('tts', 'image', 'comfyui'):
+        limits[resource] = limits.get(resource) or workers
+    limits['encode'] = limits.get('encode') or config.get('video', {}).get('workers') or os.cpu_count() or 1
+    return limits
+
+def _parse_dialogue(scene: Dict[str, Any]) -> List[Tuple[int, str, str]]:
+    """Split a scene's dialogue into (line index, character, text), skipping lines without a speaker."""
+    lines = []
+    for i, line in enumerate(scene.get('dialogue', [])):
+        # Assuming line is in format "character: text"
+        if ':' in line:
+            character, text = line.split(':', 1)
+            lines.append((i, character.strip(), text.strip()))
+    return lines
+
+def _file_signature(path: str) -> List[Any]:
+    """Identify a file's current contents cheaply by path, size and modification time."""
+    if not path or not os.path.exists(path):
+        return [path, None, None]
+    stat = os.stat(path)
+    return [path, stat.st_size, stat.st_mtime_ns]
\ No newline at end of file
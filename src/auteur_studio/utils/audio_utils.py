@@ -0,0 +1,141 @@
+import numpy as np
+import os
+import struct
+from typing import Any, Dict, List, Optional
+from . import file_utils
+
+# NumPy sample types for the PCM widths produced by TTSAgent.convert_to_wav
+PCM_DTYPES = {8: np.uint8, 16: np.int16, 32: np.int32}
+
+def read_wav_info(wav_file: str) -> Optional[Dict[str, Any]]:
+    """
+    Read the format and data location of a PCM WAV file from its header.
+
+    Args:
+        wav_file (str): Path to the WAV file.
+
+    Returns:
+        Optional[Dict[str, Any]]: sample_rate, channels, bits_per_sample, data_offset,
+        data_size, frames and duration, or None if the file is missing, empty or not PCM WAV.
+    """
+    if not wav_file or not os.path.exists(wav_file) or os.path.getsize(wav_file) == 0:
+        return None
+    file_size = os.path.getsize(wav_file)
+    with open(wav_file, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            return None
+        info = {}
+        # Walk the chunks; the header written by convert_to_wav is just "fmt " then "data"
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk_header)
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                audio_format, channels, sample_rate, _, _, bits_per_sample = struct.unpack("<HHIIHH", fmt[:16])
+                if audio_format != 1 or bits_per_sample not in PCM_DTYPES:
+                    return None
+                info.update(sample_rate=sample_rate, channels=channels, bits_per_sample=bits_per_sample)
+            elif chunk_id == b"data":
+                if "sample_rate" not in info:
+                    return None
+                data_offset = f.tell()
+                # Streams that were cut short may declare more data than the file holds
+                data_size = min(chunk_size, file_size - data_offset)
+                frame_size = info["channels"] * info["bits_per_sample"] // 8
+                data_size -= data_size % frame_size
+                info.update(data_offset=data_offset, data_size=data_size, frames=data_size // frame_size)
+                info["duration"] = info["frames"] / float(info["sample_rate"])
+                return info
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+def wav_header(data_size: int, sample_rate: int, bits_per_sample: int = 16, channels: int = 1) -> bytes:
+    """
+    Build a 44-byte PCM WAV header.
+
+    Args:
+        data_size (int): Size of the PCM data in bytes.
+        sample_rate (int): Samples per second.
+        bits_per_sample (int): Bits per sample.
+        channels (int): Number of channels.
+
+    Returns:
+        bytes: The header.
+    """
+    block_align = channels * bits_per_sample // 8
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE", b"fmt ", 16, 1,
+        channels, sample_rate, sample_rate * block_align, block_align,
+        bits_per_sample, b"data", data_size
+    )
+
+def assemble_scene_track(wav_files: List[str], output_filename: str, gap_seconds: float = 0.3) -> Optional[float]:
+    """
+    Concatenate a scene's dialogue lines into a single track, with silence between lines.
+
+    The PCM data of each line is read through a memory map and copied into a memory-mapped
+    output in one vectorized assignment, so no samples pass through Python loops. Lines
+    that are missing, empty or in a different format than the first usable line are skipped.
+
+    Args:
+        wav_files (List[str]): The scene's line WAVs, in dialogue order.
+        output_filename (str): Path of the scene track to write.
+        gap_seconds (float): Silence inserted between consecutive lines.
+
+    Returns:
+        Optional[float]: The exact duration of the track in seconds, or None if there was
+        no usable audio (in which case nothing is written).
+    """
+    lines = []
+    for wav_file in wav_files:
+        info = read_wav_info(wav_file)
+        if info is None or info["frames"] == 0:
+            continue
+        if lines and (info["sample_rate"], info["channels"], info["bits_per_sample"]) != (lines[0][1]["sample_rate"], lines[0][1]["channels"], lines[0][1]["bits_per_sample"]):
+            print(f"Skipping {wav_file}: audio format differs from the rest of the scene")
+            continue
+        lines.append((wav_file, info))
+    if not lines:
+        return None
+
+    first = lines[0][1]
+    channels = first["channels"]
+    dtype = PCM_DTYPES[first["bits_per_sample"]]
+    gap_frames = int(round(gap_seconds * first["sample_rate"]))
+    total_frames = sum(info["frames"] for _, info in lines) + gap_frames * (len(lines) - 1)
+    data_size = total_frames * channels * np.dtype(dtype).itemsize
+
+    directory = os.path.dirname(os.path.abspath(output_filename))
+    fd, tmp_path = file_utils.mkstemp(directory, prefix=".track", suffix=".wav")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(wav_header(data_size, first["sample_rate"], first["bits_per_sample"], channels))
+            # Size the file up front; the unwritten gaps read back as silence
+            f.truncate(44 + data_size)
+
+        # 8-bit PCM is unsigned, so its silence is 128 rather than 0
+        silence = 128 if dtype is np.uint8 else 0
+        output = np.memmap(tmp_path, dtype=dtype, mode='r+', offset=44, shape=(total_frames * channels,))
+        position = 0
+        for n, (wav_file, info) in enumerate(lines):
+            samples = info["frames"] * channels
+            source = np.memmap(wav_file, dtype=dtype, mode='r', offset=info["data_offset"], shape=(samples,))
+            output[position:position + samples] = source
+            del source
+            position += samples
+            if n < len(lines) - 1:
+                if silence:
+                    output[position:position + gap_frames * channels] = silence
+                position += gap_frames * channels
+        output.flush()
+        del output
+        os.replace(tmp_path, output_filename)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return total_frames / float(first["sample_rate"])
\ No newline at end of file
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, Optional
+from . import file_utils, trace_utils
+
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "auteur_studio")
+
+class AssetCache:
+    """
+    Content-addressed cache for generated assets (audio, images).
+
+    Entries are stored as ``<cache_dir>/<key[:2]>/<key><ext>`` and shared by every
+    project that points at the same directory. The least recently used entries are
+    evicted once the cache grows past ``max_size_bytes``.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_size_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._size = None
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        """
+        Build a cache key from everything that influences a generated asset.
+
+        Args:
+            **parts: Model name, prompt/text, voice, generation config, etc.
+
+        Returns:
+            str: A hex digest identifying the asset.
+        """
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2])
+
+    def _find_entry(self, key: str) -> Optional[str]:
+        entry_dir = self._entry_dir(key)
+        if not os.path.isdir(entry_dir):
+            return None
+        for name in os.listdir(entry_dir):
+            if os.path.splitext(name)[0] == key:
+                return os.path.join(entry_dir, name)
+        return None
+
+    def get(self, key: str, output_filename: str) -> Optional[str]:
+        """
+        Copy a cached asset to the requested location.
+
+        Args:
+            key (str): The cache key.
+            output_filename (str): Where the asset should be written. The extension is
+                replaced with the one of the cached entry.
+
+        Returns:
+            Optional[str]: The path written to, or None on a cache miss.
+        """
+        entry = self._find_entry(key)
+        if entry is None:
+            return None
+        try:
+            if os.path.getsize(entry) == 0:
+                os.remove(entry)
+                return None
+            output_filename = os.path.splitext(output_filename)[0] + os.path.splitext(entry)[1]
+            _atomic_copy(entry, output_filename)
+            # Bump the modification time so eviction treats it as recently used
+            os.utime(entry, None)
+        except OSError:
+            # The entry may have been evicted by another process in the meantime
+            return None
+        trace_utils.annotate(cache_hit=True, bytes_out=os.path.getsize(output_filename))
+        return output_filename
+
+    def put(self, key: str, source_path: str) -> Optional[str]:
+        """
+        Store an asset in the cache. Missing or empty files are never cached.
+
+        Args:
+            key (str): The cache key.
+            source_path (str): The generated asset.
+
+        Returns:
+            Optional[str]: The path of the cache entry, or None if nothing was stored.
+        """
+        if not source_path or not os.path.exists(source_path) or os.path.getsize(source_path) == 0:
+            return None
+        entry_dir = self._entry_dir(key)
+        os.makedirs(entry_dir, exist_ok=True)
+        entry = os.path.join(entry_dir, key + os.path.splitext(source_path)[1])
+        _atomic_copy(source_path, entry)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += os.path.getsize(entry)
+            if self._size is None or self._size > self.max_size_bytes:
+                self._evict()
+        return entry
+
+    def get_json(self, key: str) -> Optional[Any]:
+        """Return a cached JSON document (e.g. a generated story), or None on a cache miss."""
+        entry = self._find_entry(key)
+        if entry is None:
+            return None
+        try:
+            with open(entry, 'r') as f:
+                data = json.load(f)
+            os.utime(entry, None)
+        except (OSError, ValueError):
+            return None
+        trace_utils.annotate(cache_hit=True)
+        return data
+
+    def put_json(self, key: str, data: Any) -> Optional[str]:
+        """Store a JSON document in the cache and return the path of the entry."""
+        fd, tmp_path = file_utils.mkstemp(self.cache_dir, suffix=".json")
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            return self.put(key, tmp_path)
+        finally:
+            os.remove(tmp_path)
+
+    def _evict(self) -> None:
+        """Remove the least recently used entries until the cache fits its cap."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.startswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+def _atomic_copy(source: str, destination: str) -> None:
+    """Copy a file so that readers never observe a partially written destination."""
+    directory = os.path.dirname(os.path.abspath(destination))
+    fd, tmp_path = file_utils.mkstemp(directory)
+    try:
+        with os.fdopen(fd, "wb") as tmp, open(source, "rb") as src:
+            shutil.copyfileobj(src, tmp)
+        os.replace(tmp_path, destination)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def get_asset_cache(config: Dict[str, Any]) -> Optional[AssetCache]:
+    """
+    Create the asset cache described by the ``cache`` section of the config.
+
+    Args:
+        config (Dict[str, Any]): The project configuration.
+
+    Returns:
+        Optional[AssetCache]: The cache, or None if caching is disabled.
+    """
+    cache_config = config.get('cache', {})
+    if not cache_config.get('enabled', False):
+        return None
+    max_size_mb = cache_config.get('max_size_mb', 2048)
+    return AssetCache(cache_config.get('dir', DEFAULT_CACHE_DIR), int(max_size_mb * 1024 * 1024))
\ No newline at end of file
@@ -0,0 +1,83 @@
+import json
+import threading
+from typing import Any, Dict, Optional
+from google import genai
+from google.genai import types
+
+# Connection pool used when the config has no 'http' section
+DEFAULT_HTTP_CONFIG = {
+    'max_connections': 64,
+    'max_keepalive_connections': 32,
+    'keepalive_expiry': 60.0,
+    'http2': True,
+}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def http2_available() -> bool:
+    """Whether httpx can speak HTTP/2 (it needs the optional h2 package)."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def client_args(http_config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the httpx client arguments for a connection pool.
+
+    Args:
+        http_config (Dict[str, Any], optional): The ``http`` section of the config.
+
+    Returns:
+        Dict[str, Any]: Keyword arguments for ``httpx.Client``.
+    """
+    import httpx
+    http_config = {**DEFAULT_HTTP_CONFIG, **(http_config or {})}
+    args = {
+        'limits': httpx.Limits(
+            max_connections=http_config['max_connections'],
+            max_keepalive_connections=http_config['max_keepalive_connections'],
+            keepalive_expiry=http_config['keepalive_expiry'],
+        ),
+    }
+    if http_config['http2'] and http2_available():
+        args['http2'] = True
+    return args
+
+def _create_client(api_key: str, timeout: Optional[float], http_config: Optional[Dict[str, Any]]) -> genai.Client:
+    options = {}
+    if timeout:
+        options['timeout'] = int(timeout * 1000)
+    try:
+        http_options = types.HttpOptions(**options, client_args=client_args(http_config))
+    except (ImportError, TypeError, ValueError) as e:
+        # Older google-genai releases cannot take httpx arguments; keep their default pool
+        print(f"Could not configure the Gemini connection pool ({e}), using the default client")
+        http_options = types.HttpOptions(**options) if options else None
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+def get_client(api_key: str, timeout: Optional[float] = None, http_config: Optional[Dict[str, Any]] = None) -> genai.Client:
+    """
+    Return the shared Gemini client for an API key and request timeout.
+
+    Every agent, and every project in the process, gets the same client for the same
+    settings, so calls reuse pooled keep-alive (and, where available, HTTP/2)
+    connections instead of opening new ones.
+
+    Args:
+        api_key (str): The Gemini API key.
+        timeout (float, optional): HTTP timeout in seconds. Agents pass the call
+            deadline, so a request abandoned at its deadline (or a hedge that lost)
+            does not keep its connection and concurrency slot for longer.
+        http_config (Dict[str, Any], optional): The ``http`` section of the config.
+
+    Returns:
+        genai.Client: The shared client.
+    """
+    key = (api_key, timeout, json.dumps(http_config or {}, sort_keys=True, default=str))
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = _create_client(api_key, timeout, http_config)
+        return _clients[key]
@@ -1,7 +1,21 @@
 import requests
+from requests.adapters import HTTPAdapter
+import collections
 import json
 import os
-from typing import Dict, Any
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Callable, List, Optional, Set, Tuple
+from .hedge_utils import HedgeBudget, LatencyTracker
+from . import trace_utils
+
+# Shared session so the module-level helpers reuse connections
+_session = requests.Session()
+
+# Seconds the module-level helpers wait for the server before giving up
+DEFAULT_TIMEOUT = 30
 
 def connect_to_comfyui(base_url: str) -> bool:
     """
@@ -14,12 +28,12 @@ def connect_to_comfyui(base_url: str) -> bool:
         bool: True if connection is successful.
     """
     try:
-        response = requests.get(base_url)
+        response = _session.get(base_url, timeout=DEFAULT_TIMEOUT)
         return response.status_code == 200
-    except requests.exceptions.ConnectionError:
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
         return False
 
-def load_workflow(workflow_file: str) -> Dict[str, Any]:
+def load_workflow(workflow_file: str) -> "WorkflowTemplate":
     """
     Load a ComfyUI workflow from a JSON file.
     
@@ -27,11 +41,184 @@ def load_workflow(workflow_file: str) -> Dict[str, Any]:
         workflow_file (str): Path to the JSON workflow file.
         
     Returns:
-        Dict[str, Any]: The workflow as a dictionary.
+        WorkflowTemplate: The compiled workflow template. The raw dictionary is
+        available as ``template.workflow``.
     """
     with open(workflow_file, 'r') as file:
         workflow = json.load(file)
-    return workflow
+    return WorkflowTemplate(workflow)
+
+# Input names that each bindable parameter maps to, in order of preference
+PARAMETER_INPUTS = {
+    "prompt": ("text",),
+    "negative_prompt": ("text",),
+    "seed": ("seed", "noise_seed"),
+    "steps": ("steps",),
+    "width": ("width",),
+    "height": ("height",),
+    "batch_size": ("batch_size",),
+}
+
+SAMPLER_CLASSES = ("KSampler", "KSamplerAdvanced")
+LATENT_CLASSES = ("EmptyLatentImage", "EmptySD3LatentImage")
+OUTPUT_CLASSES = ("SaveImage",)
+
+class WorkflowTemplate:
+    """
+    A ComfyUI workflow compiled for repeated use.
+
+    Parameters (prompt, seed, size, batch_size, ...) are located once by node title or
+    node class instead of hard-coded ids. ``bind`` returns an independent workflow that
+    only copies the nodes it changes, and ``pack`` merges several scenes into one job.
+    """
+
+    def __init__(self, workflow: Dict[str, Any]):
+        self.workflow = workflow
+        self.bindings = {param: self._locate(param) for param in PARAMETER_INPUTS}
+        self.bindings = {param: target for param, target in self.bindings.items() if target}
+        self.output_nodes = self.find_nodes(class_type=OUTPUT_CLASSES)
+
+    def find_nodes(self, class_type=None, title: Optional[str] = None) -> List[str]:
+        """
+        Find node ids by class type and/or title.
+
+        Args:
+            class_type (str or tuple, optional): One or more ComfyUI class types.
+            title (str, optional): The node title shown in the ComfyUI editor (case-insensitive).
+
+        Returns:
+            List[str]: The matching node ids, sorted.
+        """
+        if isinstance(class_type, str):
+            class_type = (class_type,)
+        matches = []
+        for node_id, node in self.workflow.items():
+            if class_type and node.get("class_type") not in class_type:
+                continue
+            if title and node.get("_meta", {}).get("title", "").lower() != title.lower():
+                continue
+            matches.append(node_id)
+        return sorted(matches, key=_node_sort_key)
+
+    def _locate(self, param: str) -> List[Tuple[str, str]]:
+        """Find the (node id, input name) pairs a parameter is bound to."""
+        # A node titled after the parameter always wins
+        node_ids = self.find_nodes(title=param)
+        if not node_ids:
+            if param in ("prompt", "negative_prompt"):
+                link = "positive" if param == "prompt" else "negative"
+                node_ids = []
+                for sampler_id in self.find_nodes(class_type=SAMPLER_CLASSES):
+                    source = self.workflow[sampler_id]["inputs"].get(link)
+                    if isinstance(source, list) and str(source[0]) in self.workflow:
+                        node_ids.append(str(source[0]))
+            elif param in ("seed", "steps"):
+                node_ids = self.find_nodes(class_type=SAMPLER_CLASSES)
+            else:
+                node_ids = self.find_nodes(class_type=LATENT_CLASSES)
+
+        targets = []
+        for node_id in node_ids:
+            inputs = self.workflow[node_id].get("inputs", {})
+            for input_name in PARAMETER_INPUTS[param]:
+                if input_name in inputs and not isinstance(inputs[input_name], list):
+                    targets.append((node_id, input_name))
+                    break
+        return targets
+
+    def bind(self, **params: Any) -> Dict[str, Any]:
+        """
+        Create an independent workflow with the given parameters applied.
+
+        Only the nodes that change are copied; the rest are shared with the template
+        and must not be modified.
+
+        Args:
+            **params: Values for prompt, negative_prompt, seed, steps, width, height or batch_size.
+                None values are ignored.
+
+        Returns:
+            Dict[str, Any]: A workflow ready to be queued.
+        """
+        workflow = dict(self.workflow)
+        for param, value in params.items():
+            if value is None:
+                continue
+            if param not in self.bindings:
+                raise ValueError(f"Workflow has no node for parameter '{param}'")
+            for node_id, input_name in self.bindings[param]:
+                if workflow[node_id] is self.workflow[node_id]:
+                    node = dict(workflow[node_id])
+                    node["inputs"] = dict(node["inputs"])
+                    workflow[node_id] = node
+                workflow[node_id]["inputs"][input_name] = value
+        return workflow
+
+    def _scene_nodes(self, params: Dict[str, Any]) -> set:
+        """Return the ids of nodes that depend on the bound parameters."""
+        scene_nodes = {node_id for param in params for node_id, _ in self.bindings.get(param, [])}
+        changed = True
+        while changed:
+            changed = False
+            for node_id, node in self.workflow.items():
+                if node_id in scene_nodes:
+                    continue
+                for value in node.get("inputs", {}).values():
+                    if isinstance(value, list) and value and str(value[0]) in scene_nodes:
+                        scene_nodes.add(node_id)
+                        changed = True
+                        break
+        return scene_nodes
+
+    def pack(self, scene_params: Dict[str, Dict[str, Any]]) -> Tuple[Dict[str, Any], Dict[str, List[str]]]:
+        """
+        Merge several scenes into a single ComfyUI job.
+
+        Scenes with identical parameters are rendered together through the latent
+        ``batch_size``. Scenes that differ get their own copy of the nodes that depend on
+        the parameters, while loaders and other shared nodes appear once, so the models
+        are only loaded once for the whole job.
+
+        Args:
+            scene_params (Dict[str, Dict[str, Any]]): Parameters keyed by scene name.
+
+        Returns:
+            Tuple[Dict[str, Any], Dict[str, List[str]]]: The packed workflow, and for each
+            output node id the scene names its images belong to, in batch order.
+        """
+        can_batch = "batch_size" in self.bindings
+        groups = {}
+        for name, params in scene_params.items():
+            key = json.dumps(params, sort_keys=True, default=str) if can_batch else name
+            groups.setdefault(key, []).append(name)
+
+        workflow = {}
+        routes = {}
+        for index, names in enumerate(groups.values()):
+            params = dict(scene_params[names[0]])
+            if len(names) > 1:
+                params["batch_size"] = len(names) * (params.get("batch_size") or 1)
+            bound = self.bind(**params)
+            scene_nodes = self._scene_nodes(params)
+            prefix = f"s{index}_"
+
+            for node_id, node in bound.items():
+                if node_id not in scene_nodes:
+                    workflow.setdefault(node_id, node)
+                    continue
+                node = dict(node)
+                node["inputs"] = {
+                    key: [prefix + str(value[0])] + list(value[1:]) if isinstance(value, list) and value and str(value[0]) in scene_nodes else value
+                    for key, value in node.get("inputs", {}).items()
+                }
+                workflow[prefix + node_id] = node
+
+            for node_id in self.output_nodes:
+                routes[prefix + node_id if node_id in scene_nodes else node_id] = list(names)
+        return workflow, routes
+
+def _node_sort_key(node_id: str):
+    return (0, int(node_id), "") if str(node_id).isdigit() else (1, 0, str(node_id))
 
 def queue_prompt(workflow: Dict[str, Any], comfyui_base_url: str) -> Dict[str, Any]:
     """
@@ -42,13 +229,14 @@ def queue_prompt(workflow: Dict[str, Any], comfyui_base_url: str) -> Dict[str, A
         comfyui_base_url (str): The base URL of the ComfyUI server.
         
     Returns:
-        Dict[str, Any]: The response from ComfyUI.
+        Dict[str, Any]: The response from ComfyUI. This holds the ``prompt_id`` of the
+        queued job, not its outputs; use ``ComfyUIClient`` to wait for results.
     """
     p = {"prompt": workflow}
-    response = requests.post(f"{comfyui_base_url}/prompt", json=p)
+    response = _session.post(f"{comfyui_base_url}/prompt", json=p, timeout=DEFAULT_TIMEOUT)
     return response.json()
 
-def get_image(filename: str, comfyui_base_url: str, output_dir: str) -> str:
+def get_image(filename: str, comfyui_base_url: str, output_dir: str, subfolder: str = "", folder_type: str = "output") -> str:
     """
     Download an image from ComfyUI.
     
@@ -56,13 +244,627 @@ def get_image(filename: str, comfyui_base_url: str, output_dir: str) -> str:
         filename (str): The filename of the image on the ComfyUI server.
         comfyui_base_url (str): The base URL of the ComfyUI server.
         output_dir (str): The directory to save the image.
+        subfolder (str): The subfolder of the image on the ComfyUI server.
+        folder_type (str): The ComfyUI folder type ("output", "temp" or "input").
         
     Returns:
         str: The path to the downloaded image.
     """
     # ComfyUI serves images at /view?filename=filename.png
-    response = requests.get(f"{comfyui_base_url}/view?filename={filename}")
+    params = {"filename": filename, "subfolder": subfolder, "type": folder_type}
+    response = _session.get(f"{comfyui_base_url}/view", params=params, timeout=DEFAULT_TIMEOUT)
     local_path = os.path.join(output_dir, filename)
     with open(local_path, 'wb') as f:
         f.write(response.content)
-    return local_path
\ No newline at end of file
+    return local_path
+
+class ComfyUIClient:
+    """
+    Client for a single ComfyUI server.
+
+    Submits jobs, follows their completion through one websocket (falling back to
+    polling ``/history``) and downloads their outputs. All HTTP calls go through one
+    pooled session. Jobs are run through a ``ComfyUIDispatcher``, even with a single
+    server, so that one thread owns the websocket.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 8, timeout: float = 30, poll_interval: float = 1.0, use_websocket: bool = True):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.use_websocket = use_websocket
+        self.client_id = uuid.uuid4().hex
+        self._ws = None
+        self._ws_failed = False
+        self._last_check = 0.0
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def is_available(self) -> bool:
+        """
+        Check if the ComfyUI server is reachable.
+
+        Returns:
+            bool: True if the server answered with status 200.
+        """
+        try:
+            response = self.session.get(self.base_url, timeout=self.timeout)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    def submit(self, workflow: Dict[str, Any]) -> str:
+        """
+        Queue a workflow on the server.
+
+        Args:
+            workflow (Dict[str, Any]): The workflow definition in API format.
+
+        Returns:
+            str: The prompt_id assigned by ComfyUI.
+        """
+        payload = {"prompt": workflow, "client_id": self.client_id}
+        response = self.session.post(f"{self.base_url}/prompt", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["prompt_id"]
+
+    def get_history(self, prompt_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch the history entry of a job.
+
+        Args:
+            prompt_id (str): The job's prompt_id.
+
+        Returns:
+            Optional[Dict[str, Any]]: The history entry, or None if the job has not finished.
+        """
+        response = self.session.get(f"{self.base_url}/history/{prompt_id}", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json().get(prompt_id)
+
+    def cancel(self, prompt_ids: List[str]) -> None:
+        """
+        Remove jobs from the server queue, interrupting the one that is running if it is among them.
+
+        Args:
+            prompt_ids (List[str]): The jobs to cancel.
+        """
+        if not prompt_ids:
+            return
+        try:
+            self.session.post(f"{self.base_url}/queue", json={"delete": list(prompt_ids)}, timeout=self.timeout)
+            running = self.session.get(f"{self.base_url}/queue", timeout=self.timeout).json().get("queue_running", [])
+            # Queue entries are [number, prompt_id, prompt, extra_data, outputs]
+            if any(len(entry) > 1 and entry[1] in prompt_ids for entry in running):
+                self.session.post(f"{self.base_url}/interrupt", timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            print(f"Could not cancel ComfyUI job(s) on {self.base_url}: {e}")
+
+    def download(self, image: Dict[str, Any], output_path: str) -> str:
+        """
+        Download one output image of a finished job.
+
+        Args:
+            image (Dict[str, Any]): An image entry from the job's outputs
+                (``filename``, ``subfolder`` and ``type``).
+            output_path (str): Where to save the image.
+
+        Returns:
+            str: The path to the downloaded image.
+        """
+        params = {"filename": image["filename"], "subfolder": image.get("subfolder", ""), "type": image.get("type", "output")}
+        response = self.session.get(f"{self.base_url}/view", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        with open(output_path, 'wb') as f:
+            f.write(response.content)
+        return output_path
+
+    def _open_websocket(self):
+        """Connect to the ComfyUI websocket, or return None if that is not possible."""
+        if not self.use_websocket:
+            return None
+        try:
+            import websocket
+        except ImportError:
+            return None
+        ws_url = self.base_url.replace("https://", "wss://").replace("http://", "ws://")
+        try:
+            ws = websocket.create_connection(f"{ws_url}/ws?clientId={self.client_id}", timeout=self.timeout)
+            ws.settimeout(self.poll_interval)
+            return ws
+        except Exception as e:
+            print(f"ComfyUI websocket unavailable ({e}), polling /history instead")
+            return None
+
+    def _websocket(self):
+        """The client's websocket, opened on first use, or None if it is unavailable."""
+        if self._ws is None and not self._ws_failed:
+            self._ws = self._open_websocket()
+            self._ws_failed = self._ws is None
+        return self._ws
+
+    def close(self) -> None:
+        """Close the websocket; it is opened again the next time jobs are followed."""
+        if self._ws is not None:
+            try:
+                self._ws.close()
+            except Exception:
+                pass
+        self._ws = None
+        self._ws_failed = False
+
+    def finished(self, prompt_ids: List[str], wait: float) -> Dict[str, Dict[str, Any]]:
+        """
+        Wait up to ``wait`` seconds for any of the jobs to finish.
+
+        Completion events come from the client's one websocket, which every job is
+        submitted under (ComfyUI sends events only to the latest socket of a client_id,
+        so it must not be shared between callers). Without a websocket, or now and then
+        on a quiet one in case an event was missed, ``/history`` is checked instead.
+
+        Args:
+            prompt_ids (List[str]): The jobs to look for.
+            wait (float): Seconds to wait when none of them has finished.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: The history entry of every job among ``prompt_ids``
+            that has finished.
+        """
+        remaining = set(prompt_ids)
+        found = set()
+        ws = self._websocket()
+        if ws is not None:
+            end = time.monotonic() + wait
+            while not found and time.monotonic() < end:
+                try:
+                    ws.settimeout(max(0.01, end - time.monotonic()))
+                    message = ws.recv()
+                except Exception as e:
+                    if type(e).__name__ != "WebSocketTimeoutException":
+                        print(f"ComfyUI websocket closed ({e}), polling /history instead")
+                        self.close()
+                        self._ws_failed = True
+                        ws = None
+                    break
+                if isinstance(message, str):
+                    event = json.loads(message)
+                    data = event.get("data", {})
+                    done = (event.get("type") == "executing" and data.get("node") is None) or event.get("type") in ("execution_error", "execution_interrupted")
+                    if done and data.get("prompt_id") in remaining:
+                        found.add(data["prompt_id"])
+            if ws is not None and (found or time.monotonic() - self._last_check < 10 * self.poll_interval):
+                # Events carry no outputs, so only the jobs that finished are looked up
+                return self._entries(found)
+        self._last_check = time.monotonic()
+        entries = self._entries(remaining)
+        if ws is None and not entries:
+            time.sleep(wait)
+        return entries
+
+    def _entries(self, prompt_ids: Set[str]) -> Dict[str, Dict[str, Any]]:
+        """The history entries of the jobs that are in the history."""
+        entries = {prompt_id: self.get_history(prompt_id) for prompt_id in prompt_ids}
+        return {prompt_id: entry for prompt_id, entry in entries.items() if entry is not None}
+
+    def collect(self, prompt_id: str, entry: Optional[Dict[str, Any]], job_name: str, output_dir: str, job_routes: Optional[Dict[str, List[str]]] = None) -> Dict[str, Tuple[List[str], Optional[Exception]]]:
+        """
+        Download the outputs of a finished job.
+
+        Args:
+            prompt_id (str): The job's prompt_id.
+            entry (Dict[str, Any], optional): The job's history entry, or None if it timed out.
+            job_name (str): The name the job was submitted under.
+            output_dir (str): The directory to save the images.
+            job_routes (Dict[str, List[str]], optional): The job's routes if it was packed.
+
+        Returns:
+            Dict[str, Tuple[List[str], Optional[Exception]]]: (image paths, error) per name.
+        """
+        targets = _route_targets(job_name, job_routes)
+        try:
+            if entry is None:
+                raise TimeoutError(f"ComfyUI job {prompt_id} did not finish in time")
+            if entry.get("status", {}).get("status_str") == "error":
+                raise RuntimeError(f"ComfyUI job {prompt_id} failed")
+            routed = _route_images(entry, job_routes, job_name)
+        except Exception as e:
+            return {name: ([], e) for name in targets}
+
+        results = {}
+        for name in targets:
+            try:
+                paths = []
+                for image in routed.get(name, []):
+                    extension = os.path.splitext(image["filename"])[1] or ".png"
+                    suffix = f"_{len(paths)}" if paths else ""
+                    paths.append(self.download(image, os.path.join(output_dir, f"{name}{suffix}{extension}")))
+                if not paths:
+                    raise ValueError(f"ComfyUI job {prompt_id} produced no images for {name}")
+                results[name] = (paths, None)
+            except Exception as e:
+                results[name] = ([], e)
+        return results
+
+def _record_job(job_name: str, workflow: Dict[str, Any], base_url: str, start: float, job_results: Dict[str, Tuple[List[str], Optional[Exception]]]) -> None:
+    """Add a finished ComfyUI job, from submission to downloaded outputs, to the trace."""
+    paths = [path for job_paths, _ in job_results.values() for path in job_paths]
+    errors = [error for _, error in job_results.values() if error is not None]
+    attrs = {
+        "job": job_name,
+        "bytes_in": len(json.dumps(workflow)),
+        "bytes_out": sum(os.path.getsize(path) for path in paths if os.path.exists(path)),
+    }
+    if errors:
+        attrs["error"] = type(errors[0]).__name__
+    trace_utils.record("comfyui.job", "comfyui", start, time.time(), thread=f"comfyui {base_url}", **attrs)
+
+def _route_targets(job_name: str, job_routes: Optional[Dict[str, List[str]]]) -> List[str]:
+    """List the names a job's outputs belong to."""
+    if not job_routes:
+        return [job_name]
+    return [target for targets in job_routes.values() for target in targets]
+
+def _route_images(history_entry: Dict[str, Any], job_routes: Optional[Dict[str, List[str]]], job_name: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Split a finished job's images between the names they belong to."""
+    if not job_routes:
+        return {job_name: output_images(history_entry)}
+    routed = {}
+    for node_id, targets in job_routes.items():
+        images = [image for image in history_entry.get("outputs", {}).get(node_id, {}).get("images", []) if image.get("type", "output") == "output"]
+        # Batched scenes come back in batch order, an equal share per scene
+        per_target = max(1, len(images) // len(targets))
+        for k, target in enumerate(targets):
+            routed.setdefault(target, []).extend(images[k * per_target:(k + 1) * per_target])
+    return routed
+
+def output_images(history_entry: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    List the saved images of a finished job, in node order.
+
+    Args:
+        history_entry (Dict[str, Any]): The job's entry from ``/history``.
+
+    Returns:
+        List[Dict[str, Any]]: Image entries with ``filename``, ``subfolder`` and ``type``.
+    """
+    images = []
+    for node_id in sorted(history_entry.get("outputs", {}), key=_node_sort_key):
+        for image in history_entry["outputs"][node_id].get("images", []):
+            # Skip previews, which ComfyUI stores in its temp folder
+            if image.get("type", "output") == "output":
+                images.append(image)
+    return images
+
+class _Job:
+    """A workflow handed to a dispatcher, with the prompts currently running it."""
+
+    def __init__(self, name: str, workflow: Dict[str, Any], output_dir: str, routes: Optional[Dict[str, List[str]]], deadline: Optional[float]):
+        self.name = name
+        self.workflow = workflow
+        self.output_dir = output_dir
+        self.routes = routes
+        self.deadline = deadline
+        self.future = Future()
+        self.attempts = 0
+        # (backend index, prompt_id) of every copy submitted, more than one if hedged
+        self.copies = []
+
+class ComfyUIDispatcher:
+    """
+    Spread jobs over one or more ComfyUI servers.
+
+    Each job goes to the healthy backend with the fewest outstanding jobs. Backends are
+    probed periodically; one that fails its probe, or ``max_errors`` requests in a row,
+    is taken out of rotation and its in-flight jobs are requeued on the others. While
+    every backend is out, jobs stay queued and backends are probed every poll, until
+    their deadline or ``recovery_timeout`` runs out. With hedging on, a job
+    that runs past the observed latency quantile is also submitted to an idle backend
+    (within a budget); the first copy to finish wins and the other is cancelled.
+
+    The dispatcher is long-lived and thread-safe: ``submit`` can be called from any
+    number of threads (e.g. the dag scheduler's image tasks), and a single collector
+    thread, started on demand and stopped when idle, dispatches every job and follows
+    it through each backend's one websocket. Balancing, failover and hedging therefore
+    see all outstanding jobs, not just those of one call.
+    """
+
+    def __init__(self, clients: List[ComfyUIClient], max_outstanding: Optional[int] = 2, health_interval: float = 10.0, poll_interval: float = 1.0, max_attempts: int = 3, hedge: bool = False, hedge_quantile: float = 0.95, hedge_budget: float = 0.05, download_workers: int = 4, max_errors: int = 3, recovery_timeout: float = 60.0):
+        self.clients = clients
+        # Jobs queued per backend at once; None submits every job straight away
+        self.max_outstanding = max_outstanding
+        self.health_interval = health_interval
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.max_errors = max_errors
+        self.recovery_timeout = recovery_timeout
+        self.healthy = [True] * len(clients)
+        # Consecutive failed requests per backend, and since when no backend has been healthy
+        self._errors = [0] * len(clients)
+        self._down_since = None
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.latency = LatencyTracker()
+        self.budget = HedgeBudget(hedge_budget)
+        # Guards healthy, the pending queue and the collector thread
+        self._lock = threading.Lock()
+        self._pending = collections.deque()
+        # prompt_id -> job per backend, and when each prompt was submitted (monotonic, wall clock);
+        # only the collector thread changes these
+        self._in_flight = [dict() for _ in clients]
+        self._submitted = {}
+        self._collector = None
+        self._last_probe = time.monotonic()
+        # Outputs are downloaded here, so a large file does not hold up dispatch and deadlines
+        self._downloads = ThreadPoolExecutor(max_workers=download_workers, thread_name_prefix="comfyui-download")
+
+    def is_available(self) -> bool:
+        """
+        Probe every backend.
+
+        Returns:
+            bool: True if at least one backend is reachable.
+        """
+        healthy = [client.is_available() for client in self.clients]
+        with self._lock:
+            self.healthy = healthy
+        return any(healthy)
+
+    def submit(self, name: str, workflow: Dict[str, Any], output_dir: str, routes: Optional[Dict[str, List[str]]] = None, timeout: Optional[float] = None) -> Future:
+        """
+        Queue one workflow.
+
+        Args:
+            name (str): The job name, also the output filename stem (e.g. "scene_3").
+            workflow (Dict[str, Any]): The workflow definition in API format.
+            output_dir (str): The directory to save the images.
+            routes (Dict[str, List[str]], optional): The job's routes if it was packed.
+            timeout (float, optional): Seconds after which the job fails and is cancelled
+                on its backend.
+
+        Returns:
+            Future: Resolves to the (image paths, error) of every name the job renders.
+        """
+        job = _Job(name, workflow, output_dir, routes, time.monotonic() + timeout if timeout else None)
+        with self._lock:
+            self._pending.append(job)
+            if self._collector is None:
+                self._collector = threading.Thread(target=self._collect, name="comfyui-dispatcher", daemon=True)
+                self._collector.start()
+        return job.future
+
+    def run(self, workflows: Dict[str, Dict[str, Any]], output_dir: str, on_complete: Optional[Callable[[str, List[str], Optional[Exception]], None]] = None, timeout: Optional[float] = None, routes: Optional[Dict[str, Dict[str, List[str]]]] = None) -> Dict[str, Tuple[List[str], Optional[Exception]]]:
+        """
+        Run several workflows and wait for all of them.
+
+        Args:
+            workflows (Dict[str, Dict[str, Any]]): Workflows keyed by a name that is also
+                used as the output filename stem (e.g. "scene_3").
+            output_dir (str): The directory to save the images.
+            on_complete (Callable, optional): Called with (name, paths, error) as soon as
+                each output has been downloaded.
+            timeout (float, optional): Maximum time to wait for the jobs. Jobs still
+                unfinished then are cancelled on their backends.
+            routes (Dict[str, Dict[str, List[str]]], optional): For packed workflows (see
+                ``WorkflowTemplate.pack``), the names that each output node's images
+                belong to. Results are then keyed by those names instead.
+
+        Returns:
+            Dict[str, Tuple[List[str], Optional[Exception]]]: (image paths, error) per name.
+        """
+        routes = routes or {}
+        futures = [self.submit(job_name, workflow, output_dir, routes.get(job_name), timeout) for job_name, workflow in workflows.items()]
+        results = {}
+        for future in as_completed(futures):
+            for name, (paths, error) in future.result().items():
+                results[name] = (paths, error)
+                if on_complete is not None:
+                    on_complete(name, paths, error)
+        return results
+
+    def _collect(self) -> None:
+        """Collector thread: dispatch and follow jobs until none is left."""
+        try:
+            while True:
+                with self._lock:
+                    if not self._pending and not any(self._in_flight):
+                        self._stop()
+                        return
+                self._step()
+        except Exception as e:
+            with self._lock:
+                jobs = list(self._pending) + [job for in_flight in self._in_flight for job in in_flight.values()]
+                self._pending.clear()
+                for in_flight in self._in_flight:
+                    in_flight.clear()
+                self._stop()
+            for job in dict.fromkeys(jobs):
+                self._fail(job, e)
+
+    def _stop(self) -> None:
+        # Called with the lock held, so a new collector cannot start before the websockets are closed
+        for client in self.clients:
+            client.close()
+        self._collector = None
+
+    def _finish(self, job: _Job, job_results: Dict[str, Tuple[List[str], Optional[Exception]]]) -> None:
+        if not job.future.done():
+            job.future.set_result(job_results)
+
+    def _fail(self, job: _Job, error: Exception) -> None:
+        self._finish(job, {name: ([], error) for name in _route_targets(job.name, job.routes)})
+
+    def _running_copies(self, job: _Job) -> List[Tuple[int, str]]:
+        return [(index, prompt_id) for index, prompt_id in job.copies if prompt_id in self._in_flight[index]]
+
+    def _submit(self, index: int, job: _Job) -> None:
+        prompt_id = self.clients[index].submit(job.workflow)
+        self._in_flight[index][prompt_id] = job
+        self._submitted[prompt_id] = (time.monotonic(), time.time())
+        job.copies.append((index, prompt_id))
+
+    def _drop_copies(self, job: _Job) -> None:
+        """Forget the running copies of a job and cancel them on their backends."""
+        for index, prompt_id in self._running_copies(job):
+            del self._in_flight[index][prompt_id]
+            self._submitted.pop(prompt_id, None)
+            if self.healthy[index]:
+                self.clients[index].cancel([prompt_id])
+
+    def _take_offline(self, index: int, error: Any) -> None:
+        with self._lock:
+            if self.healthy[index]:
+                print(f"ComfyUI backend {self.clients[index].base_url} unhealthy ({error}), requeueing {len(self._in_flight[index])} job(s)")
+            self.healthy[index] = False
+        requeued = list(self._in_flight[index].items())
+        self._in_flight[index].clear()
+        for prompt_id, job in requeued:
+            self._submitted.pop(prompt_id, None)
+            if job.future.done() or self._running_copies(job):
+                # A hedged copy is still running elsewhere
+                continue
+            if job.attempts >= self.max_attempts:
+                self._fail(job, RuntimeError(f"{job.name} failed on {job.attempts} backends"))
+            else:
+                # Requeue at the front so it is not starved by later scenes
+                with self._lock:
+                    self._pending.appendleft(job)
+
+    def _request_failed(self, index: int, error: Any) -> None:
+        """Count a failed request; a backend is only taken offline after several in a row."""
+        self._errors[index] += 1
+        if self._errors[index] >= self.max_errors:
+            self._take_offline(index, error)
+        else:
+            print(f"ComfyUI backend {self.clients[index].base_url} request failed ({error}), retrying ({self._errors[index]}/{self.max_errors})")
+
+    def _has_slot(self, index: int) -> bool:
+        return self.healthy[index] and (self.max_outstanding is None or len(self._in_flight[index]) < self.max_outstanding)
+
+    def _step(self) -> None:
+        """One round of the collector: deadlines, health probes, dispatch, hedging, completions."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [job for job in self._pending if job.deadline is not None and now > job.deadline]
+            for job in expired:
+                self._pending.remove(job)
+        expired += [job for in_flight in self._in_flight for job in in_flight.values() if job.deadline is not None and now > job.deadline]
+        for job in dict.fromkeys(expired):
+            self._drop_copies(job)
+            self._fail(job, TimeoutError(f"{job.name} did not finish in time"))
+
+        # Health probes: take failing backends out of rotation, bring recovered ones back
+        probe_interval = self.health_interval if self._down_since is None else self.poll_interval
+        if now - self._last_probe > probe_interval:
+            self._last_probe = now
+            for index, client in enumerate(self.clients):
+                if client.is_available():
+                    self._errors[index] = 0
+                    with self._lock:
+                        self.healthy[index] = True
+                else:
+                    self._take_offline(index, "health probe failed")
+
+        # With every backend out, jobs wait (up to their deadline) for one to recover
+        with self._lock:
+            jobs = None
+            if any(self.healthy):
+                self._down_since = None
+            elif self._down_since is None:
+                print(f"No healthy ComfyUI backend, waiting up to {self.recovery_timeout:g}s for one to recover")
+                self._down_since = now
+            elif now - self._down_since > self.recovery_timeout:
+                jobs = list(self._pending)
+                self._pending.clear()
+                self._down_since = None
+            down = not any(self.healthy)
+        if jobs is not None:
+            jobs += [job for in_flight in self._in_flight for job in in_flight.values()]
+            for in_flight in self._in_flight:
+                in_flight.clear()
+            for job in dict.fromkeys(jobs):
+                self._fail(job, RuntimeError("No healthy ComfyUI backend"))
+            return
+        if down:
+            time.sleep(self.poll_interval)
+            return
+
+        # Dispatch to the healthy backend with the fewest outstanding jobs
+        while True:
+            with self._lock:
+                candidates = [i for i in range(len(self.clients)) if self._has_slot(i)]
+                if not self._pending or not candidates:
+                    break
+                job = self._pending.popleft()
+            index = min(candidates, key=lambda i: len(self._in_flight[i]))
+            job.attempts += 1
+            try:
+                self._submit(index, job)
+                self._errors[index] = 0
+                self.budget.record_call()
+            except Exception as e:
+                job.attempts -= 1
+                with self._lock:
+                    self._pending.appendleft(job)
+                self._request_failed(index, e)
+                # Try again on the next round rather than hammering the backend
+                break
+
+        # Hedge straggling jobs on idle backends once nothing is waiting for a slot
+        with self._lock:
+            waiting = bool(self._pending)
+        hedge_after = self.latency.percentile(self.hedge_quantile) if self.hedge and not waiting else None
+        if hedge_after is not None:
+            for index in range(len(self.clients)):
+                for prompt_id, job in list(self._in_flight[index].items()):
+                    if len(job.copies) > 1 or time.monotonic() - self._submitted[prompt_id][0] < hedge_after:
+                        continue
+                    with self._lock:
+                        candidates = [i for i in range(len(self.clients)) if i != index and self._has_slot(i)]
+                    if not candidates or not self.budget.try_spend():
+                        continue
+                    target = min(candidates, key=lambda i: len(self._in_flight[i]))
+                    print(f"{job.name} passed p{int(self.hedge_quantile * 100)} latency ({hedge_after:.1f}s), hedging on {self.clients[target].base_url}")
+                    try:
+                        self._submit(target, job)
+                        self._errors[target] = 0
+                    except Exception as e:
+                        self._request_failed(target, e)
+
+        # Collect finished jobs and download their outputs
+        active = [index for index in range(len(self.clients)) if self._in_flight[index]]
+        if not active:
+            time.sleep(self.poll_interval)
+            return
+        for index in active:
+            client = self.clients[index]
+            try:
+                entries = client.finished(list(self._in_flight[index]), self.poll_interval / len(active))
+                self._errors[index] = 0
+            except Exception as e:
+                self._request_failed(index, e)
+                continue
+            for prompt_id, entry in entries.items():
+                job = self._in_flight[index].get(prompt_id)
+                if job is None:
+                    # Cancelled because a hedged copy won
+                    continue
+                del self._in_flight[index][prompt_id]
+                started, started_at = self._submitted.pop(prompt_id)
+                if entry.get("status", {}).get("status_str") == "error" and self._running_copies(job):
+                    # Another copy may still succeed
+                    continue
+                self.latency.record(time.monotonic() - started)
+                self._drop_copies(job)
+                self._downloads.submit(self._download, client, prompt_id, entry, job, started_at)
+
+    def _download(self, client: ComfyUIClient, prompt_id: str, entry: Dict[str, Any], job: _Job, started_at: float) -> None:
+        """Download pool: fetch a finished job's outputs and resolve its future."""
+        try:
+            job_results = client.collect(prompt_id, entry, job.name, job.output_dir, job.routes)
+            _record_job(job.name, job.workflow, client.base_url, started_at, job_results)
+        except Exception as e:
+            self._fail(job, e)
+            return
+        self._finish(job, job_results)
@@ -0,0 +1,37 @@
+import os
+import tempfile
+from typing import Optional, Tuple
+
+def _read_umask() -> int:
+    # The umask can only be read by setting it, so this runs once at import, before any threads start
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+_UMASK = _read_umask()
+
+def mkstemp(dir: Optional[str] = None, prefix: str = ".tmp", suffix: str = "") -> Tuple[int, str]:
+    """
+    Create a temporary file to be moved into place with ``os.replace``.
+
+    ``tempfile.mkstemp`` creates files readable only by their owner, which the final file
+    would keep after the rename. This one gives the file the mode ``open`` would have
+    given it (0666 less the umask), so cached and generated assets stay readable by
+    whoever could read them before.
+
+    Args:
+        dir (str, optional): Directory of the file; use the destination's, so the rename is atomic.
+        prefix (str): Prefix of the file name.
+        suffix (str): Suffix of the file name.
+
+    Returns:
+        Tuple[int, str]: An open file descriptor and the path of the file.
+    """
+    fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=dir)
+    try:
+        os.chmod(path, 0o666 & ~_UMASK)
+    except BaseException:
+        os.close(fd)
+        os.remove(path)
+        raise
+    return fd, path
@@ -0,0 +1,198 @@
+import collections
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+from . import trace_utils
+
+class LatencyTracker:
+    """Sliding window of recent call latencies, used to decide when a call is running late."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.samples = collections.deque(maxlen=window)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, latency: float) -> None:
+        """Add the latency of a finished call in seconds."""
+        with self._lock:
+            self.samples.append(latency)
+
+    def percentile(self, quantile: float) -> Optional[float]:
+        """
+        Return a latency quantile of the window.
+
+        Args:
+            quantile (float): Between 0 and 1 (e.g. 0.95).
+
+        Returns:
+            Optional[float]: The latency in seconds, or None until ``min_samples`` calls
+            have been seen.
+        """
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(quantile * len(ordered)))]
+
+class HedgeBudget:
+    """Allow hedged requests for at most a fixed fraction of all calls."""
+
+    def __init__(self, max_ratio: float = 0.05):
+        self.max_ratio = max_ratio
+        self.calls = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def try_spend(self) -> bool:
+        """Take one hedge from the budget, if any is left."""
+        with self._lock:
+            if self.hedges + 1 > self.max_ratio * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+class CallCancelled(Exception):
+    """Raised by a call that stopped early because another attempt already won."""
+
+class Hedger:
+    """
+    Per-call deadlines and hedged requests.
+
+    A call gets a hedge (a duplicate request) once it has run longer than the observed
+    latency quantile for its key, as long as the ``HedgeBudget`` allows it. The first
+    attempt to succeed wins. Every attempt gets a ``threading.Event`` that is set once
+    the call is decided, so streaming calls can stop between chunks. Results of attempts
+    that finish after the winner are passed to ``discard`` so they can clean up.
+
+    Attempts that lost or missed the deadline keep running in the background until their
+    request returns. ``release`` is called as each one does, so a concurrency slot taken
+    for an attempt stays taken for as long as its request is actually open.
+    """
+
+    def __init__(self, enabled: bool = True, quantile: float = 0.95, min_samples: int = 20, max_ratio: float = 0.05):
+        self.enabled = enabled
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.budget = HedgeBudget(max_ratio)
+        self.trackers = {}
+        self._lock = threading.Lock()
+
+    def tracker(self, key: str) -> LatencyTracker:
+        """Return the latency tracker of a key (e.g. a model name), creating it on first use."""
+        with self._lock:
+            if key not in self.trackers:
+                self.trackers[key] = LatencyTracker(min_samples=self.min_samples)
+            return self.trackers[key]
+
+    def call(self, key: str, func: Callable[[threading.Event], Any], deadline: Optional[float] = None, hedge: bool = True, can_hedge: Optional[Callable[[], bool]] = None, release: Optional[Callable[[], None]] = None, discard: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        Run a call with a deadline, hedging it if it runs late.
+
+        Args:
+            key (str): Latency statistics are kept per key (e.g. the model name).
+            func (Callable[[threading.Event], Any]): Makes one request. It receives a
+                cancel event that is set once the call no longer needs its result.
+            deadline (float, optional): Give up after this many seconds.
+            hedge (bool): Whether this call may be hedged at all.
+            can_hedge (Callable[[], bool], optional): Asked right before a hedge is sent,
+                e.g. to take the extra request from a rate limit.
+            release (Callable[[], None], optional): Called once for every attempt
+                (including the first) when its request has returned, e.g. to give back
+                the concurrency slot taken for it.
+            discard (Callable[[Any], None], optional): Called with the result of every
+                attempt that lost.
+
+        Returns:
+            Any: The result of the first attempt to succeed.
+
+        Raises:
+            TimeoutError: If no attempt succeeded before the deadline.
+        """
+        tracker = self.tracker(key)
+        hedge_after = tracker.percentile(self.quantile) if self.enabled and hedge else None
+        if deadline is None and hedge_after is None:
+            start = time.monotonic()
+            try:
+                result = func(threading.Event())
+            finally:
+                if release is not None:
+                    release()
+            tracker.record(time.monotonic() - start)
+            return result
+
+        self.budget.record_call()
+        finished = queue.Queue()
+        cancels = []
+        decided = threading.Event()
+        decided_lock = threading.Lock()
+
+        def _attempt():
+            cancel = threading.Event()
+            cancels.append(cancel)
+            started = time.monotonic()
+
+            def _run():
+                try:
+                    outcome = (time.monotonic() - started, func(cancel), None)
+                except Exception as e:
+                    outcome = (None, None, e)
+                finally:
+                    if release is not None:
+                        release()
+                with decided_lock:
+                    if not decided.is_set():
+                        finished.put(outcome)
+                        return
+                # The call was already decided; clean up after this attempt
+                if outcome[2] is None and discard is not None:
+                    discard(outcome[1])
+
+            threading.Thread(target=_run, name=f"hedge-{key}", daemon=True).start()
+
+        start = time.monotonic()
+        end = start + deadline if deadline else None
+        _attempt()
+        running = 1
+        hedged = False
+        error = None
+        try:
+            while True:
+                waits = []
+                if end is not None:
+                    waits.append(end - time.monotonic())
+                if not hedged and hedge_after is not None:
+                    waits.append(start + hedge_after - time.monotonic())
+                try:
+                    latency, result, attempt_error = finished.get(timeout=max(0.0, min(waits)) if waits else None)
+                except queue.Empty:
+                    if end is not None and time.monotonic() >= end:
+                        raise TimeoutError(f"{key} call did not finish within its {deadline:g}s deadline") from error
+                    hedged = True
+                    if self.budget.try_spend() and (can_hedge is None or can_hedge()):
+                        print(f"{key} call passed p{int(self.quantile * 100)} latency ({hedge_after:.1f}s), sending a hedged request")
+                        trace_utils.count("hedges")
+                        _attempt()
+                        running += 1
+                    continue
+                running -= 1
+                if attempt_error is None:
+                    tracker.record(latency)
+                    return result
+                error = attempt_error
+                if running == 0:
+                    raise error
+        finally:
+            with decided_lock:
+                decided.set()
+            for cancel in cancels:
+                cancel.set()
+            # Attempts that finished but were never picked up lost the race
+            while not finished.empty():
+                _, result, attempt_error = finished.get()
+                if attempt_error is None and discard is not None:
+                    discard(result)
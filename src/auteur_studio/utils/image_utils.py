@@ -0,0 +1,152 @@
+from typing import List, Optional, Tuple
+import hashlib
+import json
+import os
+from . import file_utils, parallel_utils, trace_utils
+
+# Pixel format of normalized frames: 8-bit RGB, which every encoder path converts to yuv420p
+FRAME_MODE = "RGB"
+
+def frame_key(image_file: str, width: int, height: int, background: Tuple[int, int, int] = (0, 0, 0)) -> str:
+    """
+    Hash the contents of an image together with the frame settings.
+
+    Args:
+        image_file (str): Path to the source image; a missing file gives the key of a blank frame.
+        width (int): Frame width.
+        height (int): Frame height.
+        background (Tuple[int, int, int]): Letterbox color.
+
+    Returns:
+        str: A hex digest identifying the normalized frame.
+    """
+    digest = hashlib.sha256()
+    if image_file and os.path.exists(image_file):
+        with open(image_file, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    digest.update(b'\0')
+    digest.update(json.dumps({"width": width, "height": height, "background": list(background), "mode": FRAME_MODE}).encode('utf-8'))
+    return digest.hexdigest()
+
+def normalize_image(image_file: str, output_filename: str, width: int = 1280, height: int = 720, background: Tuple[int, int, int] = (0, 0, 0)) -> str:
+    """
+    Resize an image to fit the frame, letterbox it and save it as an RGB PNG.
+
+    The aspect ratio is kept and the image is centered on a canvas of the background
+    color. Transparent areas are filled with the background and EXIF rotation is
+    applied. A missing or unreadable image gives a blank frame, like the black frame
+    the ffmpeg backend uses.
+
+    Args:
+        image_file (str): Path to the source image.
+        output_filename (str): Where the frame is written (atomically).
+        width (int): Frame width.
+        height (int): Frame height.
+        background (Tuple[int, int, int]): Letterbox color.
+
+    Returns:
+        str: The path to the frame.
+    """
+    from PIL import Image, ImageOps
+    resample = getattr(Image, "Resampling", Image).LANCZOS
+    frame = Image.new(FRAME_MODE, (width, height), tuple(background))
+    if image_file and os.path.exists(image_file) and os.path.getsize(image_file) > 0:
+        try:
+            with Image.open(image_file) as image:
+                # Lets JPEG decode straight at a reduced scale that is still at least the frame size
+                image.draft(FRAME_MODE, (width, height))
+                image = ImageOps.exif_transpose(image)
+                if image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info:
+                    image = image.convert("RGBA")
+                    flat = Image.new(FRAME_MODE, image.size, tuple(background))
+                    flat.paste(image, mask=image.getchannel("A"))
+                    image = flat
+                elif image.mode != FRAME_MODE:
+                    image = image.convert(FRAME_MODE)
+                if image.size != (width, height):
+                    image = ImageOps.contain(image, (width, height), method=resample)
+                frame.paste(image, ((width - image.width) // 2, (height - image.height) // 2))
+        except (OSError, ValueError) as e:
+            print(f"Could not read image {image_file} ({e}), using a blank frame")
+
+    # A unique temporary file, so processes normalizing the same image do not write over each other
+    fd, tmp_file = file_utils.mkstemp(os.path.dirname(os.path.abspath(output_filename)))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # Frames are read once by the encoder, so fast compression beats small files
+            frame.save(f, format="PNG", compress_level=1)
+        os.replace(tmp_file, output_filename)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return output_filename
+
+@trace_utils.traced("encode", "encode.normalize")
+def normalized_frame(image_file: str, frame_dir: str, width: int = 1280, height: int = 720, background: Tuple[int, int, int] = (0, 0, 0)) -> str:
+    """
+    Return the normalized frame of a single image, creating it in this process if needed.
+
+    Frames are named exactly as ``normalize_images`` names them, so scenes rendered one
+    at a time (e.g. by the DAG scheduler) and whole compiles share the frame directory.
+
+    Returns:
+        str: The path to the frame.
+    """
+    os.makedirs(frame_dir, exist_ok=True)
+    frame_file = os.path.join(frame_dir, f"{frame_key(image_file, width, height, background)}.png")
+    if os.path.exists(frame_file) and os.path.getsize(frame_file) > 0:
+        trace_utils.annotate(cache_hit=True)
+        return frame_file
+    return normalize_image(image_file, frame_file, width, height, background)
+
+def normalize_images(image_files: List[str], frame_dir: str, width: int = 1280, height: int = 720, background: Tuple[int, int, int] = (0, 0, 0), workers: Optional[int] = None) -> List[str]:
+    """
+    Bring every scene image to the output size and pixel format, in parallel.
+
+    Frames are kept in ``frame_dir`` under a hash of their source image and settings, so
+    only new or changed images are decoded and resized again. Misses are processed in a
+    process pool, which keeps decoding and resampling off the GIL and on every core.
+
+    Args:
+        image_files (List[str]): Paths to the scene images (one per scene).
+        frame_dir (str): Directory for the normalized frames.
+        width (int): Frame width.
+        height (int): Frame height.
+        background (Tuple[int, int, int]): Letterbox color.
+        workers (int, optional): Images processed at once; defaults to the CPU count.
+
+    Returns:
+        List[str]: The frame of each scene, in order.
+    """
+    os.makedirs(frame_dir, exist_ok=True)
+    frames = []
+    jobs = []
+    for image_file in image_files:
+        frame_file = os.path.join(frame_dir, f"{frame_key(image_file, width, height, background)}.png")
+        if frame_file not in frames and not (os.path.exists(frame_file) and os.path.getsize(frame_file) > 0):
+            jobs.append((image_file, frame_file, width, height, tuple(background)))
+        frames.append(frame_file)
+
+    if len(jobs) == 1:
+        with trace_utils.span("encode.normalize", "encode"):
+            normalize_image(*jobs[0])
+    elif jobs:
+        print(f"Normalizing {len(jobs)} of {len(frames)} image(s)")
+        parallel_utils.run_processes(normalize_image, jobs, "encode.normalize", "encode", "normalize worker", workers=workers)
+    return frames
+
+def prune_frames(frame_dir: str, keep: List[str]) -> None:
+    """
+    Remove the frames in a directory that are not used by the current story.
+
+    Args:
+        frame_dir (str): The frame directory.
+        keep (List[str]): Paths of the frames still in use.
+    """
+    if not os.path.isdir(frame_dir):
+        return
+    for name in os.listdir(frame_dir):
+        path = os.path.join(frame_dir, name)
+        if path not in keep and name.endswith(".png"):
+            os.remove(path)
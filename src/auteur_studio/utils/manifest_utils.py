@@ -0,0 +1,130 @@
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+from .sqlite_utils import ThreadConnections
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS manifest (
+    stage TEXT NOT NULL,
+    key TEXT NOT NULL,
+    input_hash TEXT NOT NULL,
+    outputs TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (stage, key)
+);
+"""
+
+class Manifest:
+    """
+    Per-project record of which inputs produced which outputs, for each stage.
+
+    Entries are keyed by stage (e.g. "audio") and item (e.g. "3:0" for scene 3, line 0)
+    and hold the hash of the item's inputs, its output paths and its status. Each entry
+    is its own row in a SQLite file (the project store's), so progress survives a crash
+    and worker processes recording different items never overwrite each other.
+
+    Args:
+        path (str): The SQLite file.
+        legacy_path (str, optional): A manifest.json written by earlier versions, imported
+            when the table is still empty.
+    """
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None):
+        self.path = path
+        self._connections = ThreadConnections(path)
+        # (stage, key) pairs completed by this process, which never need redoing in the same run
+        self.completed = set()
+        db = self._connections.get()
+        db.executescript(SCHEMA)
+        if legacy_path and os.path.exists(legacy_path) and db.execute("SELECT 1 FROM manifest LIMIT 1").fetchone() is None:
+            self._import(legacy_path)
+
+    def _import(self, legacy_path: str) -> None:
+        try:
+            with open(legacy_path, 'r') as f:
+                stages = json.load(f).get("stages", {})
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable manifest {legacy_path}: {e}")
+            return
+        db = self._connections.get()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.executemany(
+                "INSERT OR IGNORE INTO manifest (stage, key, input_hash, outputs, status) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (stage, key, entry["input_hash"], json.dumps(entry["outputs"]), entry.get("status", "done"))
+                    for stage, entries in stages.items()
+                    for key, entry in entries.items()
+                ],
+            )
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def hash_inputs(**inputs: Any) -> str:
+        """
+        Hash everything that influences an item's output.
+
+        Args:
+            **inputs: Text, prompt, voice, model names, config values, etc.
+
+        Returns:
+            str: A hex digest of the inputs.
+        """
+        payload = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, stage: str, key: str) -> Optional[Dict[str, Any]]:
+        """Return the recorded entry for an item, if any, including entries recorded by other processes."""
+        row = self._connections.get().execute(
+            "SELECT input_hash, outputs, status FROM manifest WHERE stage = ? AND key = ?", (stage, str(key))
+        ).fetchone()
+        if row is None:
+            return None
+        return {"input_hash": row[0], "outputs": json.loads(row[1]), "status": row[2]}
+
+    def outputs(self, stage: str, key: str) -> List[str]:
+        """Return the output paths recorded for an item."""
+        entry = self.get(stage, key)
+        return list(entry["outputs"]) if entry else []
+
+    def is_fresh(self, stage: str, key: str, input_hash: str) -> bool:
+        """
+        Check whether an item can be skipped.
+
+        Args:
+            stage (str): The pipeline stage.
+            key (str): The item key within the stage.
+            input_hash (str): The hash of the item's current inputs.
+
+        Returns:
+            bool: True if the item completed with the same inputs and all of its
+            outputs still exist and are non-empty.
+        """
+        entry = self.get(stage, key)
+        if not entry or entry.get("status") != "done" or entry.get("input_hash") != input_hash:
+            return False
+        return all(os.path.exists(path) and os.path.getsize(path) > 0 for path in entry["outputs"])
+
+    def record(self, stage: str, key: str, input_hash: str, outputs: List[str], status: str = "done") -> None:
+        """
+        Record the result of an item and persist the manifest.
+
+        Args:
+            stage (str): The pipeline stage.
+            key (str): The item key within the stage.
+            input_hash (str): The hash of the inputs that produced the outputs.
+            outputs (List[str]): The output paths.
+            status (str): "done" or "failed".
+        """
+        self._connections.get().execute(
+            "INSERT OR REPLACE INTO manifest (stage, key, input_hash, outputs, status) VALUES (?, ?, ?, ?, ?)",
+            (stage, str(key), input_hash, json.dumps(list(outputs)), status),
+        )
+        if status == "done":
+            self.completed.add((stage, str(key)))
+        else:
+            self.completed.discard((stage, str(key)))
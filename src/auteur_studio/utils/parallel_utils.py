@@ -0,0 +1,88 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from . import trace_utils
+
+def run_parallel(func: Callable[[Any], Any], items: Sequence[Any], max_workers: int = 4) -> List[Tuple[Any, Optional[Exception]]]:
+    """
+    Run a function over a sequence of items using a bounded thread pool.
+
+    Args:
+        func (Callable): The function to call for each item.
+        items (Sequence[Any]): The items to process.
+        max_workers (int): Maximum number of calls running at the same time.
+
+    Returns:
+        List[Tuple[Any, Optional[Exception]]]: One (result, error) pair per item, in the
+        same order as the input. Exactly one of the two is set for each item.
+    """
+    if not items:
+        return []
+
+    def _call(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        return list(executor.map(_call, items))
+
+def run_processes(func: Callable[..., str], jobs: Sequence[Tuple], name: str, category: str, thread: str, workers: Optional[int] = None) -> List[str]:
+    """
+    Run a function over argument tuples in a process pool, tracing every job.
+
+    Worker processes cannot reach the tracer, so each job is timed where it runs and
+    recorded here, on one track per worker process.
+
+    Args:
+        func (Callable[..., str]): A module-level function that writes a file and returns
+            its path; it is called as ``func(*job)``.
+        jobs (Sequence[Tuple]): The arguments of each call.
+        name (str): Span name of each job (e.g. "encode.segment").
+        category (str): Span category.
+        thread (str): Track label, followed by the worker's process id.
+        workers (int, optional): Processes in the pool; defaults to the CPU count.
+
+    Returns:
+        List[str]: The path returned by each call, in the same order as ``jobs``.
+    """
+    paths = []
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(jobs))) as executor:
+        for path, start, end, pid in executor.map(_call_timed, [(func, job) for job in jobs]):
+            trace_utils.record(name, category, start, end, thread=f"{thread} {pid}", bytes_out=os.path.getsize(path))
+            paths.append(path)
+    return paths
+
+def _call_timed(call: Tuple[Callable[..., str], Tuple]) -> Tuple[str, float, float, int]:
+    func, job = call
+    start = time.time()
+    path = func(*job)
+    return path, start, time.time(), os.getpid()
+
+def is_valid_asset(path: Optional[str]) -> bool:
+    """
+    Check whether a generated asset exists and is not an empty fallback file.
+
+    Args:
+        path (str): Path to the asset file.
+
+    Returns:
+        bool: True if the file exists and has content.
+    """
+    return bool(path) and os.path.exists(path) and os.path.getsize(path) > 0
+
+def report_failures(stage: str, failures: List[Tuple[str, Any]]) -> None:
+    """
+    Print a summary of the items that failed during a stage.
+
+    Args:
+        stage (str): The name of the stage (e.g. "audio").
+        failures (List[Tuple[str, Any]]): (item label, error) pairs.
+    """
+    if not failures:
+        return
+    print(f"{stage}: {len(failures)} item(s) failed:")
+    for label, error in failures:
+        print(f"  - {label}: {error}")
\ No newline at end of file
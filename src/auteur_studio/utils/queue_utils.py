@@ -0,0 +1,263 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional
+from .sqlite_utils import ThreadConnections
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    name TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project TEXT NOT NULL,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    updated REAL NOT NULL,
+    UNIQUE (project, name)
+);
+CREATE TABLE IF NOT EXISTS deps (
+    task INTEGER NOT NULL,
+    dep INTEGER NOT NULL,
+    PRIMARY KEY (task, dep)
+);
+CREATE INDEX IF NOT EXISTS tasks_by_state ON tasks (state, kind);
+"""
+
+# States a task can be in; 'done' and 'failed' are final
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+
+class WorkQueue:
+    """
+    Durable queue of per-scene tasks in a SQLite file, shared by worker processes.
+
+    Workers on one or more machines (the file must then be on a shared filesystem)
+    claim a task by taking a lease on it, extend the lease with heartbeats while they
+    work, and report it done or failed. A task whose lease runs out, e.g. because its
+    worker died, goes back to pending and is claimed again, up to ``max_attempts``
+    times. A task only becomes claimable once every task it depends on is final; like
+    the dag scheduler, it still runs if one of them failed.
+
+    Leases are compared against each machine's wall clock, so the clocks of the
+    workers need to be roughly in sync (well within the lease length).
+    """
+
+    def __init__(self, path: str, journal_mode: str = "DELETE", busy_timeout: float = 30.0):
+        self.path = path
+        self.journal_mode = journal_mode
+        self.busy_timeout = busy_timeout
+        self._connections = ThreadConnections(path, busy_timeout, journal_mode=journal_mode, row_factory=sqlite3.Row)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def _transaction(self):
+        return _Transaction(self._connection())
+
+    def submit(self, project: str, config: Dict[str, Any], tasks: List[Dict[str, Any]], max_attempts: int = 3) -> None:
+        """
+        Replace a project's tasks with a new set, atomically.
+
+        Args:
+            project (str): The project name.
+            config (Dict[str, Any]): The project configuration workers should use.
+            tasks (List[Dict[str, Any]]): Tasks with a unique ``name``, a ``kind`` (e.g.
+                "tts", "image", "comfyui", "render"), a JSON-serializable ``payload`` and
+                optionally the names of the tasks they depend on in ``deps``.
+            max_attempts (int): Times a task is tried before it is marked failed.
+        """
+        now = time.time()
+        with self._transaction() as db:
+            db.execute("DELETE FROM deps WHERE task IN (SELECT id FROM tasks WHERE project = ?)", (project,))
+            db.execute("DELETE FROM tasks WHERE project = ?", (project,))
+            db.execute("INSERT OR REPLACE INTO projects (name, config, created) VALUES (?, ?, ?)", (project, json.dumps(config, default=str), now))
+            ids = {}
+            for task in tasks:
+                cursor = db.execute(
+                    "INSERT INTO tasks (project, name, kind, payload, max_attempts, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                    (project, task['name'], task['kind'], json.dumps(task.get('payload', {})), max_attempts, now),
+                )
+                ids[task['name']] = cursor.lastrowid
+            for task in tasks:
+                for dep in task.get('deps', ()):
+                    db.execute("INSERT INTO deps (task, dep) VALUES (?, ?)", (ids[task['name']], ids[dep]))
+
+    def project_config(self, project: str) -> Optional[Dict[str, Any]]:
+        """Return the configuration a project was submitted with."""
+        row = self._connection().execute("SELECT config FROM projects WHERE name = ?", (project,)).fetchone()
+        return json.loads(row['config']) if row else None
+
+    def reclaim(self) -> int:
+        """
+        Return tasks with expired leases to pending (or failed, once out of attempts).
+
+        Returns:
+            int: The number of tasks reclaimed.
+        """
+        with self._transaction() as db:
+            return self._reclaim(db)
+
+    def _reclaim(self, db: sqlite3.Connection) -> int:
+        cursor = db.execute(
+            "UPDATE tasks SET state = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, "
+            "error = 'lease of ' || worker || ' expired', worker = NULL, lease_expires = NULL, updated = ? "
+            "WHERE state = ? AND lease_expires < ?",
+            (FAILED, PENDING, time.time(), LEASED, time.time()),
+        )
+        return cursor.rowcount
+
+    def claim(self, worker: str, kinds: Optional[Iterable[str]] = None, lease_seconds: float = 60.0) -> Optional[Dict[str, Any]]:
+        """
+        Lease the oldest ready task.
+
+        Args:
+            worker (str): Identifies the claiming worker (e.g. host:pid).
+            kinds (Iterable[str], optional): Only claim tasks of these kinds.
+            lease_seconds (float): How long the lease lasts without a heartbeat.
+
+        Returns:
+            Optional[Dict[str, Any]]: The task (id, project, name, kind, payload, attempts,
+            and the ``results`` of its dependencies by name), or None if nothing is ready.
+        """
+        kinds = list(kinds or [])
+        kind_filter = f"AND t.kind IN ({', '.join('?' * len(kinds))})" if kinds else ""
+        with self._transaction() as db:
+            self._reclaim(db)
+            row = db.execute(
+                "SELECT t.* FROM tasks t WHERE t.state = ? " + kind_filter + " "
+                "AND NOT EXISTS (SELECT 1 FROM deps d JOIN tasks u ON u.id = d.dep WHERE d.task = t.id AND u.state NOT IN (?, ?)) "
+                "ORDER BY t.attempts, t.id LIMIT 1",
+                [PENDING] + kinds + [DONE, FAILED],
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE tasks SET state = ?, worker = ?, lease_expires = ?, attempts = attempts + 1, updated = ? WHERE id = ?",
+                (LEASED, worker, time.time() + lease_seconds, time.time(), row['id']),
+            )
+            deps = db.execute(
+                "SELECT u.name, u.state, u.result, u.error FROM deps d JOIN tasks u ON u.id = d.dep WHERE d.task = ?",
+                (row['id'],),
+            ).fetchall()
+        return {
+            'id': row['id'],
+            'project': row['project'],
+            'name': row['name'],
+            'kind': row['kind'],
+            'payload': json.loads(row['payload']),
+            'attempts': row['attempts'] + 1,
+            'results': {dep['name']: json.loads(dep['result']) if dep['result'] else None for dep in deps},
+            'dep_errors': {dep['name']: dep['error'] for dep in deps if dep['state'] == FAILED},
+        }
+
+    def heartbeat(self, task_id: int, worker: str, lease_seconds: float = 60.0) -> bool:
+        """
+        Extend a lease.
+
+        Returns:
+            bool: False if the worker no longer holds the lease (it expired and the task
+            was reclaimed), in which case the worker should give up on the task.
+        """
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET lease_expires = ?, updated = ? WHERE id = ? AND worker = ? AND state = ?",
+                (time.time() + lease_seconds, time.time(), task_id, worker, LEASED),
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, task_id: int, worker: str, result: Any = None) -> bool:
+        """Mark a leased task done with its result; returns False if the lease was lost."""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET state = ?, result = ?, error = NULL, worker = NULL, lease_expires = NULL, updated = ? "
+                "WHERE id = ? AND worker = ? AND state = ?",
+                (DONE, json.dumps(result, default=str), time.time(), task_id, worker, LEASED),
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, task_id: int, worker: str, error: str) -> bool:
+        """Record a failed attempt; the task is retried until it runs out of attempts. Returns False if the lease was lost."""
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE tasks SET state = CASE WHEN attempts >= max_attempts THEN ? ELSE ? END, error = ?, "
+                "worker = NULL, lease_expires = NULL, updated = ? WHERE id = ? AND worker = ? AND state = ?",
+                (FAILED, PENDING, error, time.time(), task_id, worker, LEASED),
+            )
+            return cursor.rowcount == 1
+
+    def counts(self, project: Optional[str] = None) -> Dict[str, int]:
+        """Return the number of tasks per state, for one project or the whole queue."""
+        query = "SELECT state, COUNT(*) AS n FROM tasks" + (" WHERE project = ?" if project else "") + " GROUP BY state"
+        rows = self._connection().execute(query, (project,) if project else ()).fetchall()
+        return {row['state']: row['n'] for row in rows}
+
+    def tasks(self, project: str) -> List[Dict[str, Any]]:
+        """Return every task of a project with its state, result and error."""
+        rows = self._connection().execute("SELECT * FROM tasks WHERE project = ? ORDER BY id", (project,)).fetchall()
+        return [
+            {
+                'name': row['name'],
+                'kind': row['kind'],
+                'state': row['state'],
+                'attempts': row['attempts'],
+                'worker': row['worker'],
+                'result': json.loads(row['result']) if row['result'] else None,
+                'error': row['error'],
+            }
+            for row in rows
+        ]
+
+    def is_idle(self, project: Optional[str] = None) -> bool:
+        """Whether no task (of the project) is pending or leased."""
+        counts = self.counts(project)
+        return not counts.get(PENDING) and not counts.get(LEASED)
+
+    def wait(self, project: str, poll_interval: float = 2.0) -> Dict[str, int]:
+        """Block until every task of a project is final and return the counts per state."""
+        while not self.is_idle(project):
+            time.sleep(poll_interval)
+            self.reclaim()
+        return self.counts(project)
+
+class _Transaction:
+    """``with`` block that runs statements in one write transaction (BEGIN IMMEDIATE)."""
+
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def __enter__(self) -> sqlite3.Connection:
+        # Take the write lock up front so two workers cannot claim the same task
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+def get_work_queue(config: Dict[str, Any], path: Optional[str] = None) -> WorkQueue:
+    """
+    Open the work queue described by the ``queue`` section of the config.
+
+    Args:
+        config (Dict[str, Any]): The configuration.
+        path (str, optional): Overrides ``queue.path``.
+
+    Returns:
+        WorkQueue: The queue (created if it does not exist yet).
+    """
+    queue_config = config.get('queue', {})
+    path = path or queue_config.get('path') or os.path.join(config['paths']['project_root'], 'queue.db')
+    return WorkQueue(os.path.expanduser(path), journal_mode=queue_config.get('journal_mode', 'DELETE'))
@@ -0,0 +1,291 @@
+import json
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+from .hedge_utils import Hedger, LatencyTracker
+from . import trace_utils
+
+# HTTP status codes worth retrying: throttling and transient server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a per-minute rate.
+
+    ``acquire`` blocks until enough tokens are available. ``debit`` takes tokens without
+    waiting and may leave the bucket in debt, which later callers then wait out; it is
+    used to settle the real token count of a call once it is known.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount: float = 1.0) -> None:
+        """Wait until ``amount`` tokens are available and take them."""
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                wait = (amount - self.level) / self.rate
+            time.sleep(wait)
+
+    def try_acquire(self, amount: float = 1.0) -> bool:
+        """Take ``amount`` tokens if they are available right now."""
+        with self._lock:
+            self._refill()
+            if self.level >= amount:
+                self.level -= amount
+                return True
+            return False
+
+    def debit(self, amount: float) -> None:
+        """Take tokens without waiting."""
+        with self._lock:
+            self._refill()
+            self.level -= amount
+
+class ModelLimiter:
+    """
+    Rate and concurrency limits for one model.
+
+    Requests per minute and tokens per minute are enforced with token buckets. The
+    number of calls in flight is adjusted with AIMD: every successful call raises the
+    limit by about one per round of calls, while a 429 cuts it, at most once per round
+    so a burst of throttled calls counts as one signal. A call that takes longer than
+    ``latency_tolerance`` times the 90th percentile of the recent window counts as a
+    congestion signal too. The window adapts to the mix of long and short requests, so
+    one long dialogue line after short ones is not mistaken for congestion.
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None, max_concurrency: Optional[int] = None, decrease_factor: float = 0.5, latency_tolerance: float = 3.0):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency) if max_concurrency else None
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self.latency = LatencyTracker(window=100, min_samples=20)
+        self.last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self, tokens: float = 0) -> None:
+        """Wait for a concurrency slot and for quota for one request of ``tokens`` tokens."""
+        if self.limit is not None:
+            with self._condition:
+                while self.in_flight >= int(self.limit):
+                    self._condition.wait()
+                self.in_flight += 1
+        if self.requests is not None:
+            self.requests.acquire(1)
+        if self.tokens is not None and tokens:
+            self.tokens.acquire(tokens)
+
+    def release(self) -> None:
+        """Give back a concurrency slot once a request (or a hedge of it) has returned."""
+        if self.limit is not None:
+            with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    def record(self, latency: Optional[float] = None, throttled: bool = False) -> None:
+        """
+        Adapt the limit to the outcome of a call.
+
+        Args:
+            latency (float, optional): Duration of a successful call in seconds.
+            throttled (bool): Whether the call was rejected with a 429.
+        """
+        with self._condition:
+            if self.limit is not None:
+                now = time.monotonic()
+                congested = throttled
+                if latency is not None:
+                    slow = self.latency.percentile(0.9)
+                    congested = congested or (slow is not None and latency > self.latency_tolerance * slow)
+                    self.latency.record(latency)
+                round_time = self.latency.percentile(0.5) or 1.0
+                if congested:
+                    if now - self.last_decrease > round_time:
+                        self.limit = max(1.0, self.limit * self.decrease_factor)
+                        self.last_decrease = now
+                elif latency is not None:
+                    self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+                self._condition.notify_all()
+
+    def try_acquire_hedge(self, tokens: float = 0) -> bool:
+        """Take a concurrency slot and quota for a hedged request without waiting; hedges are skipped when there are none."""
+        if self.limit is not None:
+            with self._condition:
+                if self.in_flight >= int(self.limit):
+                    return False
+                self.in_flight += 1
+        if self.requests is not None and not self.requests.try_acquire(1):
+            self.release()
+            return False
+        if self.tokens is not None and tokens:
+            self.tokens.debit(tokens)
+        return True
+
+    def settle(self, estimated: float, actual: Optional[float]) -> None:
+        """Charge the difference between the estimated and the reported token count."""
+        if self.tokens is not None and actual is not None and actual > estimated:
+            self.tokens.debit(actual - estimated)
+
+class RateLimiter:
+    """
+    Rate limits, retries and adaptive concurrency shared by every Gemini agent.
+
+    Each model gets its own ``ModelLimiter`` from the ``rate_limits.models`` config, and
+    models without an entry are not throttled but still retried. Every attempt runs
+    under the deadline and hedging policy of the ``latency`` config. Throttled (429) and
+    transient (5xx, timeout) errors, including missed deadlines, are retried with
+    full-jitter exponential backoff; any other error is raised straight away.
+    """
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, latency_config: Optional[Dict[str, Any]] = None):
+        config = config or {}
+        latency_config = latency_config or {}
+        self.models_config = config.get('models') or {}
+        self.max_retries = config.get('max_retries', 5)
+        self.base_delay = config.get('base_delay', 1.0)
+        self.max_delay = config.get('max_delay', 60.0)
+        self.default_deadline = latency_config.get('deadline')
+        self.deadlines = latency_config.get('deadlines') or {}
+        self.hedger = Hedger(
+            enabled=latency_config.get('hedge', False),
+            quantile=latency_config.get('hedge_quantile', 0.95),
+            min_samples=latency_config.get('hedge_min_samples', 20),
+            max_ratio=latency_config.get('hedge_budget', 0.05),
+        )
+        self.models = {}
+        self._lock = threading.Lock()
+
+    def deadline(self, model: str) -> Optional[float]:
+        """Return the per-call deadline of a model in seconds, if any."""
+        return self.deadlines.get(model, self.default_deadline)
+
+    def get(self, model: str) -> ModelLimiter:
+        """Return the limiter of a model, creating it on first use."""
+        with self._lock:
+            if model not in self.models:
+                model_config = self.models_config.get(model) or {}
+                self.models[model] = ModelLimiter(
+                    rpm=model_config.get('rpm'),
+                    tpm=model_config.get('tpm'),
+                    max_concurrency=model_config.get('max_concurrency'),
+                )
+            return self.models[model]
+
+    def call(self, model: str, func: Callable[[threading.Event], Any], tokens: float = 0, hedge: bool = True, discard: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        Call the API under the model's limits, retrying throttled and transient errors.
+
+        Args:
+            model (str): The model being called.
+            func (Callable[[threading.Event], Any]): Makes the request and returns its
+                response. It receives an event that is set once its result is no longer
+                needed, so streaming requests can stop early.
+            tokens (float): Estimated token count of the request, for the TPM limit.
+            hedge (bool): Whether the request may be duplicated when it runs late. Calls
+                with side effects while they run (e.g. streamed scene callbacks) pass False.
+            discard (Callable[[Any], None], optional): Cleans up the result of a hedged
+                attempt that lost.
+
+        Returns:
+            Any: Whatever ``func`` returns.
+        """
+        limiter = self.get(model)
+        attempt = 0
+        while True:
+            limiter.acquire(tokens)
+            start = time.monotonic()
+            try:
+                result = self.hedger.call(
+                    model,
+                    func,
+                    deadline=self.deadline(model),
+                    hedge=hedge,
+                    can_hedge=lambda: limiter.try_acquire_hedge(tokens),
+                    release=limiter.release,
+                    discard=discard,
+                )
+            except Exception as e:
+                status = error_status(e)
+                limiter.record(throttled=status == 429)
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+                attempt += 1
+                trace_utils.count("retries")
+                print(f"{model} call failed ({status or type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            limiter.record(latency=time.monotonic() - start)
+            usage = getattr(result, 'usage_metadata', None)
+            total_tokens = getattr(usage, 'total_token_count', None)
+            limiter.settle(tokens, total_tokens)
+            if total_tokens:
+                trace_utils.count("tokens", total_tokens)
+            return result
+
+def error_status(error: Exception) -> Optional[int]:
+    """Return the HTTP status of an API error, if it carries one."""
+    for attribute in ('code', 'status_code'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, 'response', None)
+    value = getattr(response, 'status_code', None)
+    if isinstance(value, int):
+        return value
+    if 'RESOURCE_EXHAUSTED' in str(error):
+        return 429
+    return None
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an API error is worth retrying (throttling, server errors, timeouts, dropped connections)."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return error_status(error) in RETRYABLE_STATUS
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of a prompt (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+_shared_limiters = {}
+_shared_lock = threading.Lock()
+
+def get_rate_limiter(config: Dict[str, Any]) -> RateLimiter:
+    """
+    Return the rate limiter for the ``rate_limits`` and ``latency`` sections of the config.
+
+    Projects with the same settings share one limiter, so several projects running in
+    the same process stay within the same quota.
+
+    Args:
+        config (Dict[str, Any]): The project configuration.
+
+    Returns:
+        RateLimiter: The shared limiter.
+    """
+    limits_config = config.get('rate_limits') or {}
+    latency_config = config.get('latency') or {}
+    key = json.dumps([limits_config, latency_config], sort_keys=True, default=str)
+    with _shared_lock:
+        if key not in _shared_limiters:
+            _shared_limiters[key] = RateLimiter(limits_config, latency_config)
+        return _shared_limiters[key]
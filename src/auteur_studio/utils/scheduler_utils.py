@@ -0,0 +1,199 @@
+import collections
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+class FairPool:
+    """
+    Fixed set of worker threads shared by several owners (e.g. the projects of a batch).
+
+    Every owner has its own queue and idle workers take the next task from the owners in
+    turn, so a project with hundreds of queued scenes cannot starve one that has just
+    started.
+    """
+
+    def __init__(self, workers: int, name: str = "pool"):
+        self.queues = collections.OrderedDict()
+        self.closed = False
+        self._condition = threading.Condition()
+        self.threads = [threading.Thread(target=self._work, name=f"{name}-{i}", daemon=True) for i in range(max(1, workers))]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, owner: Hashable, func: Callable[[], Any]) -> Future:
+        """
+        Queue a task for an owner.
+
+        Args:
+            owner (Hashable): Who the task belongs to; owners are served round-robin.
+            func (Callable[[], Any]): Called without arguments on a worker thread.
+
+        Returns:
+            Future: Resolves to the task's result or exception.
+        """
+        future = Future()
+        with self._condition:
+            if self.closed:
+                raise RuntimeError("Pool is shut down")
+            self.queues.setdefault(owner, collections.deque()).append((future, func))
+            self._condition.notify()
+        return future
+
+    def _next(self) -> Tuple[Future, Callable[[], Any]]:
+        # Take the oldest task of the first owner in line, then send that owner to the back
+        owner, tasks = next(iter(self.queues.items()))
+        task = tasks.popleft()
+        del self.queues[owner]
+        if tasks:
+            self.queues[owner] = tasks
+        return task
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while not self.queues and not self.closed:
+                    self._condition.wait()
+                if not self.queues:
+                    return
+                future, func = self._next()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(func())
+            except BaseException as e:
+                future.set_exception(e)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers once the queued tasks are done."""
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self.threads:
+                thread.join()
+
+class SharedPools:
+    """
+    One ``FairPool`` per resource class, shared by every ``DAGScheduler`` given it.
+
+    Several projects running in one process then stay within a single limit per
+    resource (Gemini TTS, Gemini image, ComfyUI, CPU encode) instead of each opening its
+    own pools.
+    """
+
+    def __init__(self, limits: Dict[str, int], default_limit: int = 4):
+        self.limits = dict(limits)
+        self.default_limit = default_limit
+        self.pools = {}
+        self._lock = threading.Lock()
+
+    def get(self, resource: str) -> FairPool:
+        """Return the pool of a resource class, creating it on first use."""
+        with self._lock:
+            if resource not in self.pools:
+                limit = self.limits.get(resource) or self.default_limit
+                self.pools[resource] = FairPool(limit, name=f"shared-{resource}")
+            return self.pools[resource]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            pools = list(self.pools.values())
+        for pool in pools:
+            pool.shutdown()
+
+class DAGScheduler:
+    """
+    Run a graph of tasks, starting each one as soon as the tasks it depends on have finished.
+
+    Every task belongs to a resource class (e.g. "tts", "image", "comfyui", "encode"), and
+    each class has its own thread pool, so a slow class never holds up the others and
+    each external service sees at most its own limit of concurrent calls. A task runs
+    even if one of its dependencies failed; it is up to the task to cope with missing
+    inputs, just like the sequential stages do.
+
+    With ``pools``, tasks run on shared ``FairPool``s under ``owner`` instead of on pools
+    of their own, so several graphs can run side by side within the same limits.
+    """
+
+    def __init__(self, limits: Dict[str, int], default_limit: int = 4, pools: Optional[SharedPools] = None, owner: Hashable = None):
+        self.limits = dict(limits)
+        self.default_limit = default_limit
+        self.shared_pools = pools
+        self.owner = owner
+        self.tasks = {}
+        self.order = []
+
+    def add(self, name: str, func: Callable[[], Any], deps: Iterable[str] = (), resource: str = "cpu") -> None:
+        """
+        Add a task to the graph.
+
+        Args:
+            name (str): Unique task name (e.g. "tts:3").
+            func (Callable[[], Any]): Called without arguments when the task runs.
+            deps (Iterable[str]): Names of the tasks that must finish first. Tasks that
+                were never added are ignored.
+            resource (str): The resource class whose pool runs the task.
+        """
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task {name}")
+        self.tasks[name] = (func, list(deps), resource)
+        self.order.append(name)
+
+    def run(self) -> Dict[str, Tuple[Any, Optional[Exception]]]:
+        """
+        Run every task in dependency order with the per-resource limits.
+
+        Returns:
+            Dict[str, Tuple[Any, Optional[Exception]]]: (result, error) per task name, in
+            the order the tasks were added.
+        """
+        waiting = {name: {dep for dep in deps if dep in self.tasks} for name, (_, deps, _) in self.tasks.items()}
+        dependents = {name: [] for name in self.tasks}
+        for name, deps in waiting.items():
+            for dep in deps:
+                dependents[dep].append(name)
+
+        pools = {}
+        finished = queue.Queue()
+        results = {}
+
+        def _call(name):
+            try:
+                finished.put((name, self.tasks[name][0](), None))
+            except Exception as e:
+                finished.put((name, None, e))
+
+        def _start(name):
+            resource = self.tasks[name][2]
+            if self.shared_pools is not None:
+                self.shared_pools.get(resource).submit(self.owner, lambda: _call(name))
+                return
+            if resource not in pools:
+                limit = self.limits.get(resource) or self.default_limit
+                pools[resource] = ThreadPoolExecutor(max_workers=max(1, limit), thread_name_prefix=f"dag-{resource}")
+            pools[resource].submit(_call, name)
+
+        running = 0
+        try:
+            for name in self.order:
+                if not waiting[name]:
+                    _start(name)
+                    running += 1
+            while running:
+                name, result, error = finished.get()
+                running -= 1
+                results[name] = (result, error)
+                for dependent in dependents[name]:
+                    waiting[dependent].discard(name)
+                    if not waiting[dependent]:
+                        _start(dependent)
+                        running += 1
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+
+        unfinished = [name for name in self.order if name not in results]
+        if unfinished:
+            raise ValueError(f"Dependency cycle between tasks: {', '.join(unfinished)}")
+        return {name: results[name] for name in self.order}
@@ -0,0 +1,37 @@
+import sqlite3
+import threading
+from typing import Optional
+
+class ThreadConnections:
+    """
+    One SQLite connection per thread for a database file.
+
+    sqlite3 connections must stay on the thread that opened them, so every thread that
+    touches the database gets its own, opened on first use. Connections are in
+    autocommit mode; callers open transactions explicitly (BEGIN / BEGIN IMMEDIATE).
+
+    Args:
+        path (str): The database file.
+        busy_timeout (float): Seconds to wait for a lock held by another connection.
+        journal_mode (str, optional): Journal mode to set on every connection. WAL is
+            faster but needs shared memory, which network filesystems do not offer.
+        row_factory (optional): Row factory of every connection (e.g. ``sqlite3.Row``).
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 30.0, journal_mode: Optional[str] = None, row_factory=None):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.journal_mode = journal_mode
+        self.row_factory = row_factory
+        self._local = threading.local()
+
+    def get(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it the first time."""
+        if not hasattr(self._local, "db"):
+            db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            if self.row_factory is not None:
+                db.row_factory = self.row_factory
+            if self.journal_mode:
+                db.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            self._local.db = db
+        return self._local.db
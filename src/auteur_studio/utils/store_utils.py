@@ -0,0 +1,120 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+from . import file_utils
+from .sqlite_utils import ThreadConnections
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS story (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scenes (
+    position INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+class ProjectStore:
+    """
+    The story and per-scene asset records of a project, in a SQLite file.
+
+    Every scene is its own row, so recording a scene's audio or image path is a small
+    atomic update instead of a rewrite of the whole script. Progress therefore survives
+    a crash in the middle of a stage, and several threads or worker processes can update
+    different scenes at the same time. ``export`` writes the familiar script.json.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 30.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._connections = ThreadConnections(path, busy_timeout)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        return self._connections.get()
+
+    def save_story(self, story: Dict[str, Any]) -> None:
+        """Replace the stored story and all of its scenes in one transaction."""
+        db = self._connection()
+        now = time.time()
+        fields = {key: value for key, value in story.items() if key != 'scenes'}
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM scenes")
+            db.execute("INSERT OR REPLACE INTO story (id, data, updated) VALUES (1, ?, ?)", (json.dumps(fields), now))
+            db.executemany(
+                "INSERT INTO scenes (position, data, updated) VALUES (?, ?, ?)",
+                [(position, json.dumps(scene), now) for position, scene in enumerate(story.get('scenes', []))],
+            )
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def load_story(self) -> Optional[Dict[str, Any]]:
+        """Return the stored story with its scenes in order, or None if nothing is stored."""
+        db = self._connection()
+        # One read transaction, so the story and its scenes are a consistent snapshot
+        db.execute("BEGIN")
+        try:
+            row = db.execute("SELECT data FROM story WHERE id = 1").fetchone()
+            scenes = db.execute("SELECT data FROM scenes ORDER BY position").fetchall()
+        finally:
+            db.execute("COMMIT")
+        if row is None:
+            return None
+        story = json.loads(row[0])
+        story['scenes'] = [json.loads(data) for data, in scenes]
+        return story
+
+    def update_scene(self, position: int, fields: Dict[str, Any]) -> None:
+        """
+        Set fields of one scene atomically, leaving the rest of the story untouched.
+
+        Args:
+            position (int): The scene's index in the story.
+            fields (Dict[str, Any]): The fields to set (e.g. audio_files, image_file).
+        """
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT data FROM scenes WHERE position = ?", (position,)).fetchone()
+            if row is None:
+                raise KeyError(f"No scene at position {position}")
+            scene = json.loads(row[0])
+            scene.update(fields)
+            db.execute("UPDATE scenes SET data = ?, updated = ? WHERE position = ?", (json.dumps(scene), time.time(), position))
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def clear(self) -> None:
+        """Remove the story and its scenes."""
+        db = self._connection()
+        db.execute("BEGIN IMMEDIATE")
+        db.execute("DELETE FROM scenes")
+        db.execute("DELETE FROM story")
+        db.execute("COMMIT")
+
+    def export(self, path: str) -> Optional[str]:
+        """
+        Write the stored story as script.json, atomically.
+
+        Returns:
+            Optional[str]: The path written, or None if no story is stored.
+        """
+        story = self.load_story()
+        if story is None:
+            return None
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = file_utils.mkstemp(directory, prefix=".script")
+        with os.fdopen(fd, 'w') as f:
+            json.dump(story, f, indent=2)
+        os.replace(tmp_path, path)
+        return path
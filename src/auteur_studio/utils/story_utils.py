@@ -0,0 +1,168 @@
+import json
+from typing import Any, Dict, List, Optional
+
+# Bumped whenever the schema or the validation rules change, so cached stories are regenerated
+SCHEMA_VERSION = 1
+
+# Response schema for Gemini's constrained decoding. The title comes first so that a streamed
+# story reaches the scenes array (and hands scenes over) as early as possible.
+STORY_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'title': {'type': 'STRING'},
+        'scenes': {
+            'type': 'ARRAY',
+            'min_items': 1,
+            'items': {
+                'type': 'OBJECT',
+                'properties': {
+                    'id': {'type': 'INTEGER'},
+                    'description': {'type': 'STRING'},
+                    'dialogue': {'type': 'ARRAY', 'items': {'type': 'STRING'}},
+                    'image_prompt': {'type': 'STRING'},
+                    'character_prompt': {'type': 'STRING'},
+                },
+                'required': ['id', 'description', 'dialogue', 'image_prompt'],
+                'property_ordering': ['id', 'description', 'dialogue', 'image_prompt', 'character_prompt'],
+            },
+        },
+    },
+    'required': ['title', 'scenes'],
+    'property_ordering': ['title', 'scenes'],
+}
+
+class StoryValidationError(ValueError):
+    """A story that does not match the expected structure, with every problem found."""
+
+    def __init__(self, errors: List[str]):
+        self.errors = errors
+        super().__init__("; ".join(errors))
+
+def _text(value: Any, path: str, errors: List[str], required: bool = True) -> str:
+    if value is None and not required:
+        return ""
+    if not isinstance(value, str):
+        errors.append(f"{path} must be a string")
+        return ""
+    if required and not value.strip():
+        errors.append(f"{path} must not be empty")
+    return value.strip()
+
+def validate_scene(scene: Any, index: int = 0, errors: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Check one scene and return a normalized copy.
+
+    Args:
+        scene (Any): The decoded scene object.
+        index (int): The scene's position, used in error messages.
+        errors (List[str], optional): Collects problems instead of raising.
+
+    Returns:
+        Dict[str, Any]: The scene with stripped strings, an int id and a character_prompt.
+
+    Raises:
+        StoryValidationError: If the scene is invalid and no ``errors`` list was passed.
+    """
+    collect = errors is not None
+    errors = errors if collect else []
+    path = f"scenes[{index}]"
+    if not isinstance(scene, dict):
+        errors.append(f"{path} must be an object")
+        if not collect:
+            raise StoryValidationError(errors)
+        return {}
+
+    scene_id = scene.get('id')
+    if isinstance(scene_id, str) and scene_id.strip().isdigit():
+        scene_id = int(scene_id)
+    if not isinstance(scene_id, int) or isinstance(scene_id, bool) or scene_id < 1:
+        errors.append(f"{path}.id must be a positive integer, got {scene_id!r}")
+
+    dialogue = scene.get('dialogue', [])
+    lines = []
+    if not isinstance(dialogue, list):
+        errors.append(f"{path}.dialogue must be a list of strings")
+        dialogue = []
+    for i, line in enumerate(dialogue):
+        line_path = f"{path}.dialogue[{i}]"
+        if not isinstance(line, str):
+            errors.append(f"{line_path} must be a string")
+            continue
+        character, separator, text = line.partition(':')
+        if not separator or not character.strip() or not text.strip():
+            errors.append(f"{line_path} must look like 'character: line', got {line!r}")
+            continue
+        lines.append(f"{character.strip()}: {text.strip()}")
+
+    normalized = dict(scene)
+    normalized.update(
+        id=scene_id,
+        description=_text(scene.get('description'), f"{path}.description", errors),
+        dialogue=lines,
+        image_prompt=_text(scene.get('image_prompt'), f"{path}.image_prompt", errors),
+        character_prompt=_text(scene.get('character_prompt'), f"{path}.character_prompt", errors, required=False),
+    )
+    if errors and not collect:
+        raise StoryValidationError(errors)
+    return normalized
+
+def validate_story(data: Any) -> Dict[str, Any]:
+    """
+    Check a decoded story in one pass and return a normalized copy.
+
+    Every problem is collected (scene ids, dialogue format, missing prompts, ...) so a
+    single repair request can fix them all.
+
+    Args:
+        data (Any): The decoded story JSON.
+
+    Returns:
+        Dict[str, Any]: The story with a title and validated scenes.
+
+    Raises:
+        StoryValidationError: With the list of problems, if the story is invalid.
+    """
+    if not isinstance(data, dict):
+        raise StoryValidationError([f"the story must be an object, got {type(data).__name__}"])
+    errors = []
+    title = _text(data.get('title'), "title", errors)
+    scenes = data.get('scenes')
+    if not isinstance(scenes, list) or not scenes:
+        errors.append("scenes must be a non-empty list")
+        scenes = []
+
+    normalized = []
+    seen = set()
+    for index, scene in enumerate(scenes):
+        scene = validate_scene(scene, index, errors)
+        scene_id = scene.get('id')
+        if isinstance(scene_id, int):
+            if scene_id in seen:
+                errors.append(f"scenes[{index}].id {scene_id} is used by an earlier scene")
+            seen.add(scene_id)
+        normalized.append(scene)
+
+    if errors:
+        raise StoryValidationError(errors)
+    story = dict(data)
+    story.update(title=title, scenes=normalized)
+    return story
+
+def parse_story(text: str) -> Dict[str, Any]:
+    """
+    Decode and validate a story returned in JSON mode.
+
+    Args:
+        text (str): The model output.
+
+    Returns:
+        Dict[str, Any]: The validated story.
+
+    Raises:
+        StoryValidationError: If the text is not JSON or the story is invalid.
+    """
+    try:
+        data = json.loads(text or "")
+    except json.JSONDecodeError as e:
+        raise StoryValidationError([f"the response is not valid JSON ({e})"])
+    return validate_story(data)
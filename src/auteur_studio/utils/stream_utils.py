@@ -0,0 +1,79 @@
+import json
+from typing import Any, Dict, List
+
+class SceneStreamParser:
+    """
+    Incremental parser that picks complete scenes out of a story JSON as it streams in.
+
+    Text is fed in arbitrary chunks. Once the ``"scenes"`` array has started, every
+    object at the top level of that array is emitted as soon as its closing brace
+    arrives. Strings and escapes are tracked so braces inside dialogue do not confuse
+    the parser, and surrounding prose or markdown fences are ignored.
+    """
+
+    def __init__(self, array_key: str = "scenes"):
+        self.array_key = array_key
+        self.buffer = ""
+        self._position = 0
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Add streamed text and return the scenes it completed.
+
+        Args:
+            text (str): The next chunk of model output.
+
+        Returns:
+            List[Dict[str, Any]]: Scenes completed by this chunk, in order.
+        """
+        self.buffer += text
+        scenes = []
+        if self._done:
+            return scenes
+        if not self._in_array:
+            key_index = self.buffer.find(f'"{self.array_key}"')
+            if key_index == -1:
+                return scenes
+            bracket_index = self.buffer.find("[", key_index)
+            if bracket_index == -1:
+                return scenes
+            self._in_array = True
+            self._position = bracket_index + 1
+
+        buffer = self.buffer
+        for index in range(self._position, len(buffer)):
+            char = buffer[index]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._object_start = index
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # End of the scenes array; ignore whatever follows
+                    self._done = True
+                    return scenes
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    try:
+                        scenes.append(json.loads(buffer[self._object_start:index + 1]))
+                    except json.JSONDecodeError as e:
+                        print(f"Skipping malformed streamed scene: {e}")
+                    self._object_start = None
+        self._position = len(buffer)
+        return scenes
\ No newline at end of file
@@ -0,0 +1,339 @@
+import bisect
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from . import file_utils
+
+class Span:
+    """One timed operation, with free-form attributes (bytes_in, bytes_out, tokens, retries, cache_hit, ...)."""
+
+    __slots__ = ("name", "category", "start", "end", "thread", "attrs")
+
+    def __init__(self, name: str, category: str, start: float, attrs: Dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.end = None
+        self.thread = threading.current_thread().name
+        self.attrs = attrs
+
+    def set(self, **attrs: Any) -> None:
+        """Set attributes on the span."""
+        self.attrs.update(attrs)
+
+    def add(self, key: str, amount: float = 1) -> None:
+        """Add to a numeric attribute (e.g. bytes_out or retries)."""
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+
+class _NullSpan:
+    """Stand-in returned while tracing is disabled."""
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def add(self, key: str, amount: float = 1) -> None:
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Tracer:
+    """
+    Collects spans from every thread of the process.
+
+    Spans opened with ``span`` nest per thread, so ``annotate`` and ``count`` attach
+    attributes to the innermost span of the calling thread. Work that is not timed on
+    the calling thread (e.g. a ComfyUI job, or a segment encoded in a worker process)
+    is added afterwards with ``record``. Timestamps are wall-clock seconds so spans
+    measured in other processes line up.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.spans = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[Span]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str, **attrs: Any) -> Iterator[Span]:
+        """
+        Time a block of code.
+
+        Args:
+            name (str): What is being done (e.g. "tts.generate_speech").
+            category (str): The stage or resource it belongs to (e.g. "tts", "encode", "stage").
+            **attrs: Initial attributes.
+
+        Returns:
+            Iterator[Span]: The open span, for adding attributes.
+        """
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+        span = Span(name, category, time.time(), attrs)
+        stack = self._stack()
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            span.end = time.time()
+            stack.pop()
+            with self._lock:
+                self.spans.append(span)
+
+    def current(self):
+        """Return the innermost open span of the calling thread."""
+        stack = self._stack() if self.enabled else []
+        return stack[-1] if stack else _NULL_SPAN
+
+    def record(self, name: str, category: str, start: float, end: float, thread: Optional[str] = None, **attrs: Any) -> None:
+        """
+        Add a span that was timed elsewhere.
+
+        Args:
+            name (str): The span name.
+            category (str): The span category.
+            start (float): Wall-clock start time in seconds.
+            end (float): Wall-clock end time in seconds.
+            thread (str, optional): Track to show the span on (e.g. a worker process or
+                a ComfyUI server); defaults to the calling thread.
+            **attrs: Span attributes.
+        """
+        if not self.enabled:
+            return
+        span = Span(name, category, start, attrs)
+        span.end = end
+        if thread is not None:
+            span.thread = thread
+        with self._lock:
+            self.spans.append(span)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans = []
+
+    def take(self) -> List[Span]:
+        """Remove and return the spans recorded so far."""
+        with self._lock:
+            spans, self.spans = self.spans, []
+        return spans
+
+    def to_events(self) -> List[Dict[str, Any]]:
+        """
+        Convert the spans to Chrome trace events.
+
+        Returns:
+            List[Dict[str, Any]]: Complete ("X") events with microsecond timestamps
+            relative to the first span, plus thread name metadata.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        if not spans:
+            return []
+        origin = spans[0].start
+        threads = {}
+        events = []
+        for span in spans:
+            tid = threads.setdefault(span.thread, len(threads) + 1)
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - origin) * 1e6),
+                "dur": round((span.end - span.start) * 1e6),
+                "pid": 1,
+                "tid": tid,
+                "args": span.attrs,
+            })
+        for thread, tid in threads.items():
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread}})
+        return events
+
+    def write_chrome_trace(self, path: str) -> str:
+        """
+        Write the spans as Chrome trace-event JSON (open in chrome://tracing or Perfetto).
+
+        Args:
+            path (str): The output file.
+
+        Returns:
+            str: The path written.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = file_utils.mkstemp(directory, prefix=".trace")
+        with os.fdopen(fd, 'w') as f:
+            json.dump({"traceEvents": self.to_events(), "displayTimeUnit": "ms"}, f, default=str)
+        os.replace(tmp_path, path)
+        return path
+
+_tracer = Tracer()
+
+def get_tracer() -> Tracer:
+    """Return the process-wide tracer."""
+    return _tracer
+
+def configure(config: Dict[str, Any]) -> Tracer:
+    """Enable or disable tracing from the ``tracing`` section of the config."""
+    _tracer.enabled = config.get('tracing', {}).get('enabled', True)
+    return _tracer
+
+def span(name: str, category: str, **attrs: Any):
+    """Time a block of code with the process-wide tracer (see ``Tracer.span``)."""
+    return _tracer.span(name, category, **attrs)
+
+def record(name: str, category: str, start: float, end: float, thread: Optional[str] = None, **attrs: Any) -> None:
+    """Add a span timed elsewhere to the process-wide tracer (see ``Tracer.record``)."""
+    _tracer.record(name, category, start, end, thread=thread, **attrs)
+
+def annotate(**attrs: Any) -> None:
+    """Set attributes on the calling thread's current span."""
+    _tracer.current().set(**attrs)
+
+def count(key: str, amount: float = 1) -> None:
+    """Add to a numeric attribute of the calling thread's current span."""
+    _tracer.current().add(key, amount)
+
+def traced(category: str, name: Optional[str] = None) -> Callable:
+    """
+    Decorator that records a span around every call of a function.
+
+    Args:
+        category (str): The span category.
+        name (str, optional): The span name; defaults to ``Class.method``.
+    """
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _tracer.span(span_name, category):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """
+    Read spans back from a Chrome trace file written by ``write_chrome_trace``.
+
+    Returns:
+        List[Dict[str, Any]]: Spans with name, cat, start and end (seconds), tid and args.
+    """
+    with open(path, 'r') as f:
+        events = json.load(f).get("traceEvents", [])
+    return [
+        {
+            "name": event["name"],
+            "cat": event.get("cat", ""),
+            "start": event["ts"] / 1e6,
+            "end": (event["ts"] + event.get("dur", 0)) / 1e6,
+            "tid": event.get("tid"),
+            "args": event.get("args", {}),
+        }
+        for event in events
+        if event.get("ph") == "X"
+    ]
+
+def summarize(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Aggregate spans per category and name.
+
+    Returns:
+        List[Dict[str, Any]]: One row per (category, name) with count, total, mean, p95
+        and max seconds, and summed bytes_in, bytes_out, tokens, retries and cache hits,
+        sorted by total time.
+    """
+    groups = {}
+    for item in spans:
+        groups.setdefault((item["cat"], item["name"]), []).append(item)
+    rows = []
+    for (category, name), items in groups.items():
+        durations = sorted(item["end"] - item["start"] for item in items)
+        row = {
+            "category": category,
+            "name": name,
+            "count": len(items),
+            "total": sum(durations),
+            "mean": sum(durations) / len(durations),
+            "p95": durations[min(len(durations) - 1, int(0.95 * len(durations)))],
+            "max": durations[-1],
+            "errors": sum(1 for item in items if item["args"].get("error")),
+            "cache_hits": sum(1 for item in items if item["args"].get("cache_hit")),
+        }
+        for key in ("bytes_in", "bytes_out", "tokens", "retries"):
+            row[key] = sum(item["args"].get(key, 0) or 0 for item in items)
+        rows.append(row)
+    return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+def format_summary(rows: List[Dict[str, Any]]) -> str:
+    """Render ``summarize`` rows as a plain-text table."""
+    header = f"{'category':<10} {'name':<40} {'count':>6} {'total s':>9} {'mean s':>8} {'p95 s':>8} {'max s':>8} {'MB in':>8} {'MB out':>8} {'tokens':>9} {'retries':>7} {'cached':>6} {'errors':>6}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['category']:<10} {row['name'][:40]:<40} {row['count']:>6} {row['total']:>9.2f} {row['mean']:>8.2f} {row['p95']:>8.2f} {row['max']:>8.2f} "
+            f"{row['bytes_in'] / 1e6:>8.2f} {row['bytes_out'] / 1e6:>8.2f} {int(row['tokens']):>9} {int(row['retries']):>7} {row['cache_hits']:>6} {row['errors']:>6}"
+        )
+    return "\n".join(lines)
+
+def critical_path(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Estimate the critical path of a run from its work spans.
+
+    Starting from the span that finished last, repeatedly step back to the span that
+    finished most recently before the current one started, i.e. the work it was most
+    likely waiting for. Stage spans (category "stage") only group work and are skipped.
+
+    Returns:
+        List[Dict[str, Any]]: The spans on the path, in time order.
+    """
+    work = sorted((item for item in spans if item["cat"] != "stage"), key=lambda item: item["end"])
+    if not work:
+        return []
+    ends = [item["end"] for item in work]
+    current = len(work) - 1
+    path = [work[current]]
+    while True:
+        # Only spans before the current one are searched, so zero-length spans cannot repeat
+        current = bisect.bisect_right(ends, work[current]["start"] + 1e-6, 0, current) - 1
+        if current < 0:
+            break
+        path.append(work[current])
+    return list(reversed(path))
+
+def format_critical_path(spans: List[Dict[str, Any]]) -> str:
+    """Render a critical-path report: time per category on the path and the bottleneck."""
+    if not spans:
+        return "No spans recorded."
+    path = critical_path(spans)
+    if not path:
+        return "No work spans recorded."
+    start = min(item["start"] for item in spans)
+    wall = max(item["end"] for item in spans) - start
+    per_category = {}
+    for item in path:
+        per_category[item["cat"]] = per_category.get(item["cat"], 0.0) + item["end"] - item["start"]
+    busy = sum(per_category.values())
+    per_category["(waiting)"] = max(0.0, wall - busy)
+
+    lines = [f"Wall time: {wall:.2f}s, critical path: {len(path)} span(s)", ""]
+    lines.append(f"{'category':<12} {'seconds':>9} {'share':>7}")
+    for category, seconds in sorted(per_category.items(), key=lambda item: item[1], reverse=True):
+        share = seconds / wall if wall else 0.0
+        lines.append(f"{category:<12} {seconds:>9.2f} {share:>6.0%}")
+    bottleneck = max((item for item in per_category.items() if item[0] != "(waiting)"), key=lambda item: item[1])
+    lines += ["", f"Bottleneck: {bottleneck[0]} ({bottleneck[1] / wall:.0%} of wall time)" if wall else f"Bottleneck: {bottleneck[0]}", ""]
+    lines.append("Path:")
+    for item in path:
+        lines.append(f"  {item['start'] - start:>8.2f}s  {item['end'] - item['start']:>7.2f}s  {item['cat']:<10} {item['name']}")
+    return "\n".join(lines)
@@ -1,8 +1,17 @@
-from moviepy.editor import ImageClip, AudioFileClip, concatenate_videoclips
-from typing import List
+from typing import List, Optional
+import hashlib
+import json
 import os
+import subprocess
+import sys
+import tempfile
+import wave
+from . import parallel_utils, trace_utils
 
-def compile_video(image_files: List[str], audio_files: List[str], output_filename: str, fps: int = 24) -> str:
+# Duration used for scenes without (usable) audio
+DEFAULT_SCENE_DURATION = 3
+
+def compile_video(image_files: List[str], audio_files: List[str], output_filename: str, fps: int = 24, backend: str = "moviepy", width: int = 1280, height: int = 720, segment_dir: Optional[str] = None, workers: Optional[int] = None, streaming: bool = False, durations: Optional[List[Optional[float]]] = None, normalized: bool = False) -> str:
     """
     Compile a video from a sequence of images and audio files.
     
@@ -11,10 +20,33 @@ def compile_video(image_files: List[str], audio_files: List[str], output_filenam
         audio_files (List[str]): List of paths to audio files (one per scene). Can be empty string for no audio.
         output_filename (str): The output video file path.
         fps (int): Frames per second for the video.
+        backend (str): "ffmpeg" to encode the stills directly with ffmpeg, or "moviepy".
+        width (int): Output width, used by the ffmpeg backend.
+        height (int): Output height, used by the ffmpeg backend.
+        segment_dir (str, optional): Where the ffmpeg backend keeps reusable per-scene segments.
+        workers (int, optional): Number of segments the ffmpeg backend renders in parallel.
+        streaming (bool): With the MoviePy backend, encode and release one scene at a
+            time so memory use does not grow with the number of scenes.
+        durations (List[Optional[float]], optional): Known scene durations, used by the
+            ffmpeg backend instead of reading them from the audio files.
+        normalized (bool): The images are already frames of the output size and pixel
+            format (see ``image_utils.normalize_images``), so no scaling, letterboxing
+            or compositing is needed.
         
     Returns:
         str: The path to the compiled video.
     """
+    if backend == "ffmpeg":
+        try:
+            return compile_video_ffmpeg(image_files, audio_files, output_filename, fps=fps, width=width, height=height, segment_dir=segment_dir, workers=workers, durations=durations, normalized=normalized)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"ffmpeg render failed ({e}), falling back to MoviePy")
+    
+    if streaming:
+        return compile_video_streaming(image_files, audio_files, output_filename, fps=fps, width=width, height=height, segment_dir=segment_dir, normalized=normalized)
+    
+    # MoviePy is slow to import, so it is only loaded when the MoviePy backend runs
+    from moviepy.editor import ImageClip, AudioFileClip, concatenate_videoclips
     clips = []
     for image_file, audio_file in zip(image_files, audio_files):
         # Create a clip for the image
@@ -35,7 +67,358 @@ def compile_video(image_files: List[str], audio_files: List[str], output_filenam
             
         clips.append(clip)
     
-    # Concatenate all clips
-    final_clip = concatenate_videoclips(clips, method="compose")
-    final_clip.write_videofile(output_filename, fps=fps)
-    return output_filename
\ No newline at end of file
+    # Frames of one size can simply be chained; otherwise every frame is composited onto a canvas
+    final_clip = concatenate_videoclips(clips, method="chain" if normalized else "compose")
+    with trace_utils.span("encode.moviepy", "encode", scenes=len(clips)):
+        final_clip.write_videofile(output_filename, fps=fps)
+    return output_filename
+
+def get_ffmpeg_binary() -> str:
+    """
+    Find the ffmpeg executable that MoviePy uses.
+    
+    Returns:
+        str: Path to the ffmpeg binary.
+    """
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except (ImportError, RuntimeError):
+        pass
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except Exception:
+        return "ffmpeg"
+
+def get_audio_duration(audio_file: str) -> Optional[float]:
+    """
+    Read the duration of a WAV file from its header.
+    
+    Args:
+        audio_file (str): Path to the WAV file.
+        
+    Returns:
+        Optional[float]: The duration in seconds, or None if the file is missing, empty or not a WAV.
+    """
+    if not audio_file or not os.path.exists(audio_file) or os.path.getsize(audio_file) == 0:
+        return None
+    try:
+        with wave.open(audio_file, 'rb') as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (wave.Error, EOFError):
+        return None
+
+def render_segment(image_file: str, audio_file: str, output_filename: str, duration: Optional[float] = None, fps: int = 24, width: int = 1280, height: int = 720, ffmpeg: Optional[str] = None, normalized: bool = False) -> str:
+    """
+    Encode a single still image over its audio with ffmpeg.
+    
+    The image is scaled and letterboxed to the output size, and encoded with
+    still-image settings, so no per-frame work happens in Python. All segments use
+    the same codec parameters so they can be joined without re-encoding.
+    
+    Args:
+        image_file (str): Path to the scene image. A black frame is used if it is missing.
+        audio_file (str): Path to the scene audio. Silence is used if it is missing.
+        output_filename (str): The output segment path (.mp4).
+        duration (float, optional): Segment length; defaults to the audio length.
+        fps (int): Frames per second.
+        width (int): Output width.
+        height (int): Output height.
+        ffmpeg (str, optional): The ffmpeg binary to use.
+        normalized (bool): The image is already a frame of the output size, so it is
+            only converted to yuv420p.
+        
+    Returns:
+        str: The path to the rendered segment.
+    """
+    ffmpeg = ffmpeg or get_ffmpeg_binary()
+    if duration is None:
+        duration = get_audio_duration(audio_file) or DEFAULT_SCENE_DURATION
+    
+    command = [ffmpeg, "-y", "-loglevel", "error"]
+    if image_file and os.path.exists(image_file) and os.path.getsize(image_file) > 0:
+        command += ["-loop", "1", "-framerate", str(fps), "-i", image_file]
+    else:
+        command += ["-f", "lavfi", "-i", f"color=c=black:s={width}x{height}:r={fps}"]
+    if audio_file and os.path.exists(audio_file) and os.path.getsize(audio_file) > 0:
+        command += ["-i", audio_file]
+    else:
+        command += ["-f", "lavfi", "-i", "anullsrc=r=44100:cl=stereo"]
+    video_filter = "setsar=1,format=yuv420p"
+    if not normalized:
+        video_filter = f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2," + video_filter
+    command += [
+        "-t", f"{duration:.3f}",
+        "-vf", video_filter,
+        "-r", str(fps),
+        "-c:v", "libx264", "-tune", "stillimage", "-preset", "veryfast",
+        "-c:a", "aac", "-b:a", "128k", "-ar", "44100", "-ac", "2",
+        "-movflags", "+faststart",
+        output_filename,
+    ]
+    subprocess.run(command, check=True)
+    return output_filename
+
+@trace_utils.traced("encode", "encode.concat")
+def concat_segments(segment_files: List[str], output_filename: str, ffmpeg: Optional[str] = None) -> str:
+    """
+    Join rendered segments into one video without re-encoding.
+    
+    Args:
+        segment_files (List[str]): Paths to segments rendered by ``render_segment``.
+        output_filename (str): The output video file path.
+        ffmpeg (str, optional): The ffmpeg binary to use.
+        
+    Returns:
+        str: The path to the joined video.
+    """
+    ffmpeg = ffmpeg or get_ffmpeg_binary()
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as list_file:
+        for segment_file in segment_files:
+            escaped = os.path.abspath(segment_file).replace("'", "'\\''")
+            list_file.write(f"file '{escaped}'\n")
+    try:
+        subprocess.run(
+            [ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_file.name, "-c", "copy", "-movflags", "+faststart", output_filename],
+            check=True,
+        )
+    finally:
+        os.remove(list_file.name)
+    return output_filename
+
+def segment_key(image_file: str, audio_file: str, duration: Optional[float] = None, **settings) -> str:
+    """
+    Hash the contents of a scene's image and audio together with the render settings.
+    
+    Args:
+        image_file (str): Path to the scene image.
+        audio_file (str): Path to the scene audio.
+        duration (float, optional): Explicit segment length, if any.
+        **settings: Render settings (fps, width, height, ...).
+        
+    Returns:
+        str: A hex digest identifying the rendered segment.
+    """
+    digest = hashlib.sha256()
+    for path in (image_file, audio_file):
+        if path and os.path.exists(path):
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        digest.update(b'\0')
+    digest.update(json.dumps({"duration": duration, "settings": settings}, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def _render_segment_atomic(args) -> str:
+    """Render a segment to a temporary name and move it into place once complete."""
+    image_file, audio_file, segment_file, duration, fps, width, height, ffmpeg, normalized = args
+    tmp_file = segment_file + ".tmp.mp4"
+    try:
+        render_segment(image_file, audio_file, tmp_file, duration=duration, fps=fps, width=width, height=height, ffmpeg=ffmpeg, normalized=normalized)
+        os.replace(tmp_file, segment_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return segment_file
+
+def compile_video_ffmpeg(image_files: List[str], audio_files: List[str], output_filename: str, fps: int = 24, width: int = 1280, height: int = 720, segment_dir: Optional[str] = None, workers: Optional[int] = None, durations: Optional[List[Optional[float]]] = None, normalized: bool = False) -> str:
+    """
+    Compile a video by encoding each still scene with ffmpeg and joining the segments.
+    
+    Segments are rendered in parallel in a process pool and joined with a
+    stream-copy concat. When ``segment_dir`` is given, segments are kept there under a
+    hash of their image, audio and render settings, so re-compiling only re-encodes the
+    scenes that changed.
+    
+    Args:
+        image_files (List[str]): List of paths to image files (one per scene).
+        audio_files (List[str]): List of paths to audio files (one per scene).
+        output_filename (str): The output video file path.
+        fps (int): Frames per second for the video.
+        width (int): Output width.
+        height (int): Output height.
+        segment_dir (str, optional): Directory for reusable segments. A temporary
+            directory is used if None.
+        workers (int, optional): Number of segments rendered at once; defaults to the CPU count.
+        durations (List[Optional[float]], optional): Known scene durations; missing ones
+            are read from the audio files.
+        normalized (bool): The images are already frames of the output size.
+        
+    Returns:
+        str: The path to the compiled video.
+    """
+    ffmpeg = get_ffmpeg_binary()
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_filename))) as tmp_dir:
+        cache_segments = segment_dir is not None
+        segment_dir = segment_dir if cache_segments else tmp_dir
+        os.makedirs(segment_dir, exist_ok=True)
+        
+        segments = []
+        jobs = []
+        durations = durations or [None] * len(image_files)
+        for image_file, audio_file, duration in zip(image_files, audio_files, durations):
+            key = segment_key(image_file, audio_file, duration, fps=fps, width=width, height=height, normalized=normalized)
+            segment_file = os.path.join(segment_dir, f"{key}.mp4")
+            if segment_file not in segments and not (os.path.exists(segment_file) and os.path.getsize(segment_file) > 0):
+                jobs.append((image_file, audio_file, segment_file, duration, fps, width, height, ffmpeg, normalized))
+            segments.append(segment_file)
+        
+        if jobs:
+            print(f"Rendering {len(jobs)} of {len(segments)} segment(s)")
+            parallel_utils.run_processes(_render_segment_atomic, [(job,) for job in jobs], "encode.segment", "encode", "encode worker", workers=workers)
+        
+        concat_segments(segments, output_filename, ffmpeg=ffmpeg)
+        
+        # Drop segments of scenes that no longer exist so the directory does not grow forever
+        if cache_segments:
+            prune_segments(segment_dir, segments)
+        return output_filename
+
+def prune_segments(segment_dir: str, keep: List[str]) -> None:
+    """
+    Remove the segments in a directory that are not part of the current video.
+    
+    Args:
+        segment_dir (str): The segment directory.
+        keep (List[str]): Paths of the segments still in use.
+    """
+    for name in os.listdir(segment_dir):
+        path = os.path.join(segment_dir, name)
+        if path not in keep and name.endswith(".mp4"):
+            os.remove(path)
+
+@trace_utils.traced("encode", "encode.segment")
+def render_scene_segment(image_file: str, audio_file: str, segment_dir: str, duration: Optional[float] = None, fps: int = 24, width: int = 1280, height: int = 720, backend: str = "ffmpeg", normalized: bool = False) -> str:
+    """
+    Render the segment of a single scene, reusing it if it was rendered before.
+    
+    Segments are named exactly as ``compile_video_ffmpeg`` and ``compile_video_streaming``
+    name them, so scenes rendered one at a time (e.g. by the DAG scheduler) and whole
+    compiles share the same segment directory.
+    
+    Args:
+        image_file (str): Path to the scene image.
+        audio_file (str): Path to the scene audio.
+        segment_dir (str): Directory for reusable segments.
+        duration (float, optional): Known scene duration, used by the ffmpeg backend.
+        fps (int): Frames per second.
+        width (int): Output width.
+        height (int): Output height.
+        backend (str): "ffmpeg" or "moviepy".
+        normalized (bool): The image is already a frame of the output size.
+        
+    Returns:
+        str: The path to the segment.
+    """
+    os.makedirs(segment_dir, exist_ok=True)
+    if backend == "ffmpeg":
+        key = segment_key(image_file, audio_file, duration, fps=fps, width=width, height=height, normalized=normalized)
+        segment_file = os.path.join(segment_dir, f"{key}.mp4")
+        if os.path.exists(segment_file) and os.path.getsize(segment_file) > 0:
+            trace_utils.annotate(cache_hit=True)
+            return segment_file
+        try:
+            return _render_segment_atomic((image_file, audio_file, segment_file, duration, fps, width, height, get_ffmpeg_binary(), normalized))
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"ffmpeg render failed ({e}), falling back to MoviePy")
+    
+    key = segment_key(image_file, audio_file, backend="moviepy", fps=fps, width=width, height=height, normalized=normalized)
+    segment_file = os.path.join(segment_dir, f"{key}.mp4")
+    if not (os.path.exists(segment_file) and os.path.getsize(segment_file) > 0):
+        _write_scene_segment(image_file, audio_file, segment_file, fps, width, height, normalized)
+    return segment_file
+
+def compile_video_streaming(image_files: List[str], audio_files: List[str], output_filename: str, fps: int = 24, width: int = 1280, height: int = 720, segment_dir: Optional[str] = None, normalized: bool = False) -> str:
+    """
+    Compile a video with MoviePy while holding only one scene in memory at a time.
+    
+    Each scene is opened, encoded to its own segment and closed before the next one
+    starts, and the segments are joined with a stream-copy concat. Peak memory and open
+    file handles therefore stay bounded regardless of the number of scenes.
+    
+    Args:
+        image_files (List[str]): List of paths to image files (one per scene).
+        audio_files (List[str]): List of paths to audio files (one per scene).
+        output_filename (str): The output video file path.
+        fps (int): Frames per second for the video.
+        width (int): Output width.
+        height (int): Output height.
+        segment_dir (str, optional): Directory for reusable segments. A temporary
+            directory is used if None.
+        normalized (bool): The images are already frames of the output size.
+        
+    Returns:
+        str: The path to the compiled video.
+    """
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_filename))) as tmp_dir:
+        segment_dir = segment_dir or tmp_dir
+        os.makedirs(segment_dir, exist_ok=True)
+        
+        segments = []
+        for image_file, audio_file in zip(image_files, audio_files):
+            key = segment_key(image_file, audio_file, backend="moviepy", fps=fps, width=width, height=height, normalized=normalized)
+            segment_file = os.path.join(segment_dir, f"{key}.mp4")
+            if not (os.path.exists(segment_file) and os.path.getsize(segment_file) > 0):
+                _write_scene_segment(image_file, audio_file, segment_file, fps, width, height, normalized)
+            segments.append(segment_file)
+        
+        concat_segments(segments, output_filename)
+    return output_filename
+
+@trace_utils.traced("encode", "encode.moviepy_segment")
+def _write_scene_segment(image_file: str, audio_file: str, segment_file: str, fps: int, width: int, height: int, normalized: bool = False) -> None:
+    """Encode one scene with MoviePy and release its clips straight away."""
+    import numpy as np
+    from moviepy.editor import ImageClip, AudioClip, AudioFileClip
+    clip = ImageClip(image_file)
+    audio_clip = None
+    tmp_file = segment_file + ".tmp.mp4"
+    try:
+        # Letterbox to the output size so every segment can be joined without re-encoding
+        if not normalized:
+            clip = clip.resize(min(width / clip.w, height / clip.h)).on_color(size=(width, height), color=(0, 0, 0), pos="center")
+        if audio_file and os.path.exists(audio_file) and os.path.getsize(audio_file) > 0:
+            try:
+                audio_clip = AudioFileClip(audio_file)
+            except Exception as e:
+                print(f"Error processing audio {audio_file}: {e}")
+        if audio_clip is None:
+            # Every segment needs the same stereo 44.1 kHz audio stream, like anullsrc in render_segment,
+            # or the stream-copy concat drops or desyncs the audio of the whole video
+            audio_clip = AudioClip(lambda t: np.zeros((2,) if np.isscalar(t) else (len(t), 2)), duration=DEFAULT_SCENE_DURATION, fps=44100)
+        clip = clip.set_duration(audio_clip.duration).set_audio(audio_clip)
+        
+        clip.write_videofile(
+            tmp_file,
+            fps=fps,
+            codec="libx264",
+            audio_codec="aac",
+            audio_fps=44100,
+            ffmpeg_params=["-ac", "2", "-pix_fmt", "yuv420p"],
+            logger=None,
+        )
+        os.replace(tmp_file, segment_file)
+    finally:
+        clip.close()
+        if audio_clip is not None:
+            audio_clip.close()
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def peak_rss_mb() -> float:
+    """
+    Report the peak resident memory of this process and its finished child processes.
+    
+    Returns:
+        float: Peak RSS in megabytes, or 0.0 where the ``resource`` module is unavailable.
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return max(self_rss, children_rss) / scale
\ No newline at end of file
@@ -0,0 +1,217 @@
+import copy
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+from .utils import queue_utils, trace_utils
+
+def submit_project(project, prompt: str, queue: "queue_utils.WorkQueue", output_filename: str = "final_video.mp4", max_attempts: int = 3) -> int:
+    """
+    Write a project's story and queue its scene work for ``auteur worker`` processes.
+
+    The story is generated here; every scene then gets a "tts" task, an "image" (or
+    "comfyui") task and a "render" task that waits for both, and a final "concat" render
+    task waits for every scene. Tasks already queued for the project are replaced.
+
+    Args:
+        project (Project): The project, whose directory must be reachable by the workers.
+        prompt (str): The story prompt.
+        queue (WorkQueue): The queue to submit to.
+        output_filename (str): The video file name inside the project directory.
+        max_attempts (int): Times a task is tried before it is marked failed.
+
+    Returns:
+        int: The number of tasks queued.
+    """
+    if project.config.get('story', {}).get('streaming', False):
+        project.generate_story_streaming(prompt)
+    else:
+        project.generate_story(prompt)
+    image_kind = 'comfyui' if project.config['comfyui'].get('enabled', False) else 'image'
+    tasks = []
+    for n in range(len(project.story['scenes'])):
+        tasks.append({'name': f"tts:{n}", 'kind': 'tts', 'payload': {'scene': n}})
+        tasks.append({'name': f"image:{n}", 'kind': image_kind, 'payload': {'scene': n}})
+        tasks.append({'name': f"render:{n}", 'kind': 'render', 'payload': {'scene': n}, 'deps': [f"tts:{n}", f"image:{n}"]})
+    renders = [task['name'] for task in tasks if task['kind'] == 'render']
+    tasks.append({'name': "concat", 'kind': 'render', 'payload': {'output': output_filename}, 'deps': renders})
+    # Workers use their own API key, so it is not written to the shared queue
+    config = copy.deepcopy(project.config)
+    config.get('gemini', {}).pop('api_key', None)
+    queue.submit(project.name, config, tasks, max_attempts=max_attempts)
+    return len(tasks)
+
+class Worker:
+    """
+    Claims tasks from the work queue and runs them with the project's own scene steps.
+
+    While a task runs, a background thread renews its lease every third of the lease
+    length. If the lease is lost anyway (e.g. the worker was suspended for too long and
+    another worker took the task over), the result is dropped. A task with a failed item
+    (e.g. a dialogue line without audio) fails as a whole, so it is retried like a crash.
+
+    The spans of every task are added to this worker's trace of the project, written to
+    ``<project>/traces/<host>-<pid>.json`` after each task.
+
+    Args:
+        queue (WorkQueue): The queue to take tasks from.
+        config (Dict[str, Any]): This worker's configuration; its Gemini API key is used
+            for every project.
+        kinds (Iterable[str], optional): Only run tasks of these kinds (e.g. only "render"
+            on a machine without API access, or only "comfyui" next to a GPU).
+        lease_seconds (float): Lease length; a dead worker's task is retried after this.
+        poll_interval (float): Seconds to wait when no task is ready.
+    """
+
+    def __init__(self, queue: "queue_utils.WorkQueue", config: Dict[str, Any], kinds: Optional[Iterable[str]] = None, lease_seconds: float = 60.0, poll_interval: float = 1.0):
+        self.queue = queue
+        self.config = config
+        self.kinds = list(kinds or [])
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.projects = {}
+        self.animators = {}
+        self.traces = {}
+
+    def run(self, exit_when_idle: bool = False, max_tasks: Optional[int] = None) -> int:
+        """
+        Run tasks until stopped.
+
+        Args:
+            exit_when_idle (bool): Return once the queue has no pending or leased tasks.
+            max_tasks (int, optional): Return after this many tasks.
+
+        Returns:
+            int: The number of tasks run.
+        """
+        done = 0
+        while max_tasks is None or done < max_tasks:
+            task = self.queue.claim(self.worker_id, self.kinds, self.lease_seconds)
+            if task is None:
+                if exit_when_idle and self.queue.is_idle():
+                    break
+                time.sleep(self.poll_interval)
+                continue
+            self.run_task(task)
+            done += 1
+        return done
+
+    def run_task(self, task: Dict[str, Any]) -> None:
+        """Run one claimed task, keeping its lease alive, and report the outcome."""
+        label = f"{task['project']}/{task['name']}"
+        print(f"[{self.worker_id}] {label} (attempt {task['attempts']})")
+        finished = threading.Event()
+        lost = threading.Event()
+
+        def _heartbeat():
+            while not finished.wait(self.lease_seconds / 3):
+                if not self.queue.heartbeat(task['id'], self.worker_id, self.lease_seconds):
+                    print(f"[{self.worker_id}] lost the lease on {label}")
+                    lost.set()
+                    return
+
+        heartbeat = threading.Thread(target=_heartbeat, name="heartbeat", daemon=True)
+        heartbeat.start()
+        try:
+            result = self._execute(task)
+        except Exception as e:
+            if not lost.is_set():
+                self.queue.fail(task['id'], self.worker_id, f"{type(e).__name__}: {e}")
+            print(f"[{self.worker_id}] {label} failed: {e}")
+            return
+        finally:
+            finished.set()
+            heartbeat.join()
+            self._write_trace(task['project'])
+        if lost.is_set() or not self.queue.complete(task['id'], self.worker_id, result):
+            print(f"[{self.worker_id}] dropped the result of {label}, another worker took it over")
+
+    def _write_trace(self, name: str) -> None:
+        """Move the spans of the last task into this worker's trace of the project and write it out."""
+        spans = trace_utils.get_tracer().take()
+        project = self.projects.get(name)
+        if project is None or not spans:
+            return
+        trace = self.traces.setdefault(name, trace_utils.Tracer())
+        trace.spans.extend(spans)
+        trace_dir = os.path.join(project.project_root, 'traces')
+        os.makedirs(trace_dir, exist_ok=True)
+        trace.write_chrome_trace(os.path.join(trace_dir, f"{self.worker_id.replace(':', '-')}.json"))
+
+    def _project(self, name: str):
+        """Open a project with the configuration it was submitted with and this worker's API key."""
+        if name not in self.projects:
+            from .project import Project
+            config = self.queue.project_config(name)
+            if config is None:
+                raise RuntimeError(f"Project {name} is not in the queue")
+            config.setdefault('gemini', {})['api_key'] = self.config['gemini']['api_key']
+            self.projects[name] = Project(name, config)
+        project = self.projects[name]
+        # The story may have been regenerated, or its scenes updated by other workers, so it is always reread
+        project.story = None
+        project._load_story()
+        return project
+
+    def _execute(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        project = self._project(task['project'])
+        failures = []
+        kind = task['kind']
+        if task['name'] == "concat":
+            return self._concat(project, task)
+        n = task['payload']['scene']
+        scene = project.story['scenes'][n]
+        if kind == 'tts':
+            project._scene_audio(scene, failures)
+            result = {'audio_files': scene['audio_files']}
+        elif kind in ('image', 'comfyui'):
+            if kind == 'comfyui' and task['project'] not in self.animators:
+                self.animators[task['project']] = project._animator()
+            project._scene_image(scene, self.animators.get(task['project']) if kind == 'comfyui' else None, failures)
+            result = {'image_file': scene['image_file']}
+        elif kind == 'render':
+            # Inputs of failed dependencies are simply missing, like in the dag scheduler
+            for dep in (f"tts:{n}", f"image:{n}"):
+                scene.update(task['results'].get(dep) or {})
+            segment = project._scene_segment(scene, failures)
+            result = {
+                'segment': segment,
+                'scene': {key: scene.get(key) for key in ('audio_files', 'image_file', 'audio_track', 'duration')},
+            }
+        else:
+            raise ValueError(f"Unknown task kind {kind}")
+        if failures:
+            # Failing the task retries it up to max_attempts, and then fails the project's run
+            raise RuntimeError("; ".join(f"{label}: {error}" for label, error in failures))
+        return result
+
+    def _concat(self, project, task: Dict[str, Any]) -> Dict[str, Any]:
+        scenes = project.story['scenes']
+        renders = [task['results'].get(f"render:{n}") for n in range(len(scenes))]
+        missing = [scenes[n]['id'] for n, render in enumerate(renders) if not render]
+        if missing:
+            raise RuntimeError(f"no segment for scene(s) {', '.join(str(scene_id) for scene_id in missing)}")
+        for scene, render in zip(scenes, renders):
+            scene.update(render['scene'])
+        output_path = project._concat_scenes([render['segment'] for render in renders], task['payload']['output'])
+        project._export_script()
+        return {'video': output_path}
+
+def _worker_process(worker_class: type, queue_path: str, journal_mode: str, config: Dict[str, Any], kinds: List[str], lease_seconds: float, poll_interval: float, exit_when_idle: bool) -> None:
+    queue = queue_utils.WorkQueue(queue_path, journal_mode=journal_mode)
+    worker_class(queue, config, kinds, lease_seconds, poll_interval).run(exit_when_idle=exit_when_idle)
+
+def run_workers(processes: int, queue: "queue_utils.WorkQueue", config: Dict[str, Any], kinds: Optional[Iterable[str]] = None, lease_seconds: float = 60.0, poll_interval: float = 1.0, exit_when_idle: bool = False, worker_class: type = Worker) -> None:
+    """Run several workers as local processes and wait for them to exit; ``worker_class`` may be a subclass of ``Worker``."""
+    if processes <= 1:
+        worker_class(queue, config, kinds, lease_seconds, poll_interval).run(exit_when_idle=exit_when_idle)
+        return
+    args = (worker_class, queue.path, queue.journal_mode, config, list(kinds or []), lease_seconds, poll_interval, exit_when_idle)
+    workers = [multiprocessing.Process(target=_worker_process, args=args, name=f"auteur-worker-{i}") for i in range(processes)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
@@ -0,0 +1,94 @@
+import struct
+import wave
+
+import numpy as np
+import pytest
+
+from auteur_studio.utils import audio_utils
+
+def _write_wav(path, samples, sample_rate=24000, bits_per_sample=16, extra_chunk=False):
+    data = np.asarray(samples, dtype=audio_utils.PCM_DTYPES[bits_per_sample]).tobytes()
+    header = audio_utils.wav_header(len(data), sample_rate, bits_per_sample)
+    if extra_chunk:
+        # A LIST chunk with an odd size (and its pad byte) between "fmt " and "data"
+        header = header[:36] + b"LIST" + struct.pack("<I", 3) + b"abc\0" + header[36:]
+        header = header[:4] + struct.pack("<I", len(header) - 8 + len(data)) + header[8:]
+    with open(path, "wb") as f:
+        f.write(header + data)
+    return str(path)
+
+def _samples(path, dtype=np.int16):
+    with wave.open(str(path), "rb") as wav:
+        return wav.getframerate(), np.frombuffer(wav.readframes(wav.getnframes()), dtype=dtype)
+
+def test_read_wav_info_finds_the_data_after_other_chunks(tmp_path):
+    path = _write_wav(tmp_path / "line.wav", range(10), sample_rate=8000, extra_chunk=True)
+    info = audio_utils.read_wav_info(path)
+
+    assert info["data_offset"] == 44 + 12
+    assert (info["sample_rate"], info["channels"], info["bits_per_sample"]) == (8000, 1, 16)
+    assert (info["data_size"], info["frames"]) == (20, 10)
+    assert info["duration"] == pytest.approx(10 / 8000)
+
+def test_read_wav_info_clamps_a_cut_off_stream(tmp_path):
+    path = tmp_path / "line.wav"
+    # Header claims 100 bytes but only 7 arrived; the odd byte is not a whole frame
+    path.write_bytes(audio_utils.wav_header(100, 24000) + b"\1" * 7)
+    info = audio_utils.read_wav_info(str(path))
+
+    assert (info["data_size"], info["frames"]) == (6, 3)
+
+@pytest.mark.parametrize("contents", [b"", b"not a wav file at all", b"RIFF\0\0\0\0WAVE"], ids=["empty", "garbage", "no-chunks"])
+def test_read_wav_info_rejects_unusable_files(tmp_path, contents):
+    path = tmp_path / "line.wav"
+    path.write_bytes(contents)
+    assert audio_utils.read_wav_info(str(path)) is None
+    assert audio_utils.read_wav_info(str(tmp_path / "missing.wav")) is None
+
+def test_scene_track_places_every_line_and_gap(tmp_path):
+    first = _write_wav(tmp_path / "0.wav", np.arange(1, 301), sample_rate=1000)
+    second = _write_wav(tmp_path / "1.wav", np.arange(-1, -151, -1), sample_rate=1000)
+    third = _write_wav(tmp_path / "2.wav", [7] * 50, sample_rate=1000)
+    output = tmp_path / "scene.wav"
+
+    duration = audio_utils.assemble_scene_track([first, second, third], str(output), gap_seconds=0.1)
+
+    # 300 + 150 + 50 line frames and two 100-frame gaps
+    assert duration == pytest.approx(0.7)
+    rate, samples = _samples(output)
+    assert rate == 1000
+    assert len(samples) == 700
+    assert output.stat().st_size == 44 + 700 * 2
+    assert audio_utils.read_wav_info(str(output))["data_offset"] == 44
+    np.testing.assert_array_equal(samples[:300], np.arange(1, 301))
+    assert not samples[300:400].any()
+    np.testing.assert_array_equal(samples[400:550], np.arange(-1, -151, -1))
+    assert not samples[550:650].any()
+    np.testing.assert_array_equal(samples[650:], [7] * 50)
+
+def test_scene_track_fills_8_bit_gaps_with_unsigned_silence(tmp_path):
+    first = _write_wav(tmp_path / "0.wav", [200] * 10, sample_rate=100, bits_per_sample=8)
+    second = _write_wav(tmp_path / "1.wav", [50] * 10, sample_rate=100, bits_per_sample=8)
+    output = tmp_path / "scene.wav"
+
+    assert audio_utils.assemble_scene_track([first, second], str(output), gap_seconds=0.05) == pytest.approx(0.25)
+    _, samples = _samples(output, dtype=np.uint8)
+    np.testing.assert_array_equal(samples, [200] * 10 + [128] * 5 + [50] * 10)
+
+def test_scene_track_skips_missing_and_mismatched_lines(tmp_path):
+    first = _write_wav(tmp_path / "0.wav", [1] * 20, sample_rate=1000)
+    other_rate = _write_wav(tmp_path / "1.wav", [2] * 20, sample_rate=2000)
+    empty = _write_wav(tmp_path / "2.wav", [], sample_rate=1000)
+    last = _write_wav(tmp_path / "3.wav", [3] * 20, sample_rate=1000)
+    output = tmp_path / "scene.wav"
+
+    duration = audio_utils.assemble_scene_track([first, str(tmp_path / "missing.wav"), other_rate, empty, last], str(output), gap_seconds=0.01)
+
+    assert duration == pytest.approx(0.05)
+    _, samples = _samples(output)
+    np.testing.assert_array_equal(samples, [1] * 20 + [0] * 10 + [3] * 20)
+
+def test_scene_track_without_audio_writes_nothing(tmp_path):
+    output = tmp_path / "scene.wav"
+    assert audio_utils.assemble_scene_track([str(tmp_path / "missing.wav")], str(output)) is None
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,26 @@
+import os
+import stat
+
+from auteur_studio.utils.cache_utils import AssetCache
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+def _expected_mode():
+    mask = os.umask(0)
+    os.umask(mask)
+    return 0o666 & ~mask
+
+def test_cached_files_get_the_default_mode(tmp_path):
+    cache = AssetCache(str(tmp_path / "cache"))
+    source = tmp_path / "line.wav"
+    source.write_bytes(b"RIFF")
+    key = cache.make_key(text="hello")
+
+    entry = cache.put(key, str(source))
+    output = cache.get(key, str(tmp_path / "copy.wav"))
+    json_entry = cache.put_json(cache.make_key(story="a robot"), {"title": "A robot"})
+
+    assert _mode(entry) == _mode(output) == _mode(json_entry) == _expected_mode()
+    assert cache.get_json(cache.make_key(story="a robot")) == {"title": "A robot"}
+    assert sorted(name for name in os.listdir(tmp_path / "cache") if name.startswith(".tmp")) == []
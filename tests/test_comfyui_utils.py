@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from auteur_studio.utils.comfyui_utils import ComfyUIClient, ComfyUIDispatcher, output_images
+from fakes import StubComfyUIServer
+
+WORKFLOW = {
+    "3": {"class_type": "KSampler", "inputs": {"seed": 1}},
+    "9": {"class_type": "SaveImage", "inputs": {}},
+}
+
+def _dispatcher(servers, **kwargs):
+    clients = [ComfyUIClient(server.url, timeout=5, poll_interval=0.02, use_websocket=False) for server in servers]
+    kwargs.setdefault("max_outstanding", 2 if len(clients) > 1 else None)
+    return ComfyUIDispatcher(clients, poll_interval=0.02, health_interval=0.2, **kwargs)
+
+@pytest.fixture
+def servers():
+    started = [StubComfyUIServer(latency=0.1).start() for _ in range(2)]
+    yield started
+    for server in started:
+        try:
+            server.stop()
+        except OSError:
+            pass
+
+def test_jobs_are_balanced_across_backends(servers, tmp_path):
+    dispatcher = _dispatcher(servers)
+    results = dispatcher.run({f"scene_{n}": WORKFLOW for n in range(6)}, str(tmp_path))
+
+    assert all(error is None for _, error in results.values())
+    assert sorted(results) == [f"scene_{n}" for n in range(6)]
+    assert [len(server.jobs) for server in servers] == [3, 3]
+
+def test_jobs_fail_over_when_a_backend_goes_down(servers, tmp_path):
+    down, up = servers
+    down.latency = 5.0
+    dispatcher = _dispatcher(servers, max_errors=2)
+    futures = [dispatcher.submit(f"scene_{n}", WORKFLOW, str(tmp_path)) for n in range(4)]
+    while not down.jobs:
+        time.sleep(0.01)
+    down.stop()
+
+    results = {name: result for future in futures for name, result in future.result(timeout=30).items()}
+    assert all(error is None for _, error in results.values()), results
+    assert len(up.jobs) == 4
+    assert dispatcher.healthy == [False, True]
+
+def test_transient_errors_do_not_fail_jobs(tmp_path):
+    with StubComfyUIServer(latency=0.05) as server:
+        dispatcher = _dispatcher([server])
+        server.fail_requests(2)
+        results = dispatcher.run({f"scene_{n}": WORKFLOW for n in range(3)}, str(tmp_path))
+        assert all(error is None for _, error in results.values()), results
+        assert dispatcher.healthy == [True]
+
+def test_jobs_wait_for_a_backend_to_recover(tmp_path):
+    with StubComfyUIServer(latency=0.05) as server:
+        dispatcher = _dispatcher([server], max_errors=1, recovery_timeout=30)
+        server.fail_requests(1)
+        future = dispatcher.submit("scene_1", WORKFLOW, str(tmp_path))
+        paths, error = future.result(timeout=30)["scene_1"]
+        assert error is None and len(paths) == 1
+
+def test_expired_deadline_fails_and_cancels_the_job(tmp_path):
+    with StubComfyUIServer(latency=5.0) as server:
+        dispatcher = _dispatcher([server])
+        future = dispatcher.submit("scene_1", WORKFLOW, str(tmp_path), timeout=0.3)
+        paths, error = future.result(timeout=10)["scene_1"]
+        assert paths == []
+        assert isinstance(error, TimeoutError)
+        assert server.jobs == {}
+
+def test_outputs_are_listed_in_numeric_node_order(tmp_path):
+    workflow = {node_id: {"class_type": "SaveImage", "inputs": {}} for node_id in ("10", "9", "100")}
+    with StubComfyUIServer(latency=0.01) as server:
+        prompt_id = server.submit(workflow)
+        time.sleep(0.05)
+        entry = server.history(prompt_id)[prompt_id]
+        assert [image["filename"].split("_")[1] for image in output_images(entry)] == ["9", "10", "100"]
+
+        results = _dispatcher([server]).run({"scene_1": workflow}, str(tmp_path))
+        paths, error = results["scene_1"]
+        assert error is None
+        assert [path.rsplit("/", 1)[1] for path in paths] == ["scene_1.png", "scene_1_1.png", "scene_1_2.png"]
+
+def test_submit_is_thread_safe(servers, tmp_path):
+    dispatcher = _dispatcher(servers)
+    futures = []
+    lock = threading.Lock()
+
+    def _submit(n):
+        future = dispatcher.submit(f"scene_{n}", WORKFLOW, str(tmp_path))
+        with lock:
+            futures.append(future)
+
+    threads = [threading.Thread(target=_submit, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(error is None for future in futures for _, error in future.result(timeout=30).values())
+    assert sum(len(server.jobs) for server in servers) == 8
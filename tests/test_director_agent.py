@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from auteur_studio.agents.director_agent import DirectorAgent
+from auteur_studio.utils.rate_limit_utils import RateLimiter
+from auteur_studio.utils.story_utils import StoryValidationError
+from fakes import FakeGenaiClient
+
+def _client(story_texts):
+    return FakeGenaiClient(scenes=2, latency={"story": 0.0}, jitter=0, stream_chunks=3, story_texts=story_texts)
+
+def _agent(client):
+    return DirectorAgent(api_key="unused", client=client, rate_limiter=RateLimiter())
+
+def _broken_story():
+    story = FakeGenaiClient(scenes=2).story()
+    story["scenes"][1]["dialogue"] = ["no speaker here"]
+    del story["scenes"][0]["image_prompt"]
+    return json.dumps(story)
+
+def test_valid_story_needs_no_repair():
+    client = _client([])
+    story = _agent(client).generate_story("a robot")
+    assert len(story["scenes"]) == 2
+    assert client.calls["story"] == 1
+
+@pytest.mark.parametrize("invalid", ['{"title": "Cut off", "scenes": [', _broken_story()], ids=["invalid-json", "schema"])
+def test_invalid_story_is_repaired_with_one_call(invalid):
+    client = _client([invalid])
+    story = _agent(client).generate_story("a robot")
+    assert story["title"] == "Benchmark Story"
+    assert client.calls["story"] == 2
+
+def test_streamed_story_is_repaired_with_one_call():
+    client = _client([_broken_story()])
+    scenes = []
+    story = _agent(client).generate_story_stream("a robot", on_scene=scenes.append)
+    assert len(story["scenes"]) == 2
+    assert client.calls["story"] == 2
+
+def test_story_still_invalid_after_the_repair_raises():
+    client = _client(["not json", _broken_story()])
+    with pytest.raises(StoryValidationError):
+        _agent(client).generate_story("a robot")
+    assert client.calls["story"] == 2
@@ -0,0 +1,22 @@
+import os
+import stat
+
+from PIL import Image
+
+from auteur_studio.utils import image_utils
+
+def test_normalized_frame_is_letterboxed_and_readable(tmp_path):
+    source = tmp_path / "scene.png"
+    Image.new("RGBA", (200, 100), (255, 0, 0, 255)).save(source)
+    output = tmp_path / "frame.png"
+
+    image_utils.normalize_image(str(source), str(output), width=160, height=120)
+
+    mask = os.umask(0)
+    os.umask(mask)
+    assert stat.S_IMODE(os.stat(output).st_mode) == 0o666 & ~mask
+    with Image.open(output) as frame:
+        assert (frame.mode, frame.size) == (image_utils.FRAME_MODE, (160, 120))
+        assert frame.getpixel((80, 60)) == (255, 0, 0)
+        assert frame.getpixel((80, 5)) == (0, 0, 0)
+    assert sorted(os.listdir(tmp_path)) == ["frame.png", "scene.png"]
@@ -0,0 +1,47 @@
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _load_benchmark():
+    spec = importlib.util.spec_from_file_location("import_time", os.path.join(REPO_ROOT, "benchmarks", "import_time.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+import_time = _load_benchmark()
+
+# Records every attempt to import a heavy module, so a guarded ``try: import numpy``
+# is caught even where the module is not installed
+WATCH = """
+import sys
+attempted = []
+class _Watch:
+    def find_spec(self, name, path=None, target=None):
+        if name in {heavy!r}:
+            attempted.append(name)
+        return None
+sys.meta_path.insert(0, _Watch())
+"""
+
+@pytest.mark.parametrize("label", sorted(import_time.CHECKS))
+def test_startup_does_not_import_heavy_modules(label):
+    if label == "cli":
+        pytest.importorskip("click")
+    statement = import_time.CHECKS[label]
+    code = f"{WATCH.format(heavy=import_time.HEAVY_MODULES)}\n{statement}\nimport json\nprint(json.dumps(sorted(set(attempted + [m for m in {import_time.HEAVY_MODULES!r} if m in sys.modules]))))"
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [import_time.SRC_DIR, os.environ.get("PYTHONPATH")])))
+    completed = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    assert json.loads(completed.stdout.strip().splitlines()[-1]) == []
+
+def test_watch_catches_a_guarded_import_of_a_missing_module():
+    heavy = ["auteur_studio_missing_heavy_module"]
+    code = f"{WATCH.format(heavy=heavy)}\ntry:\n    import auteur_studio_missing_heavy_module\nexcept ImportError:\n    pass\nprint(attempted)"
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert completed.stdout.strip() == repr(heavy)
@@ -0,0 +1,39 @@
+import json
+import multiprocessing
+
+from auteur_studio.utils.manifest_utils import Manifest
+
+def _record_items(path, worker, count):
+    manifest = Manifest(path)
+    for i in range(count):
+        manifest.record('audio', f"{worker}:{i}", f"hash-{worker}-{i}", [f"/tmp/{worker}-{i}.wav"])
+
+def test_workers_do_not_overwrite_each_others_entries(tmp_path):
+    path = str(tmp_path / "project.db")
+    Manifest(path)
+    processes = [multiprocessing.Process(target=_record_items, args=(path, worker, 20)) for worker in range(3)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    manifest = Manifest(path)
+    for worker in range(3):
+        for i in range(20):
+            assert manifest.get('audio', f"{worker}:{i}")['input_hash'] == f"hash-{worker}-{i}"
+
+def test_entries_recorded_elsewhere_are_visible(tmp_path):
+    path = str(tmp_path / "project.db")
+    reader = Manifest(path)
+    Manifest(path).record('images', 3, "abc", ["/tmp/scene_3.png"], status="failed")
+    assert reader.get('images', 3) == {"input_hash": "abc", "outputs": ["/tmp/scene_3.png"], "status": "failed"}
+    assert ('images', '3') not in reader.completed
+
+def test_legacy_manifest_is_imported_once(tmp_path):
+    legacy = tmp_path / "manifest.json"
+    legacy.write_text(json.dumps({"stages": {"audio": {"1:0": {"input_hash": "h", "outputs": ["a.wav"], "status": "done"}}}}))
+    path = str(tmp_path / "project.db")
+    assert Manifest(path, legacy_path=str(legacy)).outputs('audio', "1:0") == ["a.wav"]
+    legacy.write_text(json.dumps({"stages": {"audio": {"1:0": {"input_hash": "old", "outputs": ["b.wav"], "status": "done"}}}}))
+    assert Manifest(path, legacy_path=str(legacy)).get('audio', "1:0")['input_hash'] == "h"
@@ -0,0 +1,133 @@
+import threading
+import types
+
+import pytest
+
+from auteur_studio.utils import rate_limit_utils
+from auteur_studio.utils.hedge_utils import Hedger
+from auteur_studio.utils.rate_limit_utils import ModelLimiter
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit_utils, "time", types.SimpleNamespace(monotonic=clock.monotonic, sleep=clock.sleep, time=clock.monotonic))
+    return clock
+
+def _limiter(limit, max_concurrency=16):
+    limiter = ModelLimiter(max_concurrency=max_concurrency)
+    limiter.limit = float(limit)
+    return limiter
+
+def test_limit_grows_by_about_one_per_round(clock):
+    limiter = _limiter(4)
+    for _ in range(4):
+        limiter.acquire()
+        limiter.release()
+        limiter.record(latency=1.0)
+    assert 4.8 < limiter.limit < 5.0
+
+def test_limit_never_exceeds_max_concurrency(clock):
+    limiter = _limiter(8, max_concurrency=8)
+    limiter.record(latency=1.0)
+    assert limiter.limit == 8.0
+
+def test_throttling_halves_the_limit_once_per_round(clock):
+    limiter = _limiter(8)
+    limiter.record(throttled=True)
+    assert limiter.limit == 4.0
+    # A burst of 429s within the same round counts as one signal
+    limiter.record(throttled=True)
+    assert limiter.limit == 4.0
+    clock.sleep(1.5)
+    limiter.record(throttled=True)
+    assert limiter.limit == 2.0
+    clock.sleep(1.5)
+    limiter.record(throttled=True)
+    limiter.record(throttled=True)
+    assert limiter.limit == 1.0
+
+def test_call_well_above_recent_p90_counts_as_congestion(clock):
+    limiter = _limiter(8, max_concurrency=8)
+    for _ in range(20):
+        limiter.record(latency=1.0)
+    clock.sleep(10)
+    limiter.record(latency=5.0)
+    assert limiter.limit == 4.0
+
+def test_mixed_short_and_long_calls_are_not_congestion(clock):
+    limiter = _limiter(8, max_concurrency=8)
+    for n in range(60):
+        clock.sleep(0.5)
+        limiter.record(latency=0.2 if n % 2 else 5.0)
+    assert limiter.limit == 8.0
+
+def test_hedge_takes_a_slot_and_holds_it_until_the_attempt_returns():
+    limiter = ModelLimiter(max_concurrency=4)
+    hedger = Hedger(enabled=True, min_samples=1, max_ratio=1.0)
+    hedger.tracker("m").record(0.01)
+    hedger.budget.calls = 10
+    gate = threading.Event()
+    attempts = []
+
+    def _call(cancel):
+        attempts.append(cancel)
+        if len(attempts) == 1:
+            # The first attempt is slow; the hedge wins
+            gate.wait(5)
+            return "slow"
+        return "fast"
+
+    limiter.acquire()
+    result = hedger.call("m", _call, can_hedge=limiter.try_acquire_hedge, release=limiter.release)
+    assert result == "fast"
+    assert len(attempts) == 2
+    # The losing attempt is still running, so its slot is still taken
+    assert limiter.in_flight == 1
+    gate.set()
+    for _ in range(500):
+        if limiter.in_flight == 0:
+            break
+        threading.Event().wait(0.01)
+    assert limiter.in_flight == 0
+
+def test_hedge_is_skipped_when_no_slot_is_free():
+    limiter = ModelLimiter(max_concurrency=1)
+    hedger = Hedger(enabled=True, min_samples=1, max_ratio=1.0)
+    hedger.tracker("m").record(0.01)
+    hedger.budget.calls = 10
+    attempts = []
+
+    def _call(cancel):
+        attempts.append(cancel)
+        threading.Event().wait(0.1)
+        return "only"
+
+    limiter.acquire()
+    assert hedger.call("m", _call, can_hedge=limiter.try_acquire_hedge, release=limiter.release) == "only"
+    assert len(attempts) == 1
+    assert limiter.in_flight == 0
+
+def test_abandoned_attempt_holds_its_slot_past_the_deadline():
+    limiter = ModelLimiter(max_concurrency=2)
+    hedger = Hedger(enabled=False)
+    gate = threading.Event()
+    limiter.acquire()
+    with pytest.raises(TimeoutError):
+        hedger.call("m", lambda cancel: gate.wait(5), deadline=0.05, release=limiter.release)
+    assert limiter.in_flight == 1
+    gate.set()
+    for _ in range(500):
+        if limiter.in_flight == 0:
+            break
+        threading.Event().wait(0.01)
+    assert limiter.in_flight == 0
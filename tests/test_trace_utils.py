@@ -0,0 +1,26 @@
+from auteur_studio.utils import trace_utils
+
+def _span(name, start, end, cat="tts"):
+    return {"name": name, "cat": cat, "start": start, "end": end, "tid": 1, "args": {}}
+
+def test_critical_path_with_zero_length_and_overlapping_spans():
+    spans = [
+        _span("story", 0.0, 1.0, cat="story"),
+        _span("tts", 1.0, 2.0),
+        _span("image", 1.2, 1.8, cat="image"),
+        _span("marker", 2.0, 2.0),
+        _span("marker", 2.0, 2.0),
+        _span("segment", 2.0, 3.0, cat="encode"),
+        _span("stage", 0.0, 3.0, cat="stage"),
+    ]
+    path = trace_utils.critical_path(spans)
+    assert path[0]["name"] == "story"
+    assert path[-1]["name"] == "segment"
+    assert [item["start"] for item in path] == sorted(item["start"] for item in path)
+    assert len(path) <= len(spans)
+    assert all(item["cat"] != "stage" for item in path)
+
+def test_critical_path_of_only_zero_length_spans():
+    path = trace_utils.critical_path([_span("a", 2.0, 2.0), _span("b", 2.0, 2.0)])
+    assert len(path) == 2
+    assert "critical path: 2 span(s)" in trace_utils.format_critical_path([_span("a", 2.0, 2.0), _span("b", 2.0, 2.0)])
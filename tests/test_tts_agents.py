@@ -0,0 +1,110 @@
+import wave
+
+import pytest
+
+from auteur_studio.agents.tts_agents import TTSAgent
+from auteur_studio.utils.rate_limit_utils import RateLimiter
+from fakes import FakeGenaiClient, FakeModels, _response
+
+class CutOffModels(FakeModels):
+    """Drops the connection halfway through the first ``cut_offs`` streams."""
+
+    def __init__(self, client, cut_offs: int):
+        super().__init__(client)
+        self.cut_offs = cut_offs
+
+    def generate_content_stream(self, model, contents, config=None):
+        stream = super().generate_content_stream(model, contents, config)
+        if self.cut_offs <= 0:
+            return stream
+        self.cut_offs -= 1
+        return self._cut_off(stream)
+
+    @staticmethod
+    def _cut_off(stream):
+        for n, chunk in enumerate(stream):
+            if n == 2:
+                raise ConnectionError("connection reset (fake)")
+            yield chunk
+
+def _client(cut_offs: int = 0):
+    client = FakeGenaiClient(latency={"tts": 0.0}, jitter=0, audio_seconds=0.5, stream_chunks=5)
+    client.models = CutOffModels(client, cut_offs)
+    return client
+
+def _agent(client, streaming=True, max_retries=2):
+    return TTSAgent(api_key="unused", client=client, streaming=streaming, rate_limiter=RateLimiter({'max_retries': max_retries, 'base_delay': 0.0}))
+
+def _read_wav(path):
+    with wave.open(str(path), "rb") as wav:
+        return wav.getnchannels(), wav.getsampwidth(), wav.getframerate(), wav.readframes(wav.getnframes())
+
+@pytest.mark.parametrize("streaming", [True, False], ids=["streaming", "whole"])
+def test_speech_is_a_valid_wav(tmp_path, streaming):
+    client = _client()
+    output = _agent(client, streaming=streaming).generate_speech("Hello there.", "narrator", str(tmp_path / "line.mp3"))
+
+    assert output == str(tmp_path / "line.wav")
+    channels, sample_width, rate, frames = _read_wav(output)
+    assert (channels, sample_width, rate) == (1, 2, 24000)
+    assert frames == client._pcm
+    assert (tmp_path / "line.wav").stat().st_size == 44 + len(client._pcm)
+    assert [path.name for path in tmp_path.iterdir()] == ["line.wav"]
+
+def test_cut_off_stream_is_retried_and_leaves_no_partial_file(tmp_path):
+    client = _client(cut_offs=1)
+    output = _agent(client).generate_speech("Hello there.", "narrator", str(tmp_path / "line.wav"))
+
+    assert client.calls["tts"] == 2
+    assert _read_wav(output)[3] == client._pcm
+    assert [path.name for path in tmp_path.iterdir()] == ["line.wav"]
+
+def test_cut_off_stream_without_retries_writes_nothing(tmp_path):
+    with pytest.raises(ConnectionError):
+        _agent(_client(cut_offs=1), max_retries=0).generate_speech("Hello there.", "narrator", str(tmp_path / "line.wav"))
+    assert list(tmp_path.iterdir()) == []
+
+@pytest.mark.parametrize("response", [
+    _response(text="I cannot say that."),
+    _response(data=b"", mime_type="audio/L16;codec=pcm;rate=24000"),
+    _response(data=b"\x89PNG", mime_type="image/png"),
+], ids=["text", "empty", "not-audio"])
+@pytest.mark.parametrize("streaming", [True, False], ids=["streaming", "whole"])
+def test_responses_without_audio_are_rejected(tmp_path, monkeypatch, response, streaming):
+    client = _client()
+    monkeypatch.setattr(client.models, "generate_content", lambda **kwargs: response)
+    monkeypatch.setattr(client.models, "generate_content_stream", lambda **kwargs: iter([response]))
+
+    with pytest.raises(ValueError, match="No audio data"):
+        _agent(client, streaming=streaming).generate_speech("Hello there.", "narrator", str(tmp_path / "line.wav"))
+    assert list(tmp_path.iterdir()) == []
+
+def test_exchanges_have_at_most_two_speakers_and_keep_the_order():
+    lines = [("Ana", "1"), ("Ben", "2"), ("Ana", "3"), ("Cy", "4"), ("Ben", "5"), ("Cy", "6"), ("Cy", "7"), ("Ana", "8")]
+    exchanges = _agent(_client()).split_exchanges(lines)
+
+    assert exchanges == [
+        [("Ana", "1"), ("Ben", "2"), ("Ana", "3")],
+        [("Cy", "4"), ("Ben", "5"), ("Cy", "6"), ("Cy", "7")],
+        [("Ana", "8")],
+    ]
+    assert all(len({character for character, _ in exchange}) <= 2 for exchange in exchanges)
+
+def test_exchanges_of_an_empty_scene():
+    assert _agent(_client()).split_exchanges([]) == []
+
+def test_scene_speech_is_one_request_per_exchange(tmp_path, monkeypatch):
+    client = _client()
+    speakers = []
+    generate_content = client.models.generate_content
+
+    def record(model, contents, config=None):
+        speakers.append([speaker.speaker for speaker in config.speech_config.multi_speaker_voice_config.speaker_voice_configs])
+        return generate_content(model=model, contents=contents, config=config)
+
+    monkeypatch.setattr(client.models, "generate_content", record)
+    lines = [("narrator", "Once."), ("robot", "Beep."), ("narrator", "Then."), ("child", "Why?")]
+    output = _agent(client, streaming=False).generate_scene_speech(lines, str(tmp_path / "scene.wav"))
+
+    assert speakers == [["narrator", "robot"], ["child"]]
+    assert _read_wav(output)[3] == client._pcm * 2
@@ -0,0 +1,33 @@
+import os
+import time
+
+from auteur_studio.utils import queue_utils
+from auteur_studio.worker import Worker, run_workers
+
+class StubWorker(Worker):
+    """Runs every task without a project; the first attempt of "crash" tasks kills its worker process."""
+
+    def _execute(self, task):
+        if task['kind'] == 'crash' and task['attempts'] == 1:
+            # Die while holding the lease, like a worker that was killed mid-task
+            os._exit(1)
+        time.sleep(0.05)
+        return {'worker': self.worker_id, 'deps': sorted(task['results'])}
+
+def test_workers_reclaim_the_task_of_a_killed_worker(tmp_path):
+    queue = queue_utils.WorkQueue(str(tmp_path / "queue.db"))
+    tasks = []
+    for n in range(3):
+        tasks.append({'name': f"tts:{n}", 'kind': 'tts', 'payload': {'scene': n}})
+        tasks.append({'name': f"image:{n}", 'kind': 'crash' if n == 1 else 'image', 'payload': {'scene': n}})
+        tasks.append({'name': f"render:{n}", 'kind': 'render', 'payload': {'scene': n}, 'deps': [f"tts:{n}", f"image:{n}"]})
+    tasks.append({'name': "concat", 'kind': 'render', 'payload': {}, 'deps': [f"render:{n}" for n in range(3)]})
+    queue.submit("demo", {}, tasks, max_attempts=3)
+
+    run_workers(3, queue, {}, lease_seconds=1.0, poll_interval=0.05, exit_when_idle=True, worker_class=StubWorker)
+
+    states = {task['name']: task for task in queue.tasks("demo")}
+    assert {task['state'] for task in states.values()} == {queue_utils.DONE}
+    assert states["image:1"]['attempts'] == 2
+    assert states["render:1"]['result']['deps'] == ["image:1", "tts:1"]
+    assert states["concat"]['result']['deps'] == ["render:0", "render:1", "render:2"]